@@ -1,15 +1,38 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
+import asyncio
+import json
+import base64
+import copy
+import hashlib
+import time
+import random
+import multiprocessing
+import threading
+import bisect
+import sys
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
 from typing import List
 import uuid
-from datetime import datetime, timezone
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+import openai
+import httpx
 from openai import AsyncOpenAI
+from bson import ObjectId
+from pymongo import IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,16 +41,911 @@ logger = logging.getLogger(__name__)
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# ==================== METRICS ====================
+
+# Latency buckets in seconds, shared by every histogram
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_metric_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def format_metric_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    """
+    Counter per label set in the Prometheus text format. Pass `collect` to read the values from
+    existing state at scrape time instead (a callable returning (labels dict, value) pairs).
+    Safe to update from driver threads.
+    """
+    
+    type = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: dict):
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        if self.collect is not None:
+            values = [(labels, value) for labels, value in self.collect()]
+        else:
+            with self._lock:
+                values = [(dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+        lines += [f"{self.name}{format_metric_labels(labels)} {format_metric_value(value)}" for labels, value in values]
+        return lines
+
+class Gauge(Counter):
+    type = "gauge"
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Counter):
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=METRIC_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            series["buckets"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = [(dict(zip(self.labelnames, key)), copy.deepcopy(series)) for key, series in sorted(self._values.items())]
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["buckets"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_metric_labels({**labels, 'le': format_metric_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_metric_labels(labels)} {format_metric_value(series['sum'])}")
+            lines.append(f"{self.name}_count{format_metric_labels(labels)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Every metric served on /metrics"""
+    
+    def __init__(self):
+        self.metrics = {}
+    
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames=(), collect=None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, collect))
+    
+    def gauge(self, name: str, documentation: str, labelnames=(), collect=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, collect))
+    
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=METRIC_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                lines += metric.render()
+            except Exception as e:
+                logging.warning(f"Error collecting metric {metric.name}: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template, until the response body is sent",
+    ["method", "route", "status"]
+)
+mongo_command_duration = metrics.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trip time by collection", ["collection", "command"]
+)
+mongo_command_failures = metrics.counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error", ["collection", "command"]
+)
+event_loop_lag = metrics.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic timer; high values mean something blocked it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command per collection from the driver's command monitoring events"""
+    
+    def __init__(self):
+        self._collections = {}  # request_id -> collection, between started and succeeded/failed
+    
+    def started(self, event):
+        target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        if isinstance(target, str):
+            self._collections[event.request_id] = target
+    
+    def _finished(self, event, failed: bool):
+        collection = self._collections.pop(event.request_id, None)
+        if collection is None:
+            return
+        mongo_command_duration.observe(event.duration_micros / 1_000_000, collection=collection, command=event.command_name)
+        if failed:
+            mongo_command_failures.inc(collection=collection, command=event.command_name)
+    
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+    
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing each request by its route template, e.g. /api/success-stories/{story_id}"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_duration.observe(time.perf_counter() - started, method=scope["method"], route=route, status=status)
+
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL_SECONDS', 0.5))
+event_loop_lag_task = None
+
+async def monitor_event_loop_lag():
+    """Sleep for a fixed interval and record how much later than asked the loop woke us"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        event_loop_lag.observe(max(loop.time() - started - EVENT_LOOP_LAG_INTERVAL_SECONDS, 0))
+
+# ==================== EVENT LOOP BLOCKING DETECTOR ====================
+
+class LoopBlockDetector:
+    """
+    Opt-in (LOOP_BLOCK_DETECTOR=1) report of what blocks the event loop. Puts the loop in asyncio
+    debug mode so it logs every callback slower than the threshold, while a watchdog thread samples
+    the loop thread's stack whenever the loop stops answering pings. Each slow callback is paired
+    with the stacks sampled during it and attributed to the route whose endpoint is on the stack.
+    Debug mode slows everything down, so this is for test and load test runs, not production.
+    """
+
+    STACK_DEPTH = 12
+    MAX_STACKS_PER_ROUTE = 50
+
+    def __init__(self, threshold_seconds: float, sample_interval_seconds: float):
+        self.threshold_seconds = threshold_seconds
+        self.sample_interval_seconds = sample_interval_seconds
+        self.enabled = False
+        self.routes = {}
+        self.recent = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._samples = []  # (stack, route) sampled during the current stall
+        self._endpoints = {}  # (file, endpoint qualname) -> "METHOD /path"
+        self._stopped = threading.Event()
+        self._log_handler = None
+
+    def start(self, loop, app):
+        """Instrument the running loop; call from inside it"""
+        if self.enabled:
+            return
+        for route in app.routes:
+            endpoint = getattr(route, "endpoint", None)
+            if endpoint is not None and hasattr(endpoint, "__code__"):
+                name = f"{','.join(sorted(getattr(route, 'methods', None) or []))} {route.path}".strip()
+                self._endpoints[(endpoint.__code__.co_filename, endpoint.__qualname__)] = name
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self._previous_debug = (loop.get_debug(), loop.slow_callback_duration)
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold_seconds
+
+        detector = self
+
+        class SlowCallbackHandler(logging.Handler):
+            def emit(self, record):
+                # asyncio logs "Executing <handle> took <seconds> seconds" from the loop thread, right
+                # after the callback returns and before the watchdog's ping can run
+                if record.msg == "Executing %s took %.3f seconds":
+                    detector._record(str(record.args[0]), record.args[1])
+
+        self._log_handler = SlowCallbackHandler()
+        logging.getLogger("asyncio").addHandler(self._log_handler)
+        self._stopped.clear()
+        threading.Thread(target=self._watch, name="loop-block-watchdog", daemon=True).start()
+        self.enabled = True
+        logging.warning(f"Event loop blocking detector on: reporting callbacks over {self.threshold_seconds * 1000:.0f} ms")
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self._stopped.set()
+        logging.getLogger("asyncio").removeHandler(self._log_handler)
+        self.loop.set_debug(self._previous_debug[0])
+        self.loop.slow_callback_duration = self._previous_debug[1]
+        self.enabled = False
+
+    def _watch(self):
+        while not self._stopped.is_set():
+            answered = threading.Event()
+            try:
+                self.loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return  # Loop closed
+            if not answered.wait(self.threshold_seconds):
+                while not answered.is_set() and not self._stopped.is_set():
+                    self._sample()
+                    answered.wait(self.sample_interval_seconds)
+            with self._lock:
+                # Stalls made of many short callbacks never produce a slow callback record
+                self._samples.clear()
+            self._stopped.wait(self.sample_interval_seconds)
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+        route = None
+        walker = frame
+        while walker is not None and route is None:
+            # Functions nested in an endpoint (e.g. a streaming generator) count as the endpoint
+            code = walker.f_code
+            route = self._endpoints.get((code.co_filename, code.co_qualname.split(".<locals>")[0]))
+            walker = walker.f_back
+        stack = tuple(
+            f"{Path(f.filename).name}:{f.lineno} {f.name}"
+            for f in traceback.extract_stack(frame, limit=self.STACK_DEPTH)
+        )
+        with self._lock:
+            self._samples.append((stack, route))
+
+    def _record(self, callback: str, seconds: float):
+        with self._lock:
+            samples, self._samples = self._samples, []
+        if samples:
+            # Innermost endpoint seen and the most frequently sampled stack
+            route = next((r for _, r in reversed(samples) if r), "background")
+            stack = max(set(s for s, _ in samples), key=[s for s, _ in samples].count)
+        else:
+            route, stack = "unsampled", ()
+
+        with self._lock:
+            entry = self.routes.setdefault(route, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "stacks": {}})
+            entry["count"] += 1
+            entry["total_ms"] += seconds * 1000
+            entry["max_ms"] = max(entry["max_ms"], seconds * 1000)
+            if stack in entry["stacks"] or len(entry["stacks"]) < self.MAX_STACKS_PER_ROUTE:
+                stats = entry["stacks"].setdefault(stack, {"count": 0, "total_ms": 0.0})
+                stats["count"] += 1
+                stats["total_ms"] += seconds * 1000
+            self.recent.append({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "route": route,
+                "duration_ms": round(seconds * 1000, 1),
+                "callback": callback[:300],
+                "stack": list(stack)
+            })
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.recent.clear()
+
+    def report(self):
+        with self._lock:
+            routes = {
+                route: {
+                    "count": entry["count"],
+                    "total_ms": round(entry["total_ms"], 1),
+                    "max_ms": round(entry["max_ms"], 1),
+                    "top_stacks": [
+                        {"stack": list(stack), "count": stats["count"], "total_ms": round(stats["total_ms"], 1)}
+                        for stack, stats in sorted(entry["stacks"].items(), key=lambda item: -item[1]["total_ms"])[:5]
+                    ]
+                }
+                for route, entry in sorted(self.routes.items(), key=lambda item: -item[1]["total_ms"])
+            }
+            recent = list(self.recent)
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": round(self.threshold_seconds * 1000, 1),
+            "routes": routes,
+            "recent": recent
+        }
+
+loop_block_detector = LoopBlockDetector(
+    threshold_seconds=float(os.environ.get('LOOP_BLOCK_THRESHOLD_SECONDS', 0.1)),
+    sample_interval_seconds=float(os.environ.get('LOOP_BLOCK_SAMPLE_SECONDS', 0.02))
+)
+
+metrics.counter(
+    "event_loop_slow_callbacks_total", "Callbacks over the blocking detector threshold, by route (detector mode only)",
+    ["route"], collect=lambda: [({"route": route}, entry["count"]) for route, entry in list(loop_block_detector.routes.items())]
+)
+metrics.counter(
+    "event_loop_blocked_seconds_total", "Time spent in callbacks over the blocking detector threshold, by route",
+    ["route"], collect=lambda: [({"route": route}, entry["total_ms"] / 1000) for route, entry in list(loop_block_detector.routes.items())]
+)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()])
 db = client[os.environ['DB_NAME']]
 
-# OpenAI client - Using standard OpenAI API
-openai_client = AsyncOpenAI(
-    api_key=os.environ.get('OPENAI_API_KEY')
+# Indexes backing every hot query path, ensured on startup
+MONGO_INDEXES = {
+    "conversations": [
+        IndexModel("conversation_id", unique=True)
+    ],
+    "module_conversations": [
+        IndexModel("conversation_id", unique=True)
+    ],
+    "conversation_turns": [
+        IndexModel([("conversation_id", 1), ("seq", 1)], unique=True)
+    ],
+    "success_stories": [
+        IndexModel("id", unique=True),
+        IndexModel([("timestamp", -1), ("id", -1)])
+    ],
+    "story_likes": [
+        IndexModel([("story_id", 1), ("email_lc", 1)], unique=True)
+    ],
+    "quiz_submissions": [
+        IndexModel("email_lc"),
+        IndexModel([("module_id", 1), ("timestamp", -1)]),
+        IndexModel([("department", 1), ("timestamp", -1)]),
+        IndexModel([("timestamp", -1), ("_id", -1)])
+    ],
+    "module_stats_rollup": [
+        IndexModel("module_id", unique=True)
+    ],
+    "ai_response_cache": [
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ],
+    "champion_profiles": [
+        IndexModel("email", unique=True),
+        IndexModel([("impact_score", -1)]),
+        IndexModel("certified", partialFilterExpression={"certified": True})
+    ],
+    "certificates": [
+        IndexModel([("email", 1), ("name", 1), ("issued_date", 1)], unique=True),
+        IndexModel("cert_id", unique=True)
+    ]
+}
+
+def normalize_email(email: str):
+    """Canonical form of an email used for indexed, case-insensitive lookups"""
+    return (email or "").strip().lower()
+
+def atomic_write(path: Path, data: bytes):
+    """Write via a temporary file and rename so a concurrent reader never sees a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+async def backfill_email_lc():
+    """Migration: add email_lc to quiz submissions written before it existed"""
+    result = await db.quiz_submissions.update_many(
+        {"email_lc": {"$exists": False}},
+        [{"$set": {"email_lc": {"$toLower": {"$trim": {"input": {"$ifNull": ["$email", ""]}}}}}}]
+    )
+    if result.modified_count:
+        logging.info(f"Backfilled email_lc on {result.modified_count} quiz submissions")
+    return result.modified_count
+
+async def insert_many_ignoring_duplicates(collection, docs: list):
+    """
+    Unordered insert_many for re-runnable migrations: documents copied by an earlier interrupted
+    run already exist (duplicate key errors are skipped); anything else is a real failure
+    """
+    if not docs:
+        return
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+async def migrate_story_likes():
+    """Migration: move embedded success_stories.liked_by arrays into story_likes"""
+    migrated = 0
+    async for story in db.success_stories.find({"liked_by": {"$exists": True}}, {"id": 1, "liked_by": 1}):
+        likes = {normalize_email(email) for email in story.get("liked_by") or [] if email}
+        await insert_many_ignoring_duplicates(
+            db.story_likes, [{"story_id": story["id"], "email_lc": email, "timestamp": ""} for email in likes]
+        )
+        await db.success_stories.update_one({"_id": story["_id"]}, {"$unset": {"liked_by": ""}})
+        migrated += 1
+    if migrated:
+        logging.info(f"Moved liked_by of {migrated} success stories into story_likes")
+    return migrated
+
+async def offload_story_images():
+    """Migration: move inline data: URI story images to the content-addressed image store"""
+    migrated = 0
+    async for story in db.success_stories.find({"imageUrl": {"$regex": "^data:"}}, {"imageUrl": 1}):
+        try:
+            image_hash = await ingest_story_image(decode_data_uri(story["imageUrl"]))
+            update = {"$set": {"imageUrl": story_image_urls(image_hash)["imageUrl"], "image_hash": image_hash}}
+        except ValueError as e:
+            logging.warning(f"Dropping unreadable inline image from story {story['_id']}: {str(e)}")
+            update = {"$set": {"imageUrl": "", "image_hash": None}}
+        await db.success_stories.update_one({"_id": story["_id"]}, update)
+        migrated += 1
+    if migrated:
+        logging.info(f"Moved {migrated} inline success story images to {STORY_IMAGE_DIR}")
+    return migrated
+
+async def ensure_indexes():
+    """Create any missing indexes from MONGO_INDEXES (existing ones are left untouched)"""
+    for collection, indexes in MONGO_INDEXES.items():
+        try:
+            names = await db[collection].create_indexes(indexes)
+            logging.info(f"Ensured indexes on {collection}: {', '.join(names)}")
+        except Exception as e:
+            # A conflicting legacy index or duplicate data should not stop the API from serving
+            logging.error(f"Error creating indexes on {collection}: {str(e)}")
+
+async def replace_collection(name: str, docs: list):
+    """
+    Swap in a rebuilt derived collection: write the documents and indexes to a scratch collection,
+    then rename it over `name` in one step. Readers never see it empty or half written, and
+    concurrent rebuilds (e.g. two workers seeding at startup) each swap in a complete copy.
+    """
+    scratch = db[f"{name}_rebuild_{uuid.uuid4().hex[:8]}"]
+    try:
+        if docs:
+            await scratch.insert_many(docs)
+        # Also creates the scratch collection when there are no documents
+        await scratch.create_indexes(MONGO_INDEXES[name])
+        await scratch.rename(name, dropTarget=True)
+    except Exception:
+        await scratch.drop()
+        raise
+
+# ==================== WRITE-BEHIND BUFFER ====================
+
+class WriteBehindBuffer:
+    """
+    Queues inserts that no later request reads back (analytics) and writes them in batches from a
+    background task: one insert_many per collection once max_batch documents are waiting or
+    flush_seconds have passed, whichever comes first. Failed batches are logged, not retried.
+    """
+    
+    def __init__(self, flush_seconds: float, max_batch: int, max_pending: int):
+        self.flush_seconds = flush_seconds
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = {}  # collection name -> [documents]
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+    
+    @property
+    def depth(self):
+        return sum(len(docs) for docs in self._pending.values())
+    
+    async def insert(self, collection_name: str, doc: dict):
+        self._pending.setdefault(collection_name, []).append(doc)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self.depth >= self.max_pending:
+            # Database is falling behind: make this caller wait rather than grow without bound
+            await self.flush()
+        elif self.depth >= self.max_batch:
+            self._wake.set()
+    
+    async def flush(self, *collection_names: str):
+        """Write everything pending (or only the named collections) now"""
+        async with self._lock:
+            names = collection_names or list(self._pending)
+            for name in names:
+                docs = self._pending.pop(name, None)
+                if not docs:
+                    continue
+                try:
+                    await db[name].insert_many(docs, ordered=False)
+                    self.written += len(docs)
+                except BulkWriteError as e:
+                    failures = len(e.details.get("writeErrors", []))
+                    self.written += len(docs) - failures
+                    self.failed += failures
+                    logging.error(f"Write-behind insert into {name} failed for {failures} of {len(docs)} documents")
+                except Exception as e:
+                    self.failed += len(docs)
+                    logging.error(f"Write-behind insert of {len(docs)} documents into {name} failed: {str(e)}")
+                self.batches += 1
+    
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+    
+    async def close(self):
+        """Stop the background task and write whatever is still queued"""
+        self._closed = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+    
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "pending": {name: len(docs) for name, docs in self._pending.items() if docs},
+            "max_batch": self.max_batch,
+            "max_pending": self.max_pending,
+            "flush_seconds": self.flush_seconds,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches
+        }
+
+write_behind = WriteBehindBuffer(
+    flush_seconds=float(os.environ.get('WRITE_BEHIND_FLUSH_SECONDS', 1.0)),
+    max_batch=int(os.environ.get('WRITE_BEHIND_MAX_BATCH', 200)),
+    max_pending=int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 10000))
+)
+
+metrics.gauge("write_behind_pending", "Documents buffered for a batched insert, by collection", ["collection"],
+              collect=lambda: [({"collection": name}, len(docs)) for name, docs in write_behind._pending.items()])
+metrics.counter("write_behind_failed_total", "Buffered documents that could not be written",
+                collect=lambda: [({}, write_behind.failed)])
+
+# ==================== MODEL GATEWAY ====================
+
+# Errors worth retrying: rate limits, upstream 5xx, dropped connections and per-attempt timeouts
+RETRYABLE_MODEL_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+class ModelUnavailableError(Exception):
+    """Raised without calling the model while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """
+    Stops calling the model after failure_threshold consecutive upstream failures. While open,
+    calls fail immediately; after reset_seconds a single half-open probe is let through and
+    its outcome closes the circuit again or re-opens it for another reset_seconds.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the probe slot when half-open)"""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+    
+    def record_success(self):
+        if self.state != "closed":
+            logging.info("Model circuit breaker closed: probe call succeeded")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self, error: Exception):
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {str(error)}"[:300]
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logging.error(f"Model circuit breaker opened after {self.consecutive_failures} consecutive failures: {self.last_error}")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+    
+    def release_probe(self):
+        """The call ended without telling us anything about the upstream (e.g. client went away)"""
+        self._probe_in_flight = False
+    
+    def stats(self):
+        retry_in = None
+        if self.state == "open":
+            retry_in = round(max(self.reset_seconds - (time.monotonic() - self.opened_at), 0), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "retry_in_seconds": retry_in,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+openai_queue_wait = metrics.histogram(
+    "openai_queue_wait_seconds", "Time model calls waited for an in-flight slot, by endpoint", ["endpoint"]
+)
+openai_request_duration = metrics.histogram(
+    "openai_request_duration_seconds", "Model call time holding an in-flight slot (retries and streaming included), by endpoint",
+    ["endpoint"]
+)
+
+class ModelGateway:
+    """
+    Every chat completion goes through here: one pooled httpx client, a global cap on in-flight
+    calls, an overall deadline per call (queueing and retries included) and jittered exponential
+    backoff on 429/5xx. Keeps per-endpoint counters of queue wait versus model time.
+    """
+    
+    def __init__(self, max_in_flight: int, max_connections: int, timeout_seconds: float, max_retries: int,
+                 breaker: CircuitBreaker, backoff_seconds: float = 0.5, max_backoff_seconds: float = 8.0):
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_in_flight = max_in_flight
+        self.breaker = breaker
+        self.client = AsyncOpenAI(
+            api_key=os.environ.get('OPENAI_API_KEY'),
+            max_retries=0,  # Retries are handled here so they share the deadline and the concurrency cap
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(timeout_seconds, connect=5.0)
+            )
+        )
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.metrics = {}
+    
+    def _metrics(self, label: str):
+        return self.metrics.setdefault(label, {
+            "calls": 0, "errors": 0, "retries": 0, "timeouts": 0, "short_circuited": 0,
+            "queue_wait_ms": 0.0, "model_ms": 0.0, "max_queue_wait_ms": 0.0, "max_model_ms": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0
+        })
+    
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when the API sends one"""
+        retry_after = getattr(getattr(error, "response", None), "headers", {}).get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+    
+    def _record_usage(self, metrics: dict, usage):
+        if usage:
+            metrics["prompt_tokens"] += usage.prompt_tokens or 0
+            metrics["completion_tokens"] += usage.completion_tokens or 0
+    
+    async def _acquire(self, label: str, metrics: dict, deadline: float):
+        queued = time.monotonic()
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(max(deadline - queued, 0)):
+                await self._semaphore.acquire()
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        finally:
+            self.waiting -= 1
+        wait_ms = (time.monotonic() - queued) * 1000
+        openai_queue_wait.observe(wait_ms / 1000, endpoint=label)
+        metrics["queue_wait_ms"] += wait_ms
+        metrics["max_queue_wait_ms"] = max(metrics["max_queue_wait_ms"], wait_ms)
+        self.in_flight += 1
+    
+    def _release(self, label: str, metrics: dict, started: float):
+        self.in_flight -= 1
+        self._semaphore.release()
+        model_ms = (time.monotonic() - started) * 1000
+        openai_request_duration.observe(model_ms / 1000, endpoint=label)
+        metrics["model_ms"] += model_ms
+        metrics["max_model_ms"] = max(metrics["max_model_ms"], model_ms)
+    
+    def _check_breaker(self, metrics: dict):
+        if not self.breaker.allow():
+            metrics["short_circuited"] += 1
+            raise ModelUnavailableError("AI model is temporarily unavailable")
+    
+    async def _create(self, metrics: dict, deadline: float, **kwargs):
+        """One create() call with retries, all inside the caller's deadline"""
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                async with asyncio.timeout(max(remaining, 0)):
+                    return await self.client.chat.completions.create(**kwargs)
+            except RETRYABLE_MODEL_ERRORS as e:
+                delay = self._backoff(attempt, e)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+                logging.warning(f"Model call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                metrics["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+    
+    async def complete(self, label: str, timeout_seconds: float = None, **kwargs):
+        """chat.completions.create() for the named endpoint, pooled, capped, retried and timed"""
+        metrics = self._metrics(label)
+        metrics["calls"] += 1
+        self._check_breaker(metrics)
+        deadline = time.monotonic() + (timeout_seconds or self.timeout_seconds)
+        try:
+            await self._acquire(label, metrics, deadline)
+            started = time.monotonic()
+            try:
+                response = await self._create(metrics, deadline, **kwargs)
+            except (*RETRYABLE_MODEL_ERRORS, TimeoutError) as e:
+                self.breaker.record_failure(e)
+                raise
+            except Exception:
+                self.breaker.record_success()  # The model answered, the request itself was bad
+                raise
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            finally:
+                self._release(label, metrics, started)
+            self.breaker.record_success()
+            self._record_usage(metrics, response.usage)
+            return response
+        except TimeoutError:
+            metrics["timeouts"] += 1
+            raise
+        except Exception:
+            metrics["errors"] += 1
+            raise
+    
+    async def stream(self, label: str, timeout_seconds: float = None, **kwargs):
+        """
+        Streaming chat.completions.create(): yields content tokens. The deadline and retries cover
+        the time to the first chunk; the in-flight slot is held until the stream ends.
+        """
+        metrics = self._metrics(label)
+        metrics["calls"] += 1
+        self._check_breaker(metrics)
+        deadline = time.monotonic() + (timeout_seconds or self.timeout_seconds)
+        try:
+            await self._acquire(label, metrics, deadline)
+            started = time.monotonic()
+            try:
+                stream = await self._create(metrics, deadline, stream=True, stream_options={"include_usage": True}, **kwargs)
+                async for chunk in stream:
+                    self._record_usage(metrics, chunk.usage)
+                    token = chunk.choices[0].delta.content if chunk.choices else None
+                    if token:
+                        yield token
+            except (*RETRYABLE_MODEL_ERRORS, TimeoutError) as e:
+                self.breaker.record_failure(e)
+                raise
+            except Exception:
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            finally:
+                self._release(label, metrics, started)
+            self.breaker.record_success()
+        except TimeoutError:
+            metrics["timeouts"] += 1
+            raise
+        except Exception:
+            metrics["errors"] += 1
+            raise
+    
+    def stats(self):
+        endpoints = {}
+        for label, m in self.metrics.items():
+            calls = m["calls"] or 1
+            endpoints[label] = {
+                **{key: round(value, 1) if isinstance(value, float) else value for key, value in m.items()},
+                "avg_queue_wait_ms": round(m["queue_wait_ms"] / calls, 1),
+                "avg_model_ms": round(m["model_ms"] / calls, 1)
+            }
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "timeout_seconds": self.timeout_seconds,
+            "max_retries": self.max_retries,
+            "circuit_breaker": self.breaker.stats(),
+            "endpoints": endpoints
+        }
+
+model_gateway = ModelGateway(
+    max_in_flight=int(os.environ.get('OPENAI_MAX_IN_FLIGHT', 16)),
+    max_connections=int(os.environ.get('OPENAI_MAX_CONNECTIONS', 32)),
+    timeout_seconds=float(os.environ.get('OPENAI_TIMEOUT_SECONDS', 30)),
+    max_retries=int(os.environ.get('OPENAI_MAX_RETRIES', 2)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('OPENAI_BREAKER_FAILURES', 5)),
+        reset_seconds=float(os.environ.get('OPENAI_BREAKER_RESET_SECONDS', 30))
+    )
 )
 
+def model_gateway_counters(*keys):
+    """Collector reading cumulative per-endpoint counters from the gateway's stats"""
+    return lambda: [
+        ({"endpoint": label, **({"kind": key.removesuffix("_tokens")} if key.endswith("_tokens") else {})}, m[key])
+        for label, m in model_gateway.metrics.items() for key in keys
+    ]
+
+metrics.counter("openai_calls_total", "Model calls by endpoint", ["endpoint"], collect=model_gateway_counters("calls"))
+metrics.counter("openai_errors_total", "Failed model calls by endpoint", ["endpoint"], collect=model_gateway_counters("errors"))
+metrics.counter("openai_timeouts_total", "Model calls that hit their deadline, by endpoint", ["endpoint"],
+                collect=model_gateway_counters("timeouts"))
+metrics.counter("openai_retries_total", "Model call retries by endpoint", ["endpoint"], collect=model_gateway_counters("retries"))
+metrics.counter("openai_short_circuited_total", "Model calls rejected by the open circuit breaker, by endpoint", ["endpoint"],
+                collect=model_gateway_counters("short_circuited"))
+metrics.counter("openai_tokens_total", "Prompt and completion tokens by endpoint", ["endpoint", "kind"],
+                collect=model_gateway_counters("prompt_tokens", "completion_tokens"))
+metrics.gauge("openai_in_flight", "Model calls currently holding a slot", collect=lambda: [({}, model_gateway.in_flight)])
+metrics.gauge("openai_waiting", "Model calls waiting for a slot", collect=lambda: [({}, model_gateway.waiting)])
+metrics.gauge("openai_circuit_open", "1 while the model circuit breaker is open or half open",
+              collect=lambda: [({}, int(model_gateway.breaker.state != "closed"))])
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -127,28 +1045,67 @@ async def get_status_checks(skip: int = 0, limit: int = 100):
     
     return status_checks
 
-@api_router.post("/ai-helper", response_model=AIHelperResponse)
-async def ai_helper(request: AIHelperRequest):
-    """
-    Generate personalized AI suggestions using live AI (Emergent Universal Key -> GPT-4o).
-    Falls back to intelligent mock responses if API fails.
-    """
-    try:
-        # Map department to strategic pillar
-        strategic_pillars = {
-            "sales": "GLOBAL EDGE by improving proactive outreach and data-driven decision making",
-            "marketing": "Innovation Focus through AI-powered content strategies and GLOBAL EDGE via data-driven marketing",
-            "operations": "STOCKSMART through optimized processes and ONE TEAM via clear documentation",
-            "leadership": "Innovation Focus by leading AI adoption and GLOBAL EDGE through strategic intelligence",
-            "it": "Innovation Focus through robust technical infrastructure and ONE TEAM via improved systems",
-            "customer-service": "Service Excellence and customer relationships, supporting GLOBAL EDGE through superior experience"
-        }
-        
-        strategic_pillar = strategic_pillars.get(request.department, "organizational excellence")
-        
-        # Try live AI first
-        try:
-            system_prompt = """You are an AI assistant for Dynamics G-Ex, helping employees learn how to use Microsoft Copilot to solve their challenges. 
+# ==================== AI HELPER ====================
+
+# Map department to strategic pillar
+STRATEGIC_PILLARS = {
+    "sales": "GLOBAL EDGE by improving proactive outreach and data-driven decision making",
+    "marketing": "Innovation Focus through AI-powered content strategies and GLOBAL EDGE via data-driven marketing",
+    "operations": "STOCKSMART through optimized processes and ONE TEAM via clear documentation",
+    "leadership": "Innovation Focus by leading AI adoption and GLOBAL EDGE through strategic intelligence",
+    "it": "Innovation Focus through robust technical infrastructure and ONE TEAM via improved systems",
+    "customer-service": "Service Excellence and customer relationships, supporting GLOBAL EDGE through superior experience"
+}
+
+# Fallback: intelligent responses based on department, used if live AI fails
+DEPARTMENT_FALLBACK_RESPONSES = {
+    "sales": {
+        "approach": "1. Use Copilot in Excel to analyze historical sales data and identify patterns\n2. Create predictive models by asking Copilot to \"analyze trends in deal closures by industry and size\"\n3. Generate automated reports with key insights and forecasts\n4. Use Copilot in Outlook to draft personalized follow-up emails based on customer data\n5. Set up Copilot-powered dashboards to track real-time performance against forecasts",
+        "tool": "Copilot in Excel",
+        "why": "Excel Copilot excels at data analysis and pattern recognition, making it perfect for sales forecasting. It can process large datasets quickly, identify correlations you might miss, and generate actionable insights that help you close deals faster and more predictably.",
+        "strategic_alignment": "This directly supports {strategic_pillar}, enabling your team to make proactive, data-backed decisions that improve win rates and revenue predictability."
+    },
+    "marketing": {
+        "approach": "1. Use Copilot to brainstorm creative campaign concepts tailored to your target audience\n2. Draft compelling copy for multiple channels (email, social, ads) in minutes\n3. Analyze customer feedback and sentiment from surveys using Copilot in Excel\n4. Generate content calendars and coordinate across teams using Copilot in Teams\n5. Create polished presentations with Copilot in PowerPoint for stakeholder buy-in",
+        "tool": "Copilot",
+        "why": "Copilot streamlines content creation and campaign planning, allowing you to test more ideas faster. It helps maintain brand consistency while adapting tone for different audiences, and frees up time for strategic thinking rather than repetitive writing tasks.",
+        "strategic_alignment": "This supports {strategic_pillar}, enabling faster campaign launches and more data-informed creative decisions that resonate with customers."
+    },
+    "operations": {
+        "approach": "1. Document your current process in Copilot in Word as a starting point\n2. Ask Copilot to identify potential bottlenecks and inefficiencies\n3. Use Copilot in Teams to capture meeting notes and action items automatically\n4. Create standardized SOPs with Copilot assistance for consistency\n5. Generate process maps and flowcharts to visualize improvements",
+        "tool": "Copilot in Word",
+        "why": "Copilot makes documentation effortless and helps you spot optimization opportunities you might overlook. It ensures your SOPs are clear, comprehensive, and easy to update, which is crucial for maintaining operational excellence as your team grows.",
+        "strategic_alignment": "This supports {strategic_pillar}, creating the foundation for scalable, efficient operations that free up your team to focus on high-value work."
+    },
+    "leadership": {
+        "approach": "1. Use Copilot to synthesize data from multiple reports into executive summaries\n2. Ask Copilot in PowerPoint to create board-ready presentations with key insights\n3. Analyze market trends and competitive intelligence using Copilot's research capabilities\n4. Draft strategic communications to align your team using Copilot in Outlook\n5. Use Copilot in Teams to stay on top of important discussions without getting lost in threads",
+        "tool": "Copilot in PowerPoint",
+        "why": "Leaders need to make quick, informed decisions without getting bogged down in details. Copilot helps you extract insights from complex data, communicate vision clearly, and stay strategic rather than tactical. It's like having a chief of staff that works 24/7.",
+        "strategic_alignment": "This supports {strategic_pillar}, enabling you to lead with clarity and confidence while driving AI adoption across the organization."
+    },
+    "it": {
+        "approach": "1. Use Copilot in Word to draft comprehensive technical documentation quickly\n2. Create troubleshooting guides by describing common issues to Copilot\n3. Generate security policies and governance frameworks with Copilot assistance\n4. Use Copilot to document API integrations with clear examples\n5. Build knowledge base articles that make complex tech accessible to non-technical users",
+        "tool": "Copilot in Word",
+        "why": "Good documentation is critical but time-consuming. Copilot accelerates doc creation while maintaining clarity and completeness. It helps you capture institutional knowledge before team members move on, and makes technical concepts accessible to everyone.",
+        "strategic_alignment": "This supports {strategic_pillar}, building robust technical infrastructure through better knowledge sharing and system documentation."
+    },
+    "customer-service": {
+        "approach": "1. Use Copilot in Outlook to draft empathetic, solution-focused customer responses\n2. Analyze support ticket trends in Excel to identify common pain points\n3. Create comprehensive FAQ documents with Copilot in Word based on frequent inquiries\n4. Generate customer satisfaction survey analysis and insights\n5. Use Copilot to maintain a knowledge base that reduces response time",
+        "tool": "Copilot in Outlook",
+        "why": "Customer service is all about speed and empathy. Copilot helps you respond faster without sacrificing quality, maintain the right tone even when rushed, and scale your support without losing the personal touch. It's like giving every team member superpowers.",
+        "strategic_alignment": "This supports {strategic_pillar}, enabling you to deliver consistently excellent experiences that build customer loyalty and drive referrals."
+    }
+}
+
+# Used for departments without a tailored fallback
+DEFAULT_FALLBACK_RESPONSE = {
+    "approach": "1. Start by clearly defining your objective and desired outcome\n2. Use Copilot to draft, analyze, or generate content relevant to your challenge\n3. Iterate and refine the output by providing specific feedback\n4. Validate the results and adapt them to your specific context\n5. Share insights with your team to multiply the impact",
+    "tool": "Copilot",
+    "why": "Copilot accelerates your work by handling routine tasks, providing smart suggestions, and helping you focus on what matters most. It's designed to augment your expertise, not replace it.",
+    "strategic_alignment": "This supports {strategic_pillar}, enabling you to work smarter and achieve better results faster."
+}
+
+AI_HELPER_SYSTEM_PROMPT = """You are an AI assistant for Dynamics G-Ex, helping employees learn how to use Microsoft Copilot to solve their challenges. 
 
 Your tone should be:
 - Professional yet cheerful
@@ -165,7 +1122,128 @@ You should provide:
 
 Keep responses concise but helpful. Focus on practical, actionable advice."""
 
-            user_prompt = f"""A {request.department} team member named {request.name} has the following challenge:
+class ResponseCache:
+    """
+    TTL + LRU cache for model responses: an in-process tier in front of an optional
+    MongoDB collection shared between workers. Values must be JSON-like dicts.
+    """
+    
+    def __init__(self, name: str, ttl_seconds: int, max_entries: int, collection=None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.collection = collection
+        self._entries = OrderedDict()  # key -> (expires_at monotonic, value)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(*parts):
+        """Hash of the parts after lowercasing and collapsing whitespace"""
+        normalized = "\x1f".join(" ".join(str(part).lower().split()) for part in parts)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+    
+    def _remember(self, key: str, value: dict):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            del self._entries[key]
+        
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+                )
+                if doc:
+                    self._remember(key, doc["value"])
+                    self.hits += 1
+                    self.shared_hits += 1
+                    return copy.deepcopy(doc["value"])
+            except Exception as e:
+                logging.warning(f"Shared {self.name} cache read failed: {str(e)}")
+        
+        self.misses += 1
+        return None
+    
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+        if self.collection is not None:
+            try:
+                await self.collection.delete_one({"_id": key})
+            except Exception as e:
+                logging.warning(f"Shared {self.name} cache delete failed: {str(e)}")
+    
+    async def set(self, key: str, value: dict):
+        value = copy.deepcopy(value)
+        self._remember(key, value)
+        if self.collection is not None:
+            try:
+                await self.collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "value": value,
+                        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                logging.warning(f"Shared {self.name} cache write failed: {str(e)}")
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "shared": self.collection is not None,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0
+        }
+
+ai_helper_cache = ResponseCache(
+    "ai-helper",
+    ttl_seconds=int(os.environ.get('AI_CACHE_TTL_SECONDS', 86400)),
+    max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', 1000)),
+    collection=db.ai_response_cache if os.environ.get('AI_CACHE_SHARED', '').lower() in ('1', 'true', 'yes') else None
+)
+
+def fallback_ai_response(department: str, strategic_pillar: str):
+    """Department-specific fallback response, or a general default"""
+    response = dict(DEPARTMENT_FALLBACK_RESPONSES.get(department, DEFAULT_FALLBACK_RESPONSE))
+    response["strategic_alignment"] = response["strategic_alignment"].format(strategic_pillar=strategic_pillar)
+    return response
+
+@api_router.post("/ai-helper", response_model=AIHelperResponse)
+async def ai_helper(request: AIHelperRequest):
+    """
+    Generate personalized AI suggestions using live AI (Emergent Universal Key -> GPT-4o).
+    Identical department/challenge pairs are served from ai_helper_cache.
+    Falls back to intelligent mock responses if API fails.
+    """
+    try:
+        strategic_pillar = STRATEGIC_PILLARS.get(request.department, "organizational excellence")
+        cache_key = ResponseCache.make_key(request.department, request.challenge)
+        
+        ai_response = await ai_helper_cache.get(cache_key)
+        if ai_response is not None:
+            logging.info("✅ AI response served from cache")
+        else:
+            # Try live AI first
+            try:
+                # The prompt leaves out the user's name: answers are cached and shared per department/challenge
+                user_prompt = f"""A {request.department} team member has the following challenge:
 
 "{request.challenge}"
 
@@ -177,79 +1255,40 @@ Please provide:
 
 Format your response as JSON with keys: approach, tool, why, strategic_alignment"""
 
-            # Call GPT-4o via Emergent
-            response = await openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=800,
-                response_format={"type": "json_object"}
-            )
-            
-            # Parse response
-            import json
-            ai_response = json.loads(response.choices[0].message.content)
-            
-            # Convert lists to strings if needed (AI sometimes returns steps as arrays)
-            if isinstance(ai_response.get('approach'), list):
-                ai_response['approach'] = '\n'.join(f"{i+1}. {step}" if not step.startswith(f"{i+1}.") else step 
-                                                     for i, step in enumerate(ai_response['approach']))
-            
-            logging.info("✅ Live AI response generated successfully")
-            
-        except Exception as ai_error:
-            logging.warning(f"Live AI failed, using fallback: {str(ai_error)}")
-            
-            # Fallback: Generate intelligent responses based on department
-            responses_by_dept = {
-            "sales": {
-                "approach": "1. Use Copilot in Excel to analyze historical sales data and identify patterns\n2. Create predictive models by asking Copilot to \"analyze trends in deal closures by industry and size\"\n3. Generate automated reports with key insights and forecasts\n4. Use Copilot in Outlook to draft personalized follow-up emails based on customer data\n5. Set up Copilot-powered dashboards to track real-time performance against forecasts",
-                "tool": "Copilot in Excel",
-                "why": "Excel Copilot excels at data analysis and pattern recognition, making it perfect for sales forecasting. It can process large datasets quickly, identify correlations you might miss, and generate actionable insights that help you close deals faster and more predictably.",
-                "strategic_alignment": f"This directly supports {strategic_pillar}, enabling your team to make proactive, data-backed decisions that improve win rates and revenue predictability."
-            },
-            "marketing": {
-                "approach": "1. Use Copilot to brainstorm creative campaign concepts tailored to your target audience\n2. Draft compelling copy for multiple channels (email, social, ads) in minutes\n3. Analyze customer feedback and sentiment from surveys using Copilot in Excel\n4. Generate content calendars and coordinate across teams using Copilot in Teams\n5. Create polished presentations with Copilot in PowerPoint for stakeholder buy-in",
-                "tool": "Copilot",
-                "why": "Copilot streamlines content creation and campaign planning, allowing you to test more ideas faster. It helps maintain brand consistency while adapting tone for different audiences, and frees up time for strategic thinking rather than repetitive writing tasks.",
-                "strategic_alignment": f"This supports {strategic_pillar}, enabling faster campaign launches and more data-informed creative decisions that resonate with customers."
-            },
-            "operations": {
-                "approach": "1. Document your current process in Copilot in Word as a starting point\n2. Ask Copilot to identify potential bottlenecks and inefficiencies\n3. Use Copilot in Teams to capture meeting notes and action items automatically\n4. Create standardized SOPs with Copilot assistance for consistency\n5. Generate process maps and flowcharts to visualize improvements",
-                "tool": "Copilot in Word",
-                "why": "Copilot makes documentation effortless and helps you spot optimization opportunities you might overlook. It ensures your SOPs are clear, comprehensive, and easy to update, which is crucial for maintaining operational excellence as your team grows.",
-                "strategic_alignment": f"This supports {strategic_pillar}, creating the foundation for scalable, efficient operations that free up your team to focus on high-value work."
-            },
-            "leadership": {
-                "approach": "1. Use Copilot to synthesize data from multiple reports into executive summaries\n2. Ask Copilot in PowerPoint to create board-ready presentations with key insights\n3. Analyze market trends and competitive intelligence using Copilot's research capabilities\n4. Draft strategic communications to align your team using Copilot in Outlook\n5. Use Copilot in Teams to stay on top of important discussions without getting lost in threads",
-                "tool": "Copilot in PowerPoint",
-                "why": "Leaders need to make quick, informed decisions without getting bogged down in details. Copilot helps you extract insights from complex data, communicate vision clearly, and stay strategic rather than tactical. It's like having a chief of staff that works 24/7.",
-                "strategic_alignment": f"This supports {strategic_pillar}, enabling you to lead with clarity and confidence while driving AI adoption across the organization."
-            },
-            "it": {
-                "approach": "1. Use Copilot in Word to draft comprehensive technical documentation quickly\n2. Create troubleshooting guides by describing common issues to Copilot\n3. Generate security policies and governance frameworks with Copilot assistance\n4. Use Copilot to document API integrations with clear examples\n5. Build knowledge base articles that make complex tech accessible to non-technical users",
-                "tool": "Copilot in Word",
-                "why": "Good documentation is critical but time-consuming. Copilot accelerates doc creation while maintaining clarity and completeness. It helps you capture institutional knowledge before team members move on, and makes technical concepts accessible to everyone.",
-                "strategic_alignment": f"This supports {strategic_pillar}, building robust technical infrastructure through better knowledge sharing and system documentation."
-            },
-            "customer-service": {
-                "approach": "1. Use Copilot in Outlook to draft empathetic, solution-focused customer responses\n2. Analyze support ticket trends in Excel to identify common pain points\n3. Create comprehensive FAQ documents with Copilot in Word based on frequent inquiries\n4. Generate customer satisfaction survey analysis and insights\n5. Use Copilot to maintain a knowledge base that reduces response time",
-                "tool": "Copilot in Outlook",
-                "why": "Customer service is all about speed and empathy. Copilot helps you respond faster without sacrificing quality, maintain the right tone even when rushed, and scale your support without losing the personal touch. It's like giving every team member superpowers.",
-                "strategic_alignment": f"This supports {strategic_pillar}, enabling you to deliver consistently excellent experiences that build customer loyalty and drive referrals."
-            }
-            }
-            
-            # Get department-specific response or use a default
-            ai_response = responses_by_dept.get(request.department, {
-                "approach": "1. Start by clearly defining your objective and desired outcome\n2. Use Copilot to draft, analyze, or generate content relevant to your challenge\n3. Iterate and refine the output by providing specific feedback\n4. Validate the results and adapt them to your specific context\n5. Share insights with your team to multiply the impact",
-                "tool": "Copilot",
-                "why": "Copilot accelerates your work by handling routine tasks, providing smart suggestions, and helping you focus on what matters most. It's designed to augment your expertise, not replace it.",
-                "strategic_alignment": f"This supports {strategic_pillar}, enabling you to work smarter and achieve better results faster."
-            })
+                # Call GPT-4o via Emergent
+                response = await model_gateway.complete(
+                    "ai_helper",
+                    model="gpt-4o",
+                    messages=[
+                        {"role": "system", "content": AI_HELPER_SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=800,
+                    response_format={"type": "json_object"}
+                )
+                
+                # Parse response
+                ai_response = json.loads(response.choices[0].message.content)
+                
+                # Convert lists to strings if needed (AI sometimes returns steps as arrays)
+                if isinstance(ai_response.get('approach'), list):
+                    ai_response['approach'] = '\n'.join(f"{i+1}. {step}" if not step.startswith(f"{i+1}.") else step 
+                                                         for i, step in enumerate(ai_response['approach']))
+                
+                # Reject incomplete answers before they are cached (ValidationError falls back below)
+                ai_response = AIHelperResponse.model_validate(ai_response).model_dump(exclude={"conversation_id"})
+                
+                # Only live, valid answers are cached so neither the fallback nor a bad answer outlives its request
+                await ai_helper_cache.set(cache_key, ai_response)
+                logging.info("✅ Live AI response generated successfully")
+                
+            except ModelUnavailableError:
+                # Circuit is open: answer from the fallback straight away instead of waiting on a dead upstream
+                ai_response = fallback_ai_response(request.department, strategic_pillar)
+            except Exception as ai_error:
+                logging.warning(f"Live AI failed, using fallback: {str(ai_error)}")
+                ai_response = fallback_ai_response(request.department, strategic_pillar)
         
         # Store in database for analytics
         doc = {
@@ -259,51 +1298,76 @@ Format your response as JSON with keys: approach, tool, why, strategic_alignment
             "response": ai_response,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
-        await db.ai_helper_requests.insert_one(doc)
+        await write_behind.insert("ai_helper_requests", doc)
         
         # Generate conversation ID
         conversation_id = str(uuid.uuid4())
         ai_response['conversation_id'] = conversation_id
         
-        # Store conversation context
+        # Store conversation context inline: the follow-up /ai-chat call may reach another worker
         await db.conversations.insert_one({
             "conversation_id": conversation_id,
             "name": request.name,
             "department": request.department,
             "challenge": request.challenge,
             "initial_response": ai_response,
-            "messages": [],
+            "turn_count": 0,
             "timestamp": datetime.now(timezone.utc).isoformat()
         })
         
         return AIHelperResponse(**ai_response)
         
     except Exception as e:
-        import traceback
         error_details = traceback.format_exc()
         logging.error(f"Error in AI helper: {str(e)}")
         logging.error(f"Full traceback: {error_details}")
         raise HTTPException(status_code=500, detail=f"Error generating AI suggestions: {str(e)}")
 
-@api_router.post("/ai-chat")
-async def ai_chat(chat_request: ChatMessage):
+@api_router.get("/health")
+async def health():
+    """Liveness plus model circuit breaker state; "degraded" while AI answers come from fallbacks"""
+    breaker = model_gateway.breaker.stats()
+    return {
+        "status": "ok" if breaker["state"] == "closed" else "degraded",
+        "model_circuit": breaker
+    }
+
+@api_router.get("/model-gateway/stats")
+async def model_gateway_stats():
+    """In-flight model calls plus per-endpoint queue wait, model time, retries and token counts"""
+    return model_gateway.stats()
+
+@api_router.get("/write-behind/stats")
+async def write_behind_stats():
+    """Queue depth and throughput of the write-behind buffer for analytics inserts"""
+    return write_behind.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition of request, MongoDB, model, certificate and event loop metrics"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api_router.get("/loop-blocking/report")
+async def loop_blocking_report(password: str, reset: bool = False):
     """
-    Continue the conversation with follow-up questions about Microsoft Copilot.
-    Restricted to Copilot-related topics only.
+    Admin endpoint: slow event loop callbacks by route with their most common stacks.
+    Empty unless the server runs with LOOP_BLOCK_DETECTOR=1.
     """
-    try:
-        # Get conversation context
-        conversation = await db.conversations.find_one(
-            {"conversation_id": chat_request.conversation_id},
-            {"_id": 0}
-        )
-        
-        if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        # Build conversation history
-        messages = [
-            {"role": "system", "content": """You are an AI assistant for Dynamics G-Ex, helping employees learn how to use Microsoft Copilot.
+    if password != "Dynamics@26":
+        raise HTTPException(status_code=403, detail="Invalid password")
+    report = loop_block_detector.report()
+    if reset:
+        loop_block_detector.reset()
+    return report
+
+@api_router.get("/ai-helper/cache-stats")
+async def ai_helper_cache_stats():
+    """Hit/miss counters for the AI helper response cache"""
+    return ai_helper_cache.stats()
+
+# ==================== AI CHAT & MODULE ASSISTANT ====================
+
+AI_CHAT_SYSTEM_PROMPT = """You are an AI assistant for Dynamics G-Ex, helping employees learn how to use Microsoft Copilot.
 
 IMPORTANT RESTRICTIONS:
 - ONLY answer questions related to Microsoft Copilot usage (Word, Excel, PowerPoint, Outlook, Teams)
@@ -318,92 +1382,154 @@ Your tone should be:
 - Include smart Aussie humour when appropriate (light and tasteful)
 - IMPORTANT: Always use Australian English spelling (e.g., colour, organisation, behaviour, analyse, optimise, summarise, recognise, personalise, prioritise, favour, honour, centre, travelled, cancelled)
 
-Keep responses concise (2-4 paragraphs max) but helpful."""},
-            {"role": "assistant", "content": f"I provided these initial suggestions:\n\nApproach: {conversation['initial_response']['approach']}\n\nTool: {conversation['initial_response']['tool']}\n\nLet me know if you'd like me to elaborate or if you have follow-up questions!"}
-        ]
-        
-        # Add previous messages from this conversation
-        for msg in conversation.get('messages', []):
-            messages.append({"role": "user", "content": msg['user']})
-            messages.append({"role": "assistant", "content": msg['assistant']})
-        
-        # Add current user message
-        messages.append({"role": "user", "content": chat_request.message})
-        
-        # Call OpenAI
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        assistant_response = response.choices[0].message.content
-        
-        # Store in conversation history
-        await db.conversations.update_one(
-            {"conversation_id": chat_request.conversation_id},
-            {
-                "$push": {
-                    "messages": {
-                        "user": chat_request.message,
-                        "assistant": assistant_response,
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    }
-                }
-            }
-        )
-        
-        return {"response": assistant_response}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logging.error(f"Error in chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+Keep responses concise (2-4 paragraphs max) but helpful."""
 
-@api_router.post("/module-assistant")
-async def module_assistant(request: ModuleAssistantRequest):
+def sse_event(payload: dict):
+    """Format one Server-Sent Events message"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+# Context window: the last N turns verbatim, older turns folded into a rolling summary, all within a token budget
+CONTEXT_RECENT_TURNS = int(os.environ.get('CONTEXT_RECENT_TURNS', 6))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 3000))
+CONTEXT_SUMMARY_MODEL = os.environ.get('CONTEXT_SUMMARY_MODEL', 'gpt-4o-mini')
+CONTEXT_SUMMARY_MAX_CHARS = 2000
+
+CONTEXT_SUMMARY_PROMPT = """You maintain a running summary of a training conversation between an employee and an AI assistant about Microsoft Copilot and AI tools.
+Update the existing summary with the new exchanges. Keep the facts, the user's goals, their department or module context, and any advice already given.
+Write at most 150 words in Australian English. Reply with the summary only."""
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+background_tasks = set()
+
+def estimate_tokens(text: str):
+    """Cheap token estimate (~4 characters per token) used for budgeting prompts"""
+    return len(text or "") // 4 + 4
+
+def build_context_window(preamble: list, conversation: dict, message: str):
     """
-    AI assistant for module-specific questions.
-    Trained on module content to help users understand the material.
+    Assemble the prompt for the next turn: preamble, rolling summary, as many of the last
+    CONTEXT_RECENT_TURNS turns as fit in CONTEXT_TOKEN_BUDGET, then the new user message.
+    Expects conversation["recent_turns"] as loaded by load_recent_turns.
+    """
+    messages = list(preamble)
+    if conversation.get("summary"):
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation['summary']}"})
+    current = {"role": "user", "content": message}
+    
+    budget = CONTEXT_TOKEN_BUDGET - sum(estimate_tokens(m["content"]) for m in messages + [current])
+    
+    # Walk back from the newest turn, stopping at the turn limit or when the budget runs out
+    kept = []
+    for turn in reversed(conversation.get("recent_turns", [])[-CONTEXT_RECENT_TURNS:]):
+        cost = estimate_tokens(turn["user"]) + estimate_tokens(turn["assistant"])
+        if cost > budget:
+            break
+        budget -= cost
+        kept.append(turn)
+    
+    for turn in reversed(kept):
+        messages.append({"role": "user", "content": turn["user"]})
+        messages.append({"role": "assistant", "content": turn["assistant"]})
+    
+    messages.append(current)
+    return messages
+
+def summary_fold_end(conversation: dict):
+    """
+    Last turn seq due to be folded into the summary, or 0 if none is due
+    (folds are batched once 2x CONTEXT_RECENT_TURNS turns are unsummarized)
     """
+    turn_count = conversation.get("turn_count", 0)
+    if turn_count - conversation.get("summary_turns", 0) <= CONTEXT_RECENT_TURNS * 2:
+        return 0
+    return turn_count - CONTEXT_RECENT_TURNS
+
+async def load_recent_turns(conversation: dict):
+    """Attach the newest unsummarized turns (at most CONTEXT_RECENT_TURNS, oldest first) to the conversation"""
+    turns = await db.conversation_turns.find(
+        {"conversation_id": conversation["conversation_id"], "seq": {"$gt": conversation.get("summary_turns", 0)}},
+        {"_id": 0, "seq": 1, "user": 1, "assistant": 1}
+    ).sort("seq", -1).limit(CONTEXT_RECENT_TURNS).to_list(CONTEXT_RECENT_TURNS)
+    conversation["recent_turns"] = turns[::-1]
+    return conversation
+
+async def load_conversation(collection, conversation_id: str):
+    """Fetch a conversation's parent document (never the turn history) plus its recent turns"""
+    conversation = await collection.find_one({"conversation_id": conversation_id}, {"_id": 0, "messages": 0})
+    if conversation:
+        await load_recent_turns(conversation)
+    return conversation
+
+async def summarize_conversation(collection, conversation: dict):
+    """Fold older turns into the stored rolling summary"""
+    fold_end = summary_fold_end(conversation)
+    if not fold_end:
+        return
+    
+    summary_turns = conversation.get("summary_turns", 0)
+    fold = await db.conversation_turns.find(
+        {"conversation_id": conversation["conversation_id"], "seq": {"$gt": summary_turns, "$lte": fold_end}},
+        {"_id": 0, "user": 1, "assistant": 1}
+    ).sort("seq", 1).to_list(None)
+    transcript = "\n\n".join(f"User: {turn['user']}\nAssistant: {turn['assistant']}" for turn in fold)
     try:
-        # Create or retrieve conversation
-        conversation_id = request.conversation_id
-        
-        if conversation_id:
-            # Try to retrieve existing conversation
-            conversation = await db.module_conversations.find_one(
-                {"conversation_id": conversation_id},
-                {"_id": 0}
-            )
-            if not conversation:
-                # Conversation not found, create new one
-                logging.warning(f"Conversation {conversation_id} not found, creating new one")
-                conversation_id = str(uuid.uuid4())
-                conversation = {
-                    "conversation_id": conversation_id,
-                    "module_id": request.module_id,
-                    "module_name": request.module_name,
-                    "messages": [],
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                await db.module_conversations.insert_one(conversation)
-        else:
-            # Create new conversation
-            conversation_id = str(uuid.uuid4())
-            conversation = {
-                "conversation_id": conversation_id,
-                "module_id": request.module_id,
-                "module_name": request.module_name,
-                "messages": [],
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            await db.module_conversations.insert_one(conversation)
+        response = await model_gateway.complete(
+            "conversation_summary",
+            model=CONTEXT_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": CONTEXT_SUMMARY_PROMPT},
+                {"role": "user", "content": f"Existing summary:\n{conversation.get('summary') or '(none)'}\n\nNew exchanges:\n{transcript}"}
+            ],
+            temperature=0.3,
+            max_tokens=300
+        )
+        summary = (response.choices[0].message.content or "")[:CONTEXT_SUMMARY_MAX_CHARS]
         
-        # Build context-aware system prompt
-        system_prompt = f"""You are the DGX AI Expert, a knowledgeable and helpful teacher specialising in Microsoft Copilot, ChatGPT, and AI productivity tools at Dynamics G-Ex. You're currently helping with: {request.module_name}.
+        # Only apply if no other request folded these turns first (a missing field means nothing is folded yet)
+        unchanged = {"summary_turns": summary_turns} if summary_turns else {"summary_turns": {"$in": [0, None]}}
+        await collection.update_one(
+            {"conversation_id": conversation["conversation_id"], **unchanged},
+            {"$set": {"summary": summary, "summary_turns": fold_end}}
+        )
+    except Exception as e:
+        # The token budget still bounds the prompt; the next turn will retry
+        logging.warning(f"Conversation summary failed for {conversation['conversation_id']}: {str(e)}")
+
+def build_ai_chat_messages(conversation: dict, message: str):
+    """Build conversation history for a follow-up question to the AI helper"""
+    preamble = [
+        {"role": "system", "content": AI_CHAT_SYSTEM_PROMPT},
+        {"role": "assistant", "content": f"I provided these initial suggestions:\n\nApproach: {conversation['initial_response']['approach']}\n\nTool: {conversation['initial_response']['tool']}\n\nLet me know if you'd like me to elaborate or if you have follow-up questions!"}
+    ]
+    return build_context_window(preamble, conversation, message)
+
+async def load_module_conversation(request: ModuleAssistantRequest):
+    """Retrieve the module conversation, creating a new one if it is missing"""
+    conversation_id = request.conversation_id
+    
+    if conversation_id:
+        # Try to retrieve existing conversation
+        conversation = await load_conversation(db.module_conversations, conversation_id)
+        if conversation:
+            return conversation_id, conversation
+        # Conversation not found, create new one
+        logging.warning(f"Conversation {conversation_id} not found, creating new one")
+    
+    conversation_id = str(uuid.uuid4())
+    conversation = {
+        "conversation_id": conversation_id,
+        "module_id": request.module_id,
+        "module_name": request.module_name,
+        "turn_count": 0,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    await db.module_conversations.insert_one(conversation)
+    conversation["recent_turns"] = []
+    return conversation_id, conversation
+
+def build_module_assistant_messages(request: ModuleAssistantRequest, conversation: dict):
+    """Build the context-aware prompt and message history for the module assistant"""
+    system_prompt = f"""You are the DGX AI Expert, a knowledgeable and helpful teacher specialising in Microsoft Copilot, ChatGPT, and AI productivity tools at Dynamics G-Ex. You're currently helping with: {request.module_name}.
 
 YOUR ROLE:
 You are an expert instructor who can answer ANY question about Microsoft Copilot, ChatGPT, and AI tools in the workplace. Think of yourself as a friendly teacher who:
@@ -439,19 +1565,106 @@ MODULE CONTEXT (for reference):
 
 Remember: Your goal is to be the most helpful AI teacher possible, ensuring users truly understand and can apply what they learn about Copilot and AI tools."""
 
-        # Build message history
-        messages = [{"role": "system", "content": system_prompt}]
+    return build_context_window([{"role": "system", "content": system_prompt}], conversation, request.message)
+
+async def append_conversation_turn(collection, conversation: dict, user_message: str, assistant_response: str):
+    """
+    Store one completed user/assistant exchange in conversation_turns under the next seq and,
+    when due, refresh the rolling summary in the background
+    """
+    # Allocate the seq on the parent document so concurrent turns never collide
+    parent = await collection.find_one_and_update(
+        {"conversation_id": conversation["conversation_id"]},
+        {"$inc": {"turn_count": 1}},
+        projection={"_id": 0, "conversation_id": 1, "turn_count": 1, "summary": 1, "summary_turns": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    # Inline, not write-behind: the next turn may be served by another worker and must see this one
+    await db.conversation_turns.insert_one({
+        "conversation_id": conversation["conversation_id"],
+        "seq": parent["turn_count"],
+        "user": user_message,
+        "assistant": assistant_response,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
+    
+    if summary_fold_end(parent):
+        task = asyncio.create_task(summarize_conversation(collection, parent))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+async def split_conversation_messages():
+    """Migration: move embedded messages arrays into conversation_turns, one document per turn"""
+    for collection in (db.conversations, db.module_conversations):
+        migrated = 0
+        async for conversation in collection.find({"messages": {"$exists": True}}, {"conversation_id": 1, "messages": 1}):
+            turns = [
+                {
+                    "conversation_id": conversation["conversation_id"],
+                    "seq": seq,
+                    "user": msg.get("user", ""),
+                    "assistant": msg.get("assistant", ""),
+                    "timestamp": msg.get("timestamp", "")
+                }
+                for seq, msg in enumerate(conversation.get("messages") or [], 1)
+            ]
+            await insert_many_ignoring_duplicates(db.conversation_turns, turns)
+            await collection.update_one(
+                {"_id": conversation["_id"]},
+                {"$set": {"turn_count": len(turns)}, "$unset": {"messages": ""}}
+            )
+            migrated += 1
+        if migrated:
+            logging.info(f"Moved messages of {migrated} {collection.name} documents into conversation_turns")
+
+def stream_chat_turn(messages: list, collection, conversation: dict, user_message: str, label: str):
+    """
+    Stream GPT-4o tokens to the client as Server-Sent Events and persist the turn once the stream completes.
+    Events: {"token": ...} per chunk, then {"done": true, "conversation_id": ...} or {"error": ...}.
+    """
+    async def events():
+        parts = []
+        try:
+            async for token in model_gateway.stream(
+                f"{label}_stream",
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1000
+            ):
+                parts.append(token)
+                yield sse_event({"token": token})
+            
+            await append_conversation_turn(collection, conversation, user_message, "".join(parts))
+            yield sse_event({"done": True, "conversation_id": conversation["conversation_id"]})
+        except Exception as e:
+            logging.error(f"Error streaming {label}: {str(e)}")
+            yield sse_event({"error": f"Error processing request: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/ai-chat")
+async def ai_chat(chat_request: ChatMessage):
+    """
+    Continue the conversation with follow-up questions about Microsoft Copilot.
+    Restricted to Copilot-related topics only.
+    """
+    try:
+        # Get conversation context
+        conversation = await load_conversation(db.conversations, chat_request.conversation_id)
         
-        # Add previous messages
-        for msg in conversation.get("messages", []):
-            messages.append({"role": "user", "content": msg["user"]})
-            messages.append({"role": "assistant", "content": msg["assistant"]})
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Add current message
-        messages.append({"role": "user", "content": request.message})
+        messages = build_ai_chat_messages(conversation, chat_request.message)
         
         # Call OpenAI
-        response = await openai_client.chat.completions.create(
+        response = await model_gateway.complete(
+            "ai_chat",
             model="gpt-4o",
             messages=messages,
             temperature=0.7,
@@ -460,28 +1673,191 @@ Remember: Your goal is to be the most helpful AI teacher possible, ensuring user
         
         assistant_response = response.choices[0].message.content
         
-        # Store conversation
-        await db.module_conversations.update_one(
-            {"conversation_id": conversation_id},
-            {
-                "$push": {
-                    "messages": {
-                        "user": request.message,
-                        "assistant": assistant_response,
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    }
-                }
-            }
+        # Store in conversation history
+        await append_conversation_turn(db.conversations, conversation, chat_request.message, assistant_response)
+        
+        return {"response": assistant_response}
+        
+    except HTTPException:
+        raise
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error in chat: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+@api_router.post("/ai-chat/stream")
+async def ai_chat_stream(chat_request: ChatMessage):
+    """
+    Streaming variant of /ai-chat: forwards tokens as Server-Sent Events while GPT-4o generates them.
+    """
+    conversation = await load_conversation(db.conversations, chat_request.conversation_id)
+    
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    messages = build_ai_chat_messages(conversation, chat_request.message)
+    return stream_chat_turn(messages, db.conversations, conversation, chat_request.message, "ai_chat")
+
+@api_router.post("/module-assistant")
+async def module_assistant(request: ModuleAssistantRequest):
+    """
+    AI assistant for module-specific questions.
+    Trained on module content to help users understand the material.
+    """
+    try:
+        # Create or retrieve conversation
+        conversation_id, conversation = await load_module_conversation(request)
+        
+        messages = build_module_assistant_messages(request, conversation)
+        
+        # Call OpenAI
+        response = await model_gateway.complete(
+            "module_assistant",
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1000
         )
         
+        assistant_response = response.choices[0].message.content
+        
+        # Store conversation
+        await append_conversation_turn(db.module_conversations, conversation, request.message, assistant_response)
+        
         return {
             "response": assistant_response,
             "conversation_id": conversation_id
         }
         
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error in module assistant: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+@api_router.post("/module-assistant/stream")
+async def module_assistant_stream(request: ModuleAssistantRequest):
+    """
+    Streaming variant of /module-assistant: forwards tokens as Server-Sent Events while GPT-4o generates them.
+    """
+    try:
+        conversation_id, conversation = await load_module_conversation(request)
     except Exception as e:
         logging.error(f"Error in module assistant: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+    
+    messages = build_module_assistant_messages(request, conversation)
+    return stream_chat_turn(messages, db.module_conversations, conversation, request.message, "module_assistant")
+
+# ==================== MODULE STATS ROLLUP ====================
+
+async def record_module_stats(*submissions: dict):
+    """Fold quiz submissions into their modules' rollup documents with one atomic $inc per module"""
+    increments = {}
+    for submission in submissions:
+        inc = increments.setdefault(submission.get("module_id", 1), {})
+        for field, value in [
+            ("completions", 1),
+            ("score_sum", submission.get("score", 0)),
+            ("time_taken_sum", submission.get("time_taken", 0)),
+            (f"score_histogram.{submission.get('score', 0)}", 1)
+        ]:
+            inc[field] = inc.get(field, 0) + value
+    
+    if increments:
+        await db.module_stats_rollup.bulk_write([
+            UpdateOne({"module_id": module_id}, {"$inc": inc}, upsert=True)
+            for module_id, inc in increments.items()
+        ], ordered=False)
+
+async def rebuild_module_stats_rollup():
+    """Regenerate module_stats_rollup from the full quiz_submissions history"""
+    pipeline = [
+        {"$group": {
+            "_id": {
+                "module_id": {"$ifNull": ["$module_id", 1]},
+                "score": {"$ifNull": ["$score", 0]}
+            },
+            "count": {"$sum": 1},
+            "time_taken_sum": {"$sum": {"$ifNull": ["$time_taken", 0]}}
+        }}
+    ]
+    grouped = await db.quiz_submissions.aggregate(pipeline).to_list(None)
+
+    rollup = {}
+    for row in grouped:
+        module_id = row["_id"]["module_id"]
+        score = row["_id"]["score"]
+        if module_id not in rollup:
+            rollup[module_id] = {
+                "module_id": module_id,
+                "completions": 0,
+                "score_sum": 0,
+                "time_taken_sum": 0,
+                "score_histogram": {}
+            }
+        rollup[module_id]["completions"] += row["count"]
+        rollup[module_id]["score_sum"] += score * row["count"]
+        rollup[module_id]["time_taken_sum"] += row["time_taken_sum"]
+        rollup[module_id]["score_histogram"][str(score)] = row["count"]
+
+    await replace_collection("module_stats_rollup", list(rollup.values()))
+    logging.info(f"Rebuilt module stats rollup for {len(rollup)} modules")
+    return len(rollup)
+
+QUIZ_BULK_MAX_ROWS = 5000
+
+def quiz_submission_doc(submission: QuizSubmission, timestamp: datetime = None) -> dict:
+    """quiz_submissions document for a validated submission"""
+    return {
+        "name": submission.name,
+        "email": submission.email,
+        "email_lc": normalize_email(submission.email),
+        "department": submission.department,
+        "answers": submission.answers,
+        "score": submission.score,
+        "time_taken": submission.time_taken,
+        "feedback": submission.feedback,
+        "module_id": submission.module_id,
+        "module_name": submission.module_name,
+        "timestamp": (timestamp or datetime.now(timezone.utc)).isoformat()
+    }
+
+def parse_bulk_quiz_rows(body: bytes, content_type: str):
+    """Split a JSON array or NDJSON body into (row number, raw text or parsed value) pairs"""
+    try:
+        text = body.decode("utf-8-sig").strip()
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body must be UTF-8 encoded JSON or NDJSON: {str(e)}")
+    if "ndjson" not in content_type and text.startswith("["):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON array: {str(e)}")
+        return list(enumerate(rows, start=1))
+    return [(line_no, line) for line_no, line in enumerate(text.splitlines(), start=1) if line.strip()]
+
+def validate_bulk_quiz_row(row):
+    """Return (quiz_submissions doc, None) or (None, error message) for one bulk row"""
+    try:
+        if isinstance(row, str):
+            row = json.loads(row)
+        if not isinstance(row, dict):
+            return None, "Row must be a JSON object"
+        # Replayed kiosk results keep the time they were taken
+        timestamp = None
+        if row.get("timestamp"):
+            timestamp = datetime.fromisoformat(str(row["timestamp"]).replace("Z", "+00:00"))
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            # Stored timestamps are compared as ISO strings, so they must all be in UTC
+            timestamp = timestamp.astimezone(timezone.utc)
+        return quiz_submission_doc(QuizSubmission.model_validate(row), timestamp), None
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+    except ValueError as e:
+        return None, str(e)
 
 @api_router.post("/quiz-submit")
 async def submit_quiz(submission: QuizSubmission):
@@ -490,127 +1866,216 @@ async def submit_quiz(submission: QuizSubmission):
     """
     try:
         logging.info(f"Received quiz submission from: {submission.name}, email: {submission.email}, module: {submission.module_id}")
-        doc = {
-            "name": submission.name,
-            "email": submission.email,
-            "department": submission.department,
-            "answers": submission.answers,
-            "score": submission.score,
-            "time_taken": submission.time_taken,
-            "feedback": submission.feedback,
-            "module_id": submission.module_id,
-            "module_name": submission.module_name,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
+        doc = quiz_submission_doc(submission)
         result = await db.quiz_submissions.insert_one(doc)
+        await record_module_stats(doc)
+        if submission.email:
+            await update_champion_profile(
+                submission.email, submission.name, submission.department,
+                module_id=submission.module_id, score=submission.score
+            )
+            await invalidate_certificate_eligibility(submission.email)
         logging.info(f"Quiz submission saved successfully with id: {result.inserted_id}")
         return {"success": True}
     except Exception as e:
         logging.error(f"Error submitting quiz: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error submitting quiz: {str(e)}")
 
+@api_router.post("/quiz-submit/bulk")
+async def submit_quiz_bulk(request: Request, password: str):
+    """
+    Admin endpoint to import many quiz submissions at once (classroom cohorts, offline kiosks).
+    Body is a JSON array or NDJSON, one QuizSubmission per row with an optional ISO timestamp.
+    Valid rows are inserted even if others fail; the response reports the outcome of every row.
+    """
+    if password != "Dynamics@26":
+        raise HTTPException(status_code=403, detail="Invalid password")
+    
+    rows = parse_bulk_quiz_rows(await request.body(), request.headers.get("content-type", ""))
+    if len(rows) > QUIZ_BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {QUIZ_BULK_MAX_ROWS} submissions per request")
+    
+    try:
+        results = []
+        docs = []
+        doc_results = []
+        for row_no, row in rows:
+            doc, error = validate_bulk_quiz_row(row)
+            if error:
+                results.append({"row": row_no, "status": "invalid", "error": error})
+            else:
+                results.append({"row": row_no, "status": "inserted"})
+                docs.append(doc)
+                doc_results.append(results[-1])
+        
+        if docs:
+            try:
+                await db.quiz_submissions.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get("writeErrors", []):
+                    doc_results[write_error["index"]].update({"status": "failed", "error": write_error.get("errmsg", "Write failed")})
+        
+        # Derived stats are folded in one bulk write per collection
+        inserted = [doc for doc, result in zip(docs, doc_results) if result["status"] == "inserted"]
+        await record_module_stats(*inserted)
+        
+        profiles = {}
+        for doc in inserted:
+            if not doc["email_lc"]:
+                continue
+            profile = profiles.setdefault(doc["email_lc"], {"name": doc["name"], "department": doc["department"], "scores": {}, "quiz_count": 0})
+            profile["scores"][doc["module_id"]] = max(profile["scores"].get(doc["module_id"], doc["score"]), doc["score"])
+            profile["quiz_count"] += 1
+        if profiles:
+            await db.champion_profiles.bulk_write([
+                champion_profile_update(email, p["name"], p["department"], scores=p["scores"], quiz_count=p["quiz_count"])
+                for email, p in profiles.items()
+            ], ordered=False)
+        for email in profiles:
+            await invalidate_certificate_eligibility(email)
+        
+        logging.info(f"Bulk quiz import: {len(inserted)} of {len(rows)} rows inserted")
+        return {
+            "success": True,
+            "inserted": len(inserted),
+            "failed": len(rows) - len(inserted),
+            "results": results
+        }
+    except Exception as e:
+        logging.error(f"Error importing quiz submissions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error importing quiz submissions: {str(e)}")
+
 @api_router.get("/module-stats")
 async def get_module_stats():
     """
     Get completion stats and average scores for each module
     """
     try:
-        # Get all quiz submissions
-        submissions = await db.quiz_submissions.find({}, {"_id": 0}).to_list(1000)
-        
+        # One small pre-aggregated document per module, maintained by submit_quiz
+        rollups = await db.module_stats_rollup.find({}, {"_id": 0}).to_list(None)
+
         # Calculate stats per module
         module_stats = {}
-        for submission in submissions:
-            module_id = submission.get("module_id", 1)
-            if module_id not in module_stats:
-                module_stats[module_id] = {
-                    "completions": 0,
-                    "total_score": 0,
-                    "count": 0
-                }
-            
-            module_stats[module_id]["completions"] += 1
-            module_stats[module_id]["total_score"] += submission.get("score", 0)
-            module_stats[module_id]["count"] += 1
-        
-        # Calculate average scores
-        for module_id in module_stats:
-            if module_stats[module_id]["count"] > 0:
+        for rollup in rollups:
+            completions = rollup.get("completions", 0)
+            module_stats[rollup["module_id"]] = {
+                "completions": completions,
+                "total_score": rollup.get("score_sum", 0),
+                "count": completions,
                 # Assuming 10 questions per quiz
-                avg_percentage = (module_stats[module_id]["total_score"] / (module_stats[module_id]["count"] * 10)) * 100
-                module_stats[module_id]["avgScore"] = round(avg_percentage)
-            else:
-                module_stats[module_id]["avgScore"] = 0
-        
+                "avgScore": round((rollup.get("score_sum", 0) / (completions * 10)) * 100) if completions else 0
+            }
+
         return module_stats
         
     except Exception as e:
         logging.error(f"Error fetching module stats: {str(e)}")
         return {}
 
+@api_router.post("/module-stats/rebuild")
+async def rebuild_module_stats(password: str):
+    """
+    Admin endpoint to regenerate the module stats rollup from all quiz submissions
+    """
+    if password != "Dynamics@26":
+        raise HTTPException(status_code=403, detail="Invalid password")
+    
+    try:
+        modules = await rebuild_module_stats_rollup()
+        return {"success": True, "modules": modules}
+    except Exception as e:
+        logging.error(f"Error rebuilding module stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding module stats: {str(e)}")
+
+CSV_EXPORT_BATCH_SIZE = 500
+
+def build_quiz_results_filter(module_id: int | None = None, department: str | None = None,
+                              date_from: str | None = None, date_to: str | None = None):
+    """Translate admin filters into a quiz_submissions query (dates are inclusive YYYY-MM-DD days)"""
+    query = {}
+    if module_id is not None:
+        query["module_id"] = module_id
+    if department:
+        query["department"] = department
+    try:
+        # Timestamps are stored as ISO strings, so day boundaries compare lexicographically
+        if date_from:
+            query.setdefault("timestamp", {})["$gte"] = date.fromisoformat(date_from).isoformat()
+        if date_to:
+            query.setdefault("timestamp", {})["$lt"] = (date.fromisoformat(date_to) + timedelta(days=1)).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    return query
+
+def quiz_result_csv_row(sub: dict, answer_keys: list):
+    row = {
+        "name": sub.get("name", ""),
+        "email": sub.get("email", ""),
+        "department": sub.get("department", ""),
+        "module_id": sub.get("module_id", 1),
+        "module_name": sub.get("module_name", f"Module {sub.get('module_id', 1)}"),
+        "score": sub.get("score", 0),
+        "time_taken": sub.get("time_taken", 0),
+        "feedback": sub.get("feedback", ""),
+        "timestamp": sub.get("timestamp", "")
+    }
+    
+    # Add answers
+    if "answers" in sub:
+        for key in answer_keys:
+            row[f"q{key}_answer"] = sub["answers"].get(str(key), {}).get("selected", "")
+            row[f"q{key}_correct"] = "Correct" if sub["answers"].get(str(key), {}).get("correct", False) else "Incorrect"
+    return row
+
 @api_router.get("/quiz-results/download")
-async def download_quiz_results(password: str):
+async def download_quiz_results(password: str, module_id: int | None = None, department: str | None = None,
+                                date_from: str | None = None, date_to: str | None = None):
     """
-    Admin endpoint to download all quiz results as CSV
+    Admin endpoint to download quiz results as CSV, streamed from the database in batches
     """
     if password != "Dynamics@26":
         raise HTTPException(status_code=403, detail="Invalid password")
     
+    query = build_quiz_results_filter(module_id, department, date_from, date_to)
+    
     try:
-        # Get all quiz submissions
-        submissions = await db.quiz_submissions.find({}, {"_id": 0}).to_list(1000)
-        
-        if not submissions:
+        cursor = db.quiz_submissions.find(query, {"_id": 0}).batch_size(CSV_EXPORT_BATCH_SIZE)
+        try:
+            first_submission = await cursor.next()
+        except StopAsyncIteration:
             return {"message": "No quiz submissions found"}
         
-        # Convert to CSV format
-        import csv
-        import io
-        
-        output = io.StringIO()
+        # Columns come from the first submission
+        fieldnames = ["name", "email", "department", "module_id", "module_name", "score", "time_taken", "feedback", "timestamp"]
+        answer_keys = []
+        if "answers" in first_submission and first_submission["answers"]:
+            # Sort answer keys numerically, not alphabetically
+            answer_keys = sorted([int(k) for k in first_submission["answers"].keys()])
+            for key in answer_keys:
+                fieldnames.append(f"q{key}_answer")
+                fieldnames.append(f"q{key}_correct")
         
-        if submissions:
-            # Get all unique answer keys from first submission
-            first_submission = submissions[0]
-            fieldnames = ["name", "email", "department", "module_id", "module_name", "score", "time_taken", "feedback", "timestamp"]
-            
-            # Add answer columns
-            if "answers" in first_submission and first_submission["answers"]:
-                # Sort answer keys numerically, not alphabetically
-                answer_keys = sorted([int(k) for k in first_submission["answers"].keys()])
-                for key in answer_keys:
-                    fieldnames.append(f"q{key}_answer")
-                    fieldnames.append(f"q{key}_correct")
-            
+        async def csv_chunks():
+            # Only one batch of rows is ever held in memory
+            output = io.StringIO()
             writer = csv.DictWriter(output, fieldnames=fieldnames)
             writer.writeheader()
-            
-            for sub in submissions:
-                row = {
-                    "name": sub.get("name", ""),
-                    "email": sub.get("email", ""),
-                    "department": sub.get("department", ""),
-                    "module_id": sub.get("module_id", 1),
-                    "module_name": sub.get("module_name", f"Module {sub.get('module_id', 1)}"),
-                    "score": sub.get("score", 0),
-                    "time_taken": sub.get("time_taken", 0),
-                    "feedback": sub.get("feedback", ""),
-                    "timestamp": sub.get("timestamp", "")
-                }
-                
-                # Add answers
-                if "answers" in sub:
-                    for key in answer_keys:
-                        row[f"q{key}_answer"] = sub["answers"].get(str(key), {}).get("selected", "")
-                        row[f"q{key}_correct"] = "Correct" if sub["answers"].get(str(key), {}).get("correct", False) else "Incorrect"
-                
-                writer.writerow(row)
-        
-        csv_content = output.getvalue()
+            writer.writerow(quiz_result_csv_row(first_submission, answer_keys))
+            rows = 1
+            try:
+                async for sub in cursor:
+                    writer.writerow(quiz_result_csv_row(sub, answer_keys))
+                    rows += 1
+                    if rows % CSV_EXPORT_BATCH_SIZE == 0:
+                        yield output.getvalue()
+                        output.seek(0)
+                        output.truncate(0)
+                yield output.getvalue()
+            finally:
+                await cursor.close()
         
-        from fastapi.responses import Response
-        return Response(
-            content=csv_content,
+        return StreamingResponse(
+            csv_chunks(),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=quiz_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -621,40 +2086,64 @@ async def download_quiz_results(password: str):
         logging.error(f"Error downloading quiz results: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error downloading results: {str(e)}")
 
-@api_router.get("/quiz-results/view")
-async def view_quiz_results(password: str):
+QUIZ_RESULTS_PAGE_SIZE = 100
+QUIZ_RESULTS_MAX_PAGE_SIZE = 500
+
+def encode_results_cursor(sub: dict):
+    return base64.urlsafe_b64encode(f"{sub.get('timestamp', '')}|{sub['_id']}".encode()).decode()
+
+def decode_results_cursor(cursor: str):
+    try:
+        timestamp, object_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return timestamp, ObjectId(object_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@api_router.get("/quiz-results/page")
+async def get_quiz_results_page(password: str, cursor: str | None = None, limit: int = QUIZ_RESULTS_PAGE_SIZE,
+                                module_id: int | None = None, department: str | None = None):
     """
-    Admin endpoint to view quiz results in a copyable HTML table
+    Admin endpoint returning one page of quiz results, newest first, using a (timestamp, _id) keyset cursor
     """
     if password != "Dynamics@26":
         raise HTTPException(status_code=403, detail="Invalid password")
     
+    limit = max(1, min(limit, QUIZ_RESULTS_MAX_PAGE_SIZE))
+    query = build_quiz_results_filter(module_id, department)
+    if cursor:
+        timestamp, object_id = decode_results_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": object_id}}
+        ]}]}
+    
     try:
-        # Get all quiz submissions
-        submissions = await db.quiz_submissions.find({}, {"_id": 0}).to_list(1000)
+        # Fetch one extra row to know whether another page exists
+        submissions = await db.quiz_submissions.find(query).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        
+        next_cursor = encode_results_cursor(submissions[limit - 1]) if len(submissions) > limit else None
+        submissions = submissions[:limit]
+        for sub in submissions:
+            del sub["_id"]
         
-        if not submissions:
-            html = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Quiz Results - No Data</title>
-                <style>
-                    body { font-family: Arial, sans-serif; padding: 40px; text-align: center; }
-                    .message { color: #666; font-size: 18px; }
-                </style>
-            </head>
-            <body>
-                <h1>Quiz Results</h1>
-                <p class="message">No quiz submissions found yet.</p>
-            </body>
-            </html>
-            """
-            from fastapi.responses import HTMLResponse
-            return HTMLResponse(content=html)
+        return {"submissions": submissions, "next_cursor": next_cursor}
         
-        # Build HTML table
-        html = """
+    except Exception as e:
+        logging.error(f"Error fetching quiz results page: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fetching results: {str(e)}")
+
+@api_router.get("/quiz-results/view")
+async def view_quiz_results(password: str):
+    """
+    Admin endpoint to view quiz results in a copyable HTML table.
+    The page is a static shell that loads rows on demand from /api/quiz-results/page.
+    """
+    if password != "Dynamics@26":
+        raise HTTPException(status_code=403, detail="Invalid password")
+    
+    html = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -675,10 +2164,17 @@ async def view_quiz_results(password: str):
                 }
                 h1 { color: #2B8FBD; margin-bottom: 10px; }
                 .info { color: #666; font-size: 14px; margin-bottom: 10px; }
-                .actions {
+                .actions, .filters {
                     margin-top: 15px;
                     display: flex;
                     gap: 10px;
+                    align-items: center;
+                }
+                .filters select, .filters input {
+                    padding: 8px 10px;
+                    border: 1px solid #ddd;
+                    border-radius: 5px;
+                    font-size: 14px;
                 }
                 button {
                     background: #FF8C1A;
@@ -691,6 +2187,7 @@ async def view_quiz_results(password: str):
                     font-weight: 500;
                 }
                 button:hover { background: #e67d15; }
+                button:disabled { background: #ccc; cursor: default; }
                 .table-container {
                     background: white;
                     padding: 20px;
@@ -723,6 +2220,8 @@ async def view_quiz_results(password: str):
                 .score-high { background: #dcfce7; color: #166534; font-weight: 600; }
                 .score-medium { background: #fef3c7; color: #854d0e; font-weight: 600; }
                 .score-low { background: #fee2e2; color: #991b1b; font-weight: 600; }
+                .message { color: #666; font-size: 16px; padding: 20px; text-align: center; }
+                .load-more { margin-top: 15px; text-align: center; }
                 .copied-message {
                     position: fixed;
                     top: 20px;
@@ -740,8 +2239,19 @@ async def view_quiz_results(password: str):
         <body>
             <div class="header">
                 <h1>📊 Quiz Results - AI Training Module</h1>
-                <p class="info">Total Submissions: <strong>""" + str(len(submissions)) + """</strong> | 
+                <p class="info">Loaded Submissions: <strong id="loadedCount">0</strong> | 
                 Generated: <strong>""" + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + """</strong></p>
+                <div class="filters">
+                    <select id="moduleFilter">
+                        <option value="">All modules</option>
+                        <option value="1">Module 1</option>
+                        <option value="2">Module 2</option>
+                        <option value="3">Module 3</option>
+                        <option value="4">Module 4</option>
+                    </select>
+                    <input id="departmentFilter" placeholder="Department">
+                    <button onclick="loadPage(true)">🔍 Filter</button>
+                </div>
                 <div class="actions">
                     <button onclick="copyTable()">📋 Copy Table to Clipboard</button>
                     <button onclick="copyAsCSV()">📄 Copy as CSV</button>
@@ -753,70 +2263,126 @@ async def view_quiz_results(password: str):
             
             <div class="table-container">
                 <table id="resultsTable">
-                    <thead>
-                        <tr>
-                            <th>#</th>
-                            <th>Name</th>
-                            <th>Email</th>
-                            <th>Department</th>
-                            <th>Module</th>
-                            <th>Score</th>
-                            <th>Time (sec)</th>
-                            <th>Feedback</th>
-                            <th>Date</th>
-        """
-        
-        # Add question columns
-        if submissions and "answers" in submissions[0]:
-            # Sort answer keys numerically
-            answer_keys = sorted([int(k) for k in submissions[0]["answers"].keys()])
-            for key in answer_keys:
-                html += f"<th>Q{key} Answer</th><th>Q{key} Result</th>"
-        
-        html += "</tr></thead><tbody>"
-        
-        # Add data rows
-        for idx, sub in enumerate(submissions, 1):
-            score = sub.get("score", 0)
-            total = 10
-            percentage = (score / total) * 100
-            
-            score_class = "score-high" if percentage >= 80 else "score-medium" if percentage >= 60 else "score-low"
-            
-            module_name = sub.get("module_name", f"Module {sub.get('module_id', 1)}")
-            
-            html += f"""
-            <tr>
-                <td>{idx}</td>
-                <td><strong>{sub.get("name", "")}</strong></td>
-                <td>{sub.get("email", "N/A")}</td>
-                <td>{sub.get("department", "").title()}</td>
-                <td>{module_name}</td>
-                <td class="{score_class}">{score}/{total} ({percentage:.0f}%)</td>
-                <td>{sub.get("time_taken", 0)}s</td>
-                <td>{sub.get("feedback", "")}</td>
-                <td>{sub.get("timestamp", "")[:10]}</td>
-            """
-            
-            # Add answers
-            if "answers" in sub:
-                for key in answer_keys:
-                    answer_data = sub["answers"].get(str(key), {})
-                    answer = answer_data.get("selected", "N/A")
-                    is_correct = answer_data.get("correct", False)
-                    result_class = "correct" if is_correct else "incorrect"
-                    result_text = "✓ Correct" if is_correct else "✗ Incorrect"
-                    
-                    html += f"<td>{answer}</td><td class='{result_class}'>{result_text}</td>"
-            
-            html += "</tr>"
-        
-        html += """
-                    </tbody>
+                    <thead><tr id="headerRow"></tr></thead>
+                    <tbody id="resultsBody"></tbody>
                 </table>
+                <p class="message" id="statusMessage">Loading quiz results...</p>
+                <div class="load-more">
+                    <button id="loadMoreButton" onclick="loadPage(false)" style="display: none;">⬇️ Load more</button>
+                </div>
             </div>
             
             <script>
+                const PASSWORD = __PASSWORD__;
+                const BASE_COLUMNS = ['#', 'Name', 'Email', 'Department', 'Module', 'Score', 'Time (sec)', 'Feedback', 'Date'];
+                let nextCursor = null;
+                let answerKeys = null;
+                let rowCount = 0;
+                let loading = false;
+                
+                function cell(row, text, className) {
+                    const td = document.createElement('td');
+                    td.textContent = text;
+                    if (className) td.className = className;
+                    row.appendChild(td);
+                    return td;
+                }
+                
+                function renderHeader() {
+                    const header = document.getElementById('headerRow');
+                    header.innerHTML = '';
+                    const columns = BASE_COLUMNS.slice();
+                    answerKeys.forEach(key => columns.push(`Q${key} Answer`, `Q${key} Result`));
+                    columns.forEach(name => {
+                        const th = document.createElement('th');
+                        th.textContent = name;
+                        header.appendChild(th);
+                    });
+                }
+                
+                function renderRow(sub) {
+                    const total = 10;
+                    const score = sub.score || 0;
+                    const percentage = (score / total) * 100;
+                    const scoreClass = percentage >= 80 ? 'score-high' : percentage >= 60 ? 'score-medium' : 'score-low';
+                    const department = sub.department || '';
+                    
+                    const row = document.createElement('tr');
+                    rowCount += 1;
+                    cell(row, rowCount);
+                    cell(row, sub.name || '').style.fontWeight = 'bold';
+                    cell(row, sub.email || 'N/A');
+                    cell(row, department.charAt(0).toUpperCase() + department.slice(1));
+                    cell(row, sub.module_name || `Module ${sub.module_id || 1}`);
+                    cell(row, `${score}/${total} (${percentage.toFixed(0)}%)`, scoreClass);
+                    cell(row, `${sub.time_taken || 0}s`);
+                    cell(row, sub.feedback || '');
+                    cell(row, (sub.timestamp || '').slice(0, 10));
+                    
+                    if (sub.answers) {
+                        answerKeys.forEach(key => {
+                            const answer = sub.answers[String(key)] || {};
+                            cell(row, answer.selected || 'N/A');
+                            cell(row, answer.correct ? '✓ Correct' : '✗ Incorrect', answer.correct ? 'correct' : 'incorrect');
+                        });
+                    }
+                    return row;
+                }
+                
+                async function loadPage(reset) {
+                    if (loading) return;
+                    loading = true;
+                    const status = document.getElementById('statusMessage');
+                    const button = document.getElementById('loadMoreButton');
+                    const body = document.getElementById('resultsBody');
+                    
+                    if (reset) {
+                        nextCursor = null;
+                        answerKeys = null;
+                        rowCount = 0;
+                        body.innerHTML = '';
+                        document.getElementById('headerRow').innerHTML = '';
+                    }
+                    
+                    const params = new URLSearchParams({ password: PASSWORD });
+                    const moduleId = document.getElementById('moduleFilter').value;
+                    const department = document.getElementById('departmentFilter').value.trim();
+                    if (moduleId) params.set('module_id', moduleId);
+                    if (department) params.set('department', department);
+                    if (nextCursor) params.set('cursor', nextCursor);
+                    
+                    status.textContent = 'Loading quiz results...';
+                    status.style.display = 'block';
+                    button.disabled = true;
+                    
+                    try {
+                        const response = await fetch(`page?${params}`);
+                        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                        const data = await response.json();
+                        
+                        if (answerKeys === null && data.submissions.length) {
+                            // Sort answer keys numerically from the first submission
+                            answerKeys = Object.keys(data.submissions[0].answers || {}).map(Number).sort((a, b) => a - b);
+                            renderHeader();
+                        }
+                        
+                        const fragment = document.createDocumentFragment();
+                        data.submissions.forEach(sub => fragment.appendChild(renderRow(sub)));
+                        body.appendChild(fragment);
+                        
+                        nextCursor = data.next_cursor;
+                        document.getElementById('loadedCount').textContent = rowCount;
+                        status.style.display = rowCount ? 'none' : 'block';
+                        status.textContent = 'No quiz submissions found yet.';
+                        button.style.display = nextCursor ? 'inline-block' : 'none';
+                    } catch (error) {
+                        status.textContent = `Could not load quiz results: ${error.message}`;
+                    } finally {
+                        button.disabled = false;
+                        loading = false;
+                    }
+                }
+                
                 function showCopiedMessage() {
                     const msg = document.getElementById('copiedMessage');
                     msg.style.display = 'block';
@@ -860,33 +2426,295 @@ async def view_quiz_results(password: str):
                         showCopiedMessage();
                     });
                 }
+                
+                loadPage(true);
             </script>
         </body>
         </html>
         """
-        
-        from fastapi.responses import HTMLResponse
-        return HTMLResponse(content=html)
-        
-    except Exception as e:
-        logging.error(f"Error viewing quiz results: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error viewing results: {str(e)}")
+    
+    return HTMLResponse(content=html.replace("__PASSWORD__", json.dumps(password)))
 
-# ==================== SUCCESS STORIES ENDPOINTS ====================
+# ==================== STORY IMAGES ====================
 
-@api_router.get("/success-stories")
-async def get_success_stories():
-    """Get all success stories"""
-    try:
-        stories = await db.success_stories.find({}, {"_id": 0}).sort("timestamp", -1).to_list(100)
-        return {"stories": stories}
-    except Exception as e:
-        logging.error(f"Error fetching success stories: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+# Uploaded story images are stored once on disk, named by the SHA-256 of their bytes, so the
+# same picture shared twice is kept once and its URL never changes (safe to cache forever)
+STORY_IMAGE_DIR = Path(os.environ.get('STORY_IMAGE_DIR', ROOT_DIR / 'story_images'))
+STORY_IMAGE_MAX_BYTES = int(os.environ.get('STORY_IMAGE_MAX_BYTES', 5 * 1024 * 1024))
+STORY_IMAGE_MAX_PIXELS = 40_000_000
+STORY_IMAGE_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+STORY_THUMBNAIL_PIXELS = 640
+STORY_THUMBNAIL_QUALITY = 80
+STORY_IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STORY_IMAGE_URL_MAX_CHARS = 2048
 
-@api_router.post("/success-stories")
-async def create_success_story(story: SuccessStory):
+# image hash -> task writing its thumbnail, so concurrent uploads and reads share one render
+thumbnail_tasks = {}
+
+
+def story_image_urls(image_hash: str) -> dict:
+    return {
+        "imageUrl": f"/api/story-images/{image_hash}",
+        "thumbnailUrl": f"/api/story-images/{image_hash}/thumb"
+    }
+
+
+def decode_data_uri(url: str) -> bytes:
+    """Bytes of a base64 data: URI such as data:image/png;base64,..."""
+    header, _, payload = url.partition(",")
+    if not header.startswith("data:") or not header.endswith(";base64"):
+        raise ValueError("Only base64 data URIs are supported")
+    return base64.b64decode(payload, validate=True)
+
+
+def inspect_story_image(data: bytes) -> str:
+    """File extension for an accepted image, or ValueError describing why it is rejected"""
+    from PIL import Image, UnidentifiedImageError
+    
+    if len(data) > STORY_IMAGE_MAX_BYTES:
+        raise ValueError(f"Images must be at most {STORY_IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+    try:
+        # Only parses the header; pixels are decoded later, off the event loop
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in STORY_IMAGE_FORMATS:
+                raise ValueError(f"Unsupported image format: {image.format}")
+            if image.width * image.height > STORY_IMAGE_MAX_PIXELS:
+                raise ValueError("Image dimensions are too large")
+            return STORY_IMAGE_FORMATS[image.format]
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValueError("Not a recognised image")
+
+
+def story_image_path(image_hash: str) -> Path | None:
+    for extension in STORY_IMAGE_FORMATS.values():
+        path = STORY_IMAGE_DIR / f"{image_hash}.{extension}"
+        if path.exists():
+            return path
+    return None
+
+
+def story_thumbnail_path(image_hash: str) -> Path:
+    return STORY_IMAGE_DIR / f"{image_hash}.thumb.jpg"
+
+
+def render_story_thumbnail(image_hash: str):
+    """Downscale the stored original to a small JPEG next to it (runs in a worker thread)"""
+    from PIL import Image, ImageOps
+    
+    with Image.open(story_image_path(image_hash)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((STORY_THUMBNAIL_PIXELS, STORY_THUMBNAIL_PIXELS))
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=STORY_THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    atomic_write(story_thumbnail_path(image_hash), buffer.getvalue())
+
+
+def schedule_story_thumbnail(image_hash: str) -> asyncio.Task:
+    """Start (or join) the background thumbnail render for an image"""
+    task = thumbnail_tasks.get(image_hash)
+    if task is None:
+        task = asyncio.create_task(asyncio.to_thread(render_story_thumbnail, image_hash))
+        thumbnail_tasks[image_hash] = task
+        
+        def finished(task):
+            thumbnail_tasks.pop(image_hash, None)
+            if not task.cancelled() and task.exception():
+                logging.error(f"Error rendering thumbnail for story image {image_hash}: {task.exception()}")
+        
+        task.add_done_callback(finished)
+    return task
+
+
+async def ingest_story_image(data: bytes) -> str:
+    """
+    Store an image once under its content hash and queue its thumbnail; returns the hash.
+    Raises ValueError for anything that is not an acceptable image.
+    """
+    extension = inspect_story_image(data)
+    image_hash = hashlib.sha256(data).hexdigest()
+    if story_image_path(image_hash) is None:
+        await asyncio.to_thread(atomic_write, STORY_IMAGE_DIR / f"{image_hash}.{extension}", data)
+    if not story_thumbnail_path(image_hash).exists():
+        schedule_story_thumbnail(image_hash)
+    return image_hash
+
+
+def parse_story_image_hash(image_id: str) -> str:
+    image_id = image_id.lower()
+    if len(image_id) != 64 or any(c not in "0123456789abcdef" for c in image_id):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_id
+
+
+@api_router.post("/story-images")
+async def upload_story_image(request: Request):
+    """Upload a story image as the raw request body; returns its full size and thumbnail URLs"""
+    if int(request.headers.get("content-length") or 0) > STORY_IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Images must be at most {STORY_IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+    data = await request.body()
+    try:
+        image_hash = await ingest_story_image(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error storing story image: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"id": image_hash, **story_image_urls(image_hash)}
+
+
+@api_router.get("/story-images/{image_id}")
+async def get_story_image(image_id: str):
+    """Full size story image; content-addressed, so cacheable forever"""
+    path = story_image_path(parse_story_image_hash(image_id))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, headers={"Cache-Control": STORY_IMAGE_CACHE_CONTROL})
+
+
+@api_router.get("/story-images/{image_id}/thumb")
+async def get_story_thumbnail(image_id: str):
+    """Story image thumbnail, rendered on demand if the background render hasn't finished"""
+    image_hash = parse_story_image_hash(image_id)
+    path = story_thumbnail_path(image_hash)
+    if not path.exists():
+        if story_image_path(image_hash) is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            await asyncio.shield(schedule_story_thumbnail(image_hash))
+        except Exception as e:
+            logging.error(f"Error rendering story thumbnail: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error rendering thumbnail")
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": STORY_IMAGE_CACHE_CONTROL})
+
+
+async def resolve_story_image(image_url: str) -> tuple[str, str | None]:
+    """
+    (imageUrl, image_hash) to store for a story: inline data URIs and links to uploaded images
+    are stored by hash; anything else must be a short external link
+    """
+    if not image_url:
+        return "", None
+    if image_url.startswith("data:"):
+        try:
+            image_hash = await ingest_story_image(decode_data_uri(image_url))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return story_image_urls(image_hash)["imageUrl"], image_hash
+    
+    prefix = "/api/story-images/"
+    path = image_url[image_url.find(prefix):] if prefix in image_url else ""
+    if path and "/" not in path[len(prefix):]:
+        image_hash = parse_story_image_hash(path[len(prefix):])
+        if story_image_path(image_hash) is None:
+            raise HTTPException(status_code=400, detail="Unknown story image")
+        return story_image_urls(image_hash)["imageUrl"], image_hash
+    
+    if len(image_url) > STORY_IMAGE_URL_MAX_CHARS:
+        raise HTTPException(status_code=400, detail="Image URL is too long; upload the image instead")
+    return image_url, None
+
+# ==================== SUCCESS STORIES ENDPOINTS ====================
+
+STORIES_PAGE_SIZE = 20
+STORIES_MAX_PAGE_SIZE = 50
+STORY_EXCERPT_CHARS = 400
+
+# List views get an excerpt of the content; the full story comes from /success-stories/{id}
+STORY_LIST_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "department": 1,
+    "title": 1,
+    "content": {"$substrCP": ["$content", 0, STORY_EXCERPT_CHARS]},
+    "truncated": {"$gt": [{"$strLenCP": "$content"}, STORY_EXCERPT_CHARS]},
+    # Uploaded images are only referenced by their thumbnail in the feed
+    "imageUrl": {"$cond": [{"$ifNull": ["$image_hash", False]}, "$$REMOVE", "$imageUrl"]},
+    "thumbnailUrl": {"$cond": [
+        {"$ifNull": ["$image_hash", False]},
+        {"$concat": ["/api/story-images/", "$image_hash", "/thumb"]},
+        "$$REMOVE"
+    ]},
+    "linkUrl": 1,
+    "likes": 1,
+    "timestamp": 1
+}
+
+# Only the first page at the default size is cached; create and like invalidate it in this
+# process and the TTL bounds how long another worker can serve it stale
+stories_cache = ResponseCache(
+    "success-stories",
+    ttl_seconds=int(os.environ.get('STORIES_CACHE_TTL_SECONDS', 30)),
+    max_entries=1
+)
+STORIES_FIRST_PAGE_KEY = "first-page"
+
+def encode_stories_cursor(story: dict):
+    return base64.urlsafe_b64encode(f"{story.get('timestamp', '')}|{story['id']}".encode()).decode()
+
+def decode_stories_cursor(cursor: str):
+    try:
+        timestamp, story_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return timestamp, story_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@api_router.get("/success-stories")
+async def get_success_stories(cursor: str | None = None, limit: int = STORIES_PAGE_SIZE):
+    """Get one page of success stories, newest first, using a (timestamp, id) keyset cursor"""
+    limit = max(1, min(limit, STORIES_MAX_PAGE_SIZE))
+    query = {}
+    if cursor:
+        timestamp, story_id = decode_stories_cursor(cursor)
+        query = {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": story_id}}
+        ]}
+    
+    first_page = not cursor and limit == STORIES_PAGE_SIZE
+    if first_page:
+        cached = await stories_cache.get(STORIES_FIRST_PAGE_KEY)
+        if cached is not None:
+            return cached
+    
+    try:
+        # Fetch one extra row to know whether another page exists
+        stories = await db.success_stories.find(query, STORY_LIST_PROJECTION).sort(
+            [("timestamp", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        
+        next_cursor = encode_stories_cursor(stories[limit - 1]) if len(stories) > limit else None
+        page = {"stories": stories[:limit], "next_cursor": next_cursor}
+        if first_page:
+            await stories_cache.set(STORIES_FIRST_PAGE_KEY, page)
+        return page
+    except Exception as e:
+        logging.error(f"Error fetching success stories: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/success-stories/{story_id}")
+async def get_success_story(story_id: str):
+    """Get a single success story with its full content"""
+    try:
+        story = await db.success_stories.find_one({"id": story_id}, {"_id": 0})
+    except Exception as e:
+        logging.error(f"Error fetching success story: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return story
+
+@api_router.post("/success-stories")
+async def create_success_story(story: SuccessStory):
     """Create a new success story"""
+    image_url, image_hash = await resolve_story_image(story.imageUrl)
     try:
         doc = {
             "id": str(uuid.uuid4()),
@@ -895,13 +2723,16 @@ async def create_success_story(story: SuccessStory):
             "department": story.department,
             "title": story.title,
             "content": story.content,
-            "imageUrl": story.imageUrl,
+            "imageUrl": image_url,
+            "image_hash": image_hash,
             "linkUrl": story.linkUrl,
             "likes": 0,
-            "liked_by": [],
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         await db.success_stories.insert_one(doc)
+        await stories_cache.delete(STORIES_FIRST_PAGE_KEY)
+        if story.email:
+            await update_champion_profile(story.email, story.name, story.department, stories_shared=1)
         return {"message": "Story created successfully", "id": doc["id"]}
     except Exception as e:
         logging.error(f"Error creating success story: {str(e)}")
@@ -913,36 +2744,39 @@ async def like_story(story_id: str, like: StoryLike):
     try:
         # Check if user has completed at least one quiz
         quiz_submission = await db.quiz_submissions.find_one(
-            {"email": like.email.lower()},
-            {"_id": 0}
+            {"email_lc": normalize_email(like.email)},
+            {"_id": 1}
         )
         
-        # Also check with case-insensitive search
-        if not quiz_submission:
-            quiz_submission = await db.quiz_submissions.find_one(
-                {"email": {"$regex": f"^{like.email}$", "$options": "i"}},
-                {"_id": 0}
-            )
-        
         if not quiz_submission:
             raise HTTPException(status_code=403, detail="You must complete at least one quiz to like stories")
         
-        # Check if already liked
-        story = await db.success_stories.find_one({"id": story_id}, {"_id": 0})
+        story = await db.success_stories.find_one(
+            {"id": story_id},
+            {"_id": 0, "email": 1, "name": 1, "department": 1}
+        )
         if not story:
             raise HTTPException(status_code=404, detail="Story not found")
         
-        if like.email.lower() in [e.lower() for e in story.get("liked_by", [])]:
+        # One story_likes document per (story, email): only the request that creates it counts the like
+        try:
+            result = await db.story_likes.update_one(
+                {"story_id": story_id, "email_lc": normalize_email(like.email)},
+                {"$setOnInsert": {"timestamp": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
+            first_like = result.upserted_id is not None
+        except DuplicateKeyError:
+            # A concurrent request for the same like inserted it first
+            first_like = False
+        if not first_like:
             raise HTTPException(status_code=400, detail="You've already liked this story")
         
         # Add like
-        await db.success_stories.update_one(
-            {"id": story_id},
-            {
-                "$inc": {"likes": 1},
-                "$push": {"liked_by": like.email.lower()}
-            }
-        )
+        await db.success_stories.update_one({"id": story_id}, {"$inc": {"likes": 1}})
+        await stories_cache.delete(STORIES_FIRST_PAGE_KEY)
+        if story.get("email"):
+            await update_champion_profile(story["email"], story.get("name", "Unknown"), story.get("department", ""), likes_received=1)
         
         return {"message": "Story liked!"}
     except HTTPException:
@@ -951,113 +2785,233 @@ async def like_story(story_id: str, like: StoryLike):
         logging.error(f"Error liking story: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== CERTIFICATE ELIGIBILITY ====================
+
+CERTIFICATE_MODULES = [
+    {"id": 1, "name": "Module 1: AI Fundamentals"},
+    {"id": 2, "name": "Module 2: Governance"},
+    {"id": 3, "name": "Module 3: Practical Applications"},
+    {"id": 4, "name": "Module 4: AI Champions"}
+]
+CERTIFICATE_PASS_SCORE = 7  # Out of 10, i.e. 70%+
+CERTIFICATE_TEST_EMAIL = "certificate@dynamicsgex.com.au"
+
+# Best scores only change on quiz submission, which invalidates this process's entry.
+# The TTL bounds how long another worker can serve a stale result.
+eligibility_cache = ResponseCache(
+    "certificate-eligibility",
+    ttl_seconds=int(os.environ.get('ELIGIBILITY_CACHE_TTL_SECONDS', 60)),
+    max_entries=int(os.environ.get('ELIGIBILITY_CACHE_MAX_ENTRIES', 10000))
+)
+
+async def get_certificate_eligibility(email: str) -> dict:
+    """
+    Certificate eligibility for an email: best score per module in one aggregation over the
+    email_lc index, shared by the check and generate endpoints
+    """
+    email = normalize_email(email)
+    key = eligibility_cache.make_key(email)
+    cached = await eligibility_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Test bypass - skip eligibility check for this email
+    if email == CERTIFICATE_TEST_EMAIL:
+        module_scores = {mod["id"]: 10 for mod in CERTIFICATE_MODULES}
+    else:
+        best = await db.quiz_submissions.aggregate([
+            {"$match": {"email_lc": email}},
+            {"$group": {
+                "_id": {"$ifNull": ["$module_id", 1]},
+                "score": {"$max": {"$ifNull": ["$score", 0]}}
+            }}
+        ]).to_list(None)
+        module_scores = {row["_id"]: row["score"] for row in best}
+    
+    result_modules = []
+    missing_modules = []
+    for mod in CERTIFICATE_MODULES:
+        score = module_scores.get(mod["id"])
+        passed = score is not None and score >= CERTIFICATE_PASS_SCORE
+        if not passed:
+            if score is None:
+                missing_modules.append(mod["name"])
+            else:
+                missing_modules.append(f"{mod['name']} (score: {score}/10, need {CERTIFICATE_PASS_SCORE}+)")
+        
+        result_modules.append({
+            "name": mod["name"],
+            "score": score * 10 if score is not None else None,  # Convert to percentage
+            "passed": passed
+        })
+    
+    if not missing_modules:
+        message = "Congratulations! You've completed all modules with 70%+ scores!"
+    else:
+        message = "To earn your certificate, please complete the following:\n" + "\n".join(f"• {m}" for m in missing_modules)
+    
+    eligibility = {"eligible": not missing_modules, "message": message, "modules": result_modules}
+    await eligibility_cache.set(key, eligibility)
+    return eligibility
+
+async def invalidate_certificate_eligibility(email: str):
+    await eligibility_cache.delete(eligibility_cache.make_key(normalize_email(email)))
+
 # ==================== CHAMPIONS DASHBOARD ENDPOINTS ====================
 
+CHAMPION_MODULES = [mod["id"] for mod in CERTIFICATE_MODULES]
+
+# Impact score: quizzes completed * 20 + stories * 15 + likes * 5 + avg score bonus
+CHAMPION_IMPACT_SCORE = {"$round": [{"$add": [
+    {"$multiply": [{"$size": {"$objectToArray": "$best_scores"}}, 20]},
+    {"$multiply": ["$stories_shared", 15]},
+    {"$multiply": ["$likes_received", 5]},
+    {"$divide": [{"$ifNull": [{"$avg": {"$map": {"input": {"$objectToArray": "$best_scores"}, "in": "$$this.v"}}}, 0]}, 10]}
+]}, 0]}
+
+# Certified champions have all 4 modules with 70%+
+CHAMPION_CERTIFIED = {"$and": [
+    {"$gte": [{"$ifNull": [f"$best_scores.{module_id}", 0]}, CERTIFICATE_PASS_SCORE]} for module_id in CHAMPION_MODULES
+]}
+
+def champion_profile_update(email: str, name: str, department: str, scores: dict = None, quiz_count: int = 0,
+                            stories_shared: int = 0, likes_received: int = 0) -> UpdateOne:
+    """Upsert folding quiz scores ({module_id: score}), stories and likes into a champion_profiles document"""
+    best_scores = {"$ifNull": ["$best_scores", {}]}
+    if scores:
+        # Track best score per module
+        best_scores = {"$mergeObjects": [best_scores, {
+            str(module_id): {"$max": [{"$ifNull": [f"$best_scores.{module_id}", score]}, score]}
+            for module_id, score in scores.items()
+        }]}
+    
+    return UpdateOne(
+        {"email": normalize_email(email)},
+        [
+            {"$set": {
+                # $literal: a user-supplied value starting with "$" must not be read as a field path
+                "name": {"$ifNull": ["$name", {"$literal": name}]},
+                "department": {"$ifNull": ["$department", {"$literal": department}]},
+                "best_scores": best_scores,
+                "quiz_count": {"$add": [{"$ifNull": ["$quiz_count", 0]}, quiz_count]},
+                "stories_shared": {"$add": [{"$ifNull": ["$stories_shared", 0]}, stories_shared]},
+                "likes_received": {"$add": [{"$ifNull": ["$likes_received", 0]}, likes_received]}
+            }},
+            {"$set": {
+                "impact_score": CHAMPION_IMPACT_SCORE,
+                "certified": CHAMPION_CERTIFIED
+            }}
+        ],
+        upsert=True
+    )
+
+async def update_champion_profile(email: str, name: str, department: str, module_id: int = None, score: int = 0,
+                                  stories_shared: int = 0, likes_received: int = 0):
+    """Apply one quiz/story/like event to a user's champion_profiles document and recompute their impact score"""
+    scores = {module_id: score} if module_id is not None else None
+    await db.champion_profiles.bulk_write([champion_profile_update(
+        email, name, department, scores=scores, quiz_count=1 if scores else 0,
+        stories_shared=stories_shared, likes_received=likes_received
+    )])
+
+async def rebuild_champion_profiles():
+    """Regenerate champion_profiles from the full quiz and story history"""
+    profiles = {}
+    
+    def profile_for(email, name, department):
+        if email not in profiles:
+            profiles[email] = {
+                "email": email,
+                "name": name,
+                "department": department,
+                "best_scores": {},
+                "quiz_count": 0,
+                "stories_shared": 0,
+                "likes_received": 0
+            }
+        return profiles[email]
+    
+    quiz_pipeline = [
+        {"$match": {"email_lc": {"$nin": ["", None]}}},
+        {"$group": {
+            "_id": {"email": "$email_lc", "module_id": {"$ifNull": ["$module_id", 1]}},
+            "best_score": {"$max": {"$ifNull": ["$score", 0]}},
+            "count": {"$sum": 1},
+            "name": {"$first": "$name"},
+            "department": {"$first": "$department"}
+        }}
+    ]
+    async for row in db.quiz_submissions.aggregate(quiz_pipeline):
+        profile = profile_for(row["_id"]["email"], row.get("name") or "Unknown", row.get("department") or "")
+        profile["best_scores"][str(row["_id"]["module_id"])] = row["best_score"]
+        profile["quiz_count"] += row["count"]
+    
+    story_pipeline = [
+        {"$match": {"email": {"$nin": ["", None]}}},
+        {"$group": {
+            "_id": {"$toLower": {"$trim": {"input": "$email"}}},
+            "stories": {"$sum": 1},
+            "likes": {"$sum": {"$ifNull": ["$likes", 0]}},
+            "name": {"$first": "$name"},
+            "department": {"$first": "$department"}
+        }}
+    ]
+    async for row in db.success_stories.aggregate(story_pipeline):
+        profile = profile_for(row["_id"], row.get("name") or "Unknown", row.get("department") or "")
+        profile["stories_shared"] += row["stories"]
+        profile["likes_received"] += row["likes"]
+    
+    for profile in profiles.values():
+        scores = list(profile["best_scores"].values())
+        avg_score = sum(scores) / len(scores) if scores else 0
+        profile["impact_score"] = round(
+            len(scores) * 20 +
+            profile["stories_shared"] * 15 +
+            profile["likes_received"] * 5 +
+            (avg_score / 10)
+        )
+        profile["certified"] = all(
+            profile["best_scores"].get(str(m), 0) >= CERTIFICATE_PASS_SCORE for m in CHAMPION_MODULES
+        )
+    
+    await replace_collection("champion_profiles", list(profiles.values()))
+    logging.info(f"Rebuilt {len(profiles)} champion profiles")
+    return len(profiles)
+
 @api_router.get("/champions/dashboard")
 async def get_champions_dashboard():
     """Get dashboard stats and leaderboard for Champions Toolkit"""
     try:
-        # Get all quiz submissions
-        quiz_submissions = await db.quiz_submissions.find({}, {"_id": 0}).to_list(1000)
-        
-        # Get all success stories
-        stories = await db.success_stories.find({}, {"_id": 0}).to_list(100)
-        
-        # Calculate stats
-        total_likes = sum(story.get("likes", 0) for story in stories)
+        # Top 10 straight off the impact_score index
+        profiles = await db.champion_profiles.find(
+            {},
+            {"_id": 0, "name": 1, "department": 1, "best_scores": 1, "stories_shared": 1, "impact_score": 1}
+        ).sort("impact_score", -1).limit(10).to_list(10)
         
-        # Count unique users who completed all 4 modules with 70%+
-        certified_champions = set()
-        user_quiz_data = {}
-        
-        for sub in quiz_submissions:
-            email = sub.get("email", "").lower()
-            name = sub.get("name", "Unknown")
-            dept = sub.get("department", "")
-            module_id = sub.get("module_id", 1)
-            score = sub.get("score", 0)
-            
-            if email:
-                if email not in user_quiz_data:
-                    user_quiz_data[email] = {
-                        "name": name,
-                        "department": dept,
-                        "modules": {},
-                        "total_quizzes": 0
-                    }
-                
-                # Track best score per module
-                if module_id not in user_quiz_data[email]["modules"] or score > user_quiz_data[email]["modules"][module_id]:
-                    user_quiz_data[email]["modules"][module_id] = score
-                
-                user_quiz_data[email]["total_quizzes"] += 1
-        
-        # Count certified champions (all 4 modules with 70%+)
-        for email, data in user_quiz_data.items():
-            modules = data["modules"]
-            if len(modules) >= 4:
-                all_passed = all(modules.get(i, 0) >= 70 for i in [1, 2, 3, 4])
-                if all_passed:
-                    certified_champions.add(email)
-        
-        # Build leaderboard combining quiz and story data
-        leaderboard_data = {}
-        
-        # Add quiz data to leaderboard
-        for email, data in user_quiz_data.items():
-            leaderboard_data[email] = {
-                "name": data["name"],
-                "department": data["department"],
-                "quizzesCompleted": len(data["modules"]),
-                "avgScore": sum(data["modules"].values()) / len(data["modules"]) if data["modules"] else 0,
-                "storiesShared": 0,
-                "likesReceived": 0
+        leaderboard = [
+            {
+                "name": profile.get("name", "Unknown"),
+                "department": profile.get("department", ""),
+                "quizzesCompleted": len(profile.get("best_scores", {})),
+                "storiesShared": profile.get("stories_shared", 0),
+                "impactScore": profile.get("impact_score", 0)
             }
+            for profile in profiles
+        ]
         
-        # Add story data to leaderboard
-        for story in stories:
-            email = story.get("email", "").lower()
-            if email:
-                if email not in leaderboard_data:
-                    leaderboard_data[email] = {
-                        "name": story.get("name", "Unknown"),
-                        "department": story.get("department", ""),
-                        "quizzesCompleted": 0,
-                        "avgScore": 0,
-                        "storiesShared": 0,
-                        "likesReceived": 0
-                    }
-                leaderboard_data[email]["storiesShared"] += 1
-                leaderboard_data[email]["likesReceived"] += story.get("likes", 0)
-        
-        # Calculate impact score and create sorted leaderboard
-        leaderboard = []
-        for email, data in leaderboard_data.items():
-            # Impact score: quizzes completed * 20 + stories * 15 + likes * 5 + avg score bonus
-            impact_score = (
-                data["quizzesCompleted"] * 20 +
-                data["storiesShared"] * 15 +
-                data["likesReceived"] * 5 +
-                (data["avgScore"] / 10)  # Bonus for high quiz scores
-            )
-            leaderboard.append({
-                "name": data["name"],
-                "department": data["department"],
-                "quizzesCompleted": data["quizzesCompleted"],
-                "storiesShared": data["storiesShared"],
-                "impactScore": round(impact_score)
-            })
+        # Total completions come from the per-module rollup rather than counting raw submissions
+        rollups = await db.module_stats_rollup.find({}, {"_id": 0, "completions": 1}).to_list(None)
         
-        # Sort by impact score descending, take top 10
-        leaderboard.sort(key=lambda x: x["impactScore"], reverse=True)
-        leaderboard = leaderboard[:10]
+        likes = await db.success_stories.aggregate([
+            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$likes", 0]}}}}
+        ]).to_list(1)
         
         return {
             "stats": {
-                "champions": len(certified_champions),
-                "modulesCompleted": len(quiz_submissions),
-                "storiesShared": len(stories),
-                "totalLikes": total_likes
+                "champions": await db.champion_profiles.count_documents({"certified": True}),
+                "modulesCompleted": sum(r.get("completions", 0) for r in rollups),
+                "storiesShared": await db.success_stories.count_documents({}),
+                "totalLikes": likes[0]["total"] if likes else 0
             },
             "leaderboard": leaderboard
         }
@@ -1066,385 +3020,476 @@ async def get_champions_dashboard():
         logging.error(f"Error fetching champions dashboard: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/champions/rebuild")
+async def rebuild_champions(password: str):
+    """
+    Admin endpoint to regenerate champion profiles from all quiz submissions and stories.
+    Also re-evaluates every stored certified flag, so run it once after the eligibility rule changes.
+    """
+    if password != "Dynamics@26":
+        raise HTTPException(status_code=403, detail="Invalid password")
+    
+    try:
+        profiles = await rebuild_champion_profiles()
+        return {"success": True, "profiles": profiles}
+    except Exception as e:
+        logging.error(f"Error rebuilding champion profiles: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding champion profiles: {str(e)}")
+
 # ==================== CERTIFICATE ENDPOINTS ====================
 
+CERTIFICATE_PATTERN_SPACING = 100  # Space between logos in the background pattern
+CERTIFICATE_PATTERN_LOGO_SIZE = 30  # Size of each logo in the pattern
+CERTIFICATE_PATTERN_LOGO_PIXELS = CERTIFICATE_PATTERN_LOGO_SIZE * 4  # ~300 dpi at the drawn size
+
+# Rendering runs in worker processes so a burst of certificates never blocks the event loop.
+# CERTIFICATE_WORKERS=0 renders inline on the event loop instead.
+CERTIFICATE_WORKERS = int(os.environ.get('CERTIFICATE_WORKERS', 2))
+# Renders allowed to wait for a free worker before new requests get a 503
+CERTIFICATE_MAX_QUEUE = int(os.environ.get('CERTIFICATE_MAX_QUEUE', 20))
+CERTIFICATE_RETRY_AFTER_SECONDS = 5
+# Rendered certificates, one file per issued certificate ID
+CERTIFICATE_CACHE_DIR = Path(os.environ.get('CERTIFICATE_CACHE_DIR', ROOT_DIR / 'certificate_cache'))
+
+_certificate_template = None
+certificate_executor = None
+certificate_jobs = 0
+
+
+def certificate_pattern_logo(path):
+    """Decode a pattern logo once, downscaled to the resolution it is drawn at"""
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+    
+    image = Image.open(path)
+    image.thumbnail((CERTIFICATE_PATTERN_LOGO_PIXELS, CERTIFICATE_PATTERN_LOGO_PIXELS))
+    return ImageReader(image)
+
+
+def render_certificate_template() -> bytes:
+    """
+    Render everything on the certificate that is the same for every recipient:
+    gradient, logo pattern, borders, header, fixed wording, footer and seal
+    """
+    from reportlab.lib.pagesizes import landscape, A4
+    from reportlab.lib import colors
+    from reportlab.pdfgen import canvas
+    import math
+    
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=landscape(A4))
+    width, height = landscape(A4)
+    
+    # Define brand colors
+    # Dynamics G-Ex: Orange (#F37021) and Blue (#0066B3)
+    # Copilot: Purple (#7B83EB), Blue (#0078D4), Teal (#00B7C3)
+    dgx_orange = colors.Color(0.95, 0.44, 0.13)  # #F37021
+    copilot_purple = colors.Color(0.48, 0.51, 0.92)  # #7B83EB
+    gold = colors.Color(0.85, 0.65, 0.13)
+    
+    # Create gradient background
+    # Draw multiple rectangles to simulate gradient
+    steps = 50
+    for i in range(steps):
+        ratio = i / steps
+        # Blend from light orange-cream at top to light purple-blue at bottom
+        r = 0.99 - (ratio * 0.04)  # 0.99 to 0.95
+        g = 0.96 - (ratio * 0.06)  # 0.96 to 0.90
+        b = 0.93 + (ratio * 0.05)  # 0.93 to 0.98
+        c.setFillColor(colors.Color(r, g, b))
+        strip_height = height / steps
+        c.rect(0, height - (i + 1) * strip_height, width, strip_height + 1, fill=True, stroke=False)
+    
+    # Draw subtle logo pattern in background using actual logo images
+    pattern_logos = []
+    for filename in ['molecule-icon.png', 'copilot-icon.png']:
+        try:
+            pattern_logos.append(certificate_pattern_logo(ROOT_DIR / filename))
+        except Exception as e:
+            logging.warning(f"Skipping certificate pattern logo {filename}: {str(e)}")
+            pattern_logos.append(None)
+    
+    spacing = CERTIFICATE_PATTERN_SPACING
+    logo_size = CERTIFICATE_PATTERN_LOGO_SIZE
+    c.saveState()
+    c.setFillAlpha(0.07)  # 7% opacity
+    
+    # Create alternating pattern of both logos
+    for row in range(int(height / spacing) + 2):
+        for col in range(int(width / spacing) + 2):
+            # Offset alternate rows for a more organic pattern
+            x_offset = (spacing / 2) if row % 2 else 0
+            x = col * spacing + x_offset - 20
+            y = row * spacing - 20
+            
+            # Skip if outside bounds
+            if x < -logo_size or x > width + logo_size or y < -logo_size or y > height + logo_size:
+                continue
+            
+            # Alternate between molecule and copilot logos
+            logo = pattern_logos[(row + col) % 2]
+            if logo is not None:
+                c.drawImage(logo, x, y, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
+    
+    c.restoreState()
+    
+    # Decorative corner flourishes
+    c.setStrokeColor(gold)
+    c.setLineWidth(2)
+    
+    # Top-left corner
+    c.line(40, height - 40, 40, height - 80)
+    c.line(40, height - 40, 80, height - 40)
+    
+    # Top-right corner
+    c.line(width - 40, height - 40, width - 40, height - 80)
+    c.line(width - 40, height - 40, width - 80, height - 40)
+    
+    # Bottom-left corner
+    c.line(40, 40, 40, 80)
+    c.line(40, 40, 80, 40)
+    
+    # Bottom-right corner
+    c.line(width - 40, 40, width - 40, 80)
+    c.line(width - 40, 40, width - 80, 40)
+    
+    # Elegant double border
+    c.setStrokeColor(gold)
+    c.setLineWidth(3)
+    c.roundRect(25, 25, width - 50, height - 50, 10, fill=False)
+    
+    c.setStrokeColor(colors.Color(0.75, 0.55, 0.08))
+    c.setLineWidth(1)
+    c.roundRect(35, 35, width - 70, height - 70, 8, fill=False)
+    
+    # Header - Company Logo Image
+    logo_path = ROOT_DIR / 'dynamics-gex-logo-header.png'
+    if logo_path.exists():
+        # Draw the logo centered at top
+        logo_width = 180  # Adjust size as needed
+        logo_height = 50  # Adjust based on aspect ratio
+        logo_x = (width - logo_width) / 2
+        logo_y = height - 95
+        c.drawImage(str(logo_path), logo_x, logo_y, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
+    
+    # Decorative line under header
+    c.setStrokeColor(gold)
+    c.setLineWidth(0.5)
+    c.line(width/2 - 100, height - 105, width/2 + 100, height - 105)
+    
+    # Certificate Title (elegant serif font)
+    c.setFillColor(colors.Color(0.15, 0.15, 0.15))
+    c.setFont("Times-Bold", 42)
+    c.drawCentredString(width / 2, height - 155, "Certificate of Achievement")
+    
+    # Decorative elements around title
+    c.setStrokeColor(gold)
+    c.setLineWidth(1)
+    c.line(width/2 - 220, height - 170, width/2 - 80, height - 170)
+    c.line(width/2 + 80, height - 170, width/2 + 220, height - 170)
+    
+    # Small diamond decorations
+    c.setFillColor(gold)
+    for x_offset in [-230, 230]:
+        cx = width/2 + x_offset
+        cy = height - 170
+        c.saveState()
+        c.translate(cx, cy)
+        c.rotate(45)
+        c.rect(-3, -3, 6, 6, fill=True, stroke=False)
+        c.restoreState()
+    
+    # "This is to certify that"
+    c.setFont("Times-Italic", 16)
+    c.setFillColor(colors.Color(0.4, 0.4, 0.4))
+    c.drawCentredString(width / 2, height - 205, "This is to certify that")
+    
+    # Achievement description
+    c.setFont("Times-Roman", 14)
+    c.setFillColor(colors.Color(0.35, 0.35, 0.35))
+    c.drawCentredString(width / 2, height - 300, "has successfully completed the")
+    
+    c.setFont("Times-Bold", 22)
+    c.setFillColor(colors.Color(0.2, 0.2, 0.2))
+    c.drawCentredString(width / 2, height - 330, "DGX AI Champions Training Program")
+    
+    c.setFont("Times-Roman", 14)
+    c.setFillColor(colors.Color(0.35, 0.35, 0.35))
+    c.drawCentredString(width / 2, height - 355, "and is hereby recognized as a")
+    
+    # Champion Title (grand, prominent)
+    c.setFont("Times-Bold", 32)
+    c.setFillColor(gold)
+    c.drawCentredString(width / 2, height - 395, "DGX AI CHAMPION")
+    
+    # Copilot proficiency note
+    c.setFont("Times-Italic", 12)
+    c.setFillColor(copilot_purple)
+    c.drawCentredString(width / 2, height - 420, "Demonstrating proficiency in Microsoft Copilot and AI Best Practices")
+    
+    # Date label
+    c.setFont("Times-Roman", 11)
+    c.setFillColor(colors.Color(0.4, 0.4, 0.4))
+    c.drawCentredString(width / 2, height - 455, "Awarded on")
+    
+    # Footer section
+    c.setStrokeColor(colors.Color(0.8, 0.8, 0.8))
+    c.setLineWidth(0.5)
+    c.line(60, 85, width - 60, 85)
+    
+    # Footer logos/text
+    c.setFont("Times-Bold", 10)
+    c.setFillColor(dgx_orange)
+    c.drawString(70, 68, "Dynamics G-Ex AI Hub")
+    
+    c.setFillColor(copilot_purple)
+    c.drawRightString(width - 70, 68, "Powered by Microsoft Copilot")
+    
+    # Seal/Badge - smaller and positioned to the right, not overlapping date
+    seal_x, seal_y = width - 120, height - 460
+    c.setFillColor(colors.Color(gold.red, gold.green, gold.blue, 0.08))
+    c.circle(seal_x, seal_y, 35, fill=True, stroke=False)
+    c.setStrokeColor(colors.Color(gold.red, gold.green, gold.blue, 0.5))
+    c.setLineWidth(1.5)
+    c.circle(seal_x, seal_y, 35, fill=False, stroke=True)
+    c.setLineWidth(0.8)
+    c.circle(seal_x, seal_y, 30, fill=False, stroke=True)
+    
+    # Star in seal - more subtle
+    c.setFillColor(colors.Color(gold.red, gold.green, gold.blue, 0.4))
+    points = []
+    for i in range(5):
+        angle = math.pi / 2 + i * 4 * math.pi / 5
+        points.append((seal_x + 18 * math.cos(angle), seal_y + 18 * math.sin(angle)))
+        angle = math.pi / 2 + i * 4 * math.pi / 5 + 2 * math.pi / 5
+        points.append((seal_x + 8 * math.cos(angle), seal_y + 8 * math.sin(angle)))
+    
+    path = c.beginPath()
+    path.moveTo(points[0][0], points[0][1])
+    for px, py in points[1:]:
+        path.lineTo(px, py)
+    path.close()
+    c.drawPath(path, fill=True, stroke=False)
+    
+    c.save()
+    return buffer.getvalue()
+
+
+def get_certificate_template() -> bytes:
+    """Static certificate background, rendered on first use and kept for the life of the process"""
+    global _certificate_template
+    if _certificate_template is None:
+        _certificate_template = render_certificate_template()
+    return _certificate_template
+
+
+def render_certificate_overlay(name: str, awarded_on: str, cert_id: str) -> bytes:
+    """Render only the per-recipient parts of the certificate on a transparent page"""
+    from reportlab.lib.pagesizes import landscape, A4
+    from reportlab.lib import colors
+    from reportlab.pdfgen import canvas
+    
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=landscape(A4))
+    width, height = landscape(A4)
+    gold = colors.Color(0.85, 0.65, 0.13)
+    
+    # Recipient Name (prominent, elegant)
+    c.setFont("Times-Bold", 38)
+    c.setFillColor(colors.Color(0.1, 0.1, 0.1))
+    c.drawCentredString(width / 2, height - 250, name)
+    
+    # Elegant underline for name
+    name_width = c.stringWidth(name, "Times-Bold", 38)
+    c.setStrokeColor(gold)
+    c.setLineWidth(2)
+    c.line(width/2 - name_width/2 - 20, height - 265, width/2 + name_width/2 + 20, height - 265)
+    c.setLineWidth(0.5)
+    c.line(width/2 - name_width/2 - 40, height - 270, width/2 + name_width/2 + 40, height - 270)
+    
+    # Award date
+    c.setFont("Times-Bold", 14)
+    c.setFillColor(colors.Color(0.3, 0.3, 0.3))
+    c.drawCentredString(width / 2, height - 473, awarded_on)
+    
+    # Certificate ID
+    c.setFont("Times-Roman", 8)
+    c.setFillColor(colors.Color(0.6, 0.6, 0.6))
+    c.drawCentredString(width / 2, 50, f"Certificate ID: DGX-CHAMPION-{cert_id}")
+    
+    c.save()
+    return buffer.getvalue()
+
+
+def render_certificate_pdf(name: str, awarded_on: str, cert_id: str) -> bytes:
+    """Stamp the recipient overlay onto the pre-rendered template and return the finished PDF"""
+    from pypdf import PdfReader, PdfWriter
+    
+    writer = PdfWriter()
+    page = writer.add_page(PdfReader(io.BytesIO(get_certificate_template())).pages[0])
+    page.merge_page(PdfReader(io.BytesIO(render_certificate_overlay(name, awarded_on, cert_id))).pages[0])
+    
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def start_certificate_executor():
+    """Start the certificate worker processes, each warming its own template copy"""
+    global certificate_executor
+    if CERTIFICATE_WORKERS <= 0:
+        get_certificate_template()
+    elif certificate_executor is None:
+        certificate_executor = ProcessPoolExecutor(
+            max_workers=CERTIFICATE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=get_certificate_template
+        )
+
+
+def stop_certificate_executor():
+    global certificate_executor
+    if certificate_executor is not None:
+        certificate_executor.shutdown(wait=False, cancel_futures=True)
+        certificate_executor = None
+
+
+def replace_broken_certificate_executor(broken):
+    """A worker died and the pool refuses new work: swap in a fresh pool (once per broken pool)"""
+    if certificate_executor is broken:
+        logging.error("Certificate worker pool is broken (a worker process died), starting a new one")
+        stop_certificate_executor()
+    start_certificate_executor()
+
+
+certificate_render_duration = metrics.histogram(
+    "certificate_render_duration_seconds",
+    'Certificate PDF render time: "render" is the reportlab/pypdf work, "total" adds the worker queue and transfer',
+    ["stage"]
+)
+metrics.gauge("certificate_jobs", "Certificate renders running or queued", collect=lambda: [({}, certificate_jobs)])
+
+
+def timed_render_certificate_pdf(name: str, awarded_on: str, cert_id: str) -> tuple[bytes, float]:
+    """render_certificate_pdf plus its duration, measured where it runs"""
+    started = time.perf_counter()
+    pdf = render_certificate_pdf(name, awarded_on, cert_id)
+    return pdf, time.perf_counter() - started
+
+
+async def render_certificate(name: str, awarded_on: str, cert_id: str) -> bytes:
+    """
+    Render a certificate off the event loop.
+    Raises 503 once the workers and the wait queue are full so a burst sheds load instead of piling up.
+    """
+    global certificate_jobs
+    if certificate_jobs >= max(CERTIFICATE_WORKERS, 1) + CERTIFICATE_MAX_QUEUE:
+        raise HTTPException(
+            status_code=503,
+            detail="Certificate service is busy, please try again shortly",
+            headers={"Retry-After": str(CERTIFICATE_RETRY_AFTER_SECONDS)}
+        )
+    
+    certificate_jobs += 1
+    started = time.perf_counter()
+    try:
+        if CERTIFICATE_WORKERS <= 0:
+            pdf, render_seconds = timed_render_certificate_pdf(name, awarded_on, cert_id)
+        else:
+            start_certificate_executor()
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                executor = certificate_executor
+                try:
+                    pdf, render_seconds = await loop.run_in_executor(
+                        executor, timed_render_certificate_pdf, name, awarded_on, cert_id
+                    )
+                    break
+                except BrokenProcessPool:
+                    replace_broken_certificate_executor(executor)
+                    if attempt:
+                        raise HTTPException(
+                            status_code=503,
+                            detail="Certificate service is restarting, please try again shortly",
+                            headers={"Retry-After": str(CERTIFICATE_RETRY_AFTER_SECONDS)}
+                        )
+        certificate_render_duration.observe(render_seconds, stage="render")
+        certificate_render_duration.observe(time.perf_counter() - started, stage="total")
+        return pdf
+    finally:
+        certificate_jobs -= 1
+
+
+async def issue_certificate(email: str, name: str) -> dict:
+    """
+    Registry record for this recipient's certificate today, created on first request.
+    The same email and name on the same day always get the same certificate ID.
+    """
+    now = datetime.now()
+    return await db.certificates.find_one_and_update(
+        {"email": email, "name": name, "issued_date": now.strftime("%Y-%m-%d")},
+        {"$setOnInsert": {
+            "cert_id": str(uuid.uuid4())[:8].upper(),
+            "awarded_on": now.strftime("%B %d, %Y"),
+            "pdf_sha256": None,
+            "created_at": now.isoformat()
+        }},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def read_cached_certificate(certificate: dict) -> bytes | None:
+    """Cached PDF for a registry record, if present on disk and matching the recorded hash"""
+    path = CERTIFICATE_CACHE_DIR / f"{certificate['cert_id']}.pdf"
+    if not certificate.get("pdf_sha256") or not path.exists():
+        return None
+    pdf = path.read_bytes()
+    return pdf if hashlib.sha256(pdf).hexdigest() == certificate["pdf_sha256"] else None
+
+
 @api_router.post("/certificate/check")
 async def check_certificate_eligibility(request: CertificateRequest):
     """Check if user is eligible for AI Champion certificate"""
     try:
-        email = request.email.lower()
-        
-        # Test bypass - skip eligibility check for this email
-        if email == "certificate@dynamicsgex.com.au":
-            return {
-                "eligible": True,
-                "message": "Congratulations! You've completed all modules with 70%+ scores!",
-                "modules": [
-                    {"name": "Module 1: AI Fundamentals", "score": 100, "passed": True},
-                    {"name": "Module 2: Governance", "score": 100, "passed": True},
-                    {"name": "Module 3: Practical Applications", "score": 100, "passed": True},
-                    {"name": "Module 4: AI Champions", "score": 100, "passed": True}
-                ]
-            }
-        
-        # Get all quiz submissions for this email
-        submissions = await db.quiz_submissions.find(
-            {"email": {"$regex": f"^{email}$", "$options": "i"}},
-            {"_id": 0}
-        ).to_list(100)
-        
-        # Also try exact match
-        if not submissions:
-            submissions = await db.quiz_submissions.find(
-                {"email": email},
-                {"_id": 0}
-            ).to_list(100)
-        
-        # Group by module and get best score for each
-        module_scores = {}
-        for sub in submissions:
-            module_id = sub.get("module_id", 1)
-            score = sub.get("score", 0)
-            if module_id not in module_scores or score > module_scores[module_id]:
-                module_scores[module_id] = score
-        
-        # Check all 4 modules
-        modules = [
-            {"id": 1, "name": "Module 1: AI Fundamentals"},
-            {"id": 2, "name": "Module 2: Governance"},
-            {"id": 3, "name": "Module 3: Practical Applications"},
-            {"id": 4, "name": "Module 4: AI Champions"}
-        ]
-        
-        result_modules = []
-        all_passed = True
-        missing_modules = []
-        
-        for mod in modules:
-            score = module_scores.get(mod["id"])
-            passed = score is not None and score >= 7
-            if not passed:
-                all_passed = False
-                if score is None:
-                    missing_modules.append(mod["name"])
-                else:
-                    missing_modules.append(f"{mod['name']} (score: {score}/10, need 7+)")
-            
-            result_modules.append({
-                "name": mod["name"],
-                "score": score * 10 if score is not None else None,  # Convert to percentage
-                "passed": passed
-            })
-        
-        if all_passed:
-            return {
-                "eligible": True,
-                "message": "Congratulations! You've completed all modules with 70%+ scores!",
-                "modules": result_modules
-            }
-        else:
-            message = "To earn your certificate, please complete the following:\n" + "\n".join(f"• {m}" for m in missing_modules)
-            return {
-                "eligible": False,
-                "message": message,
-                "modules": result_modules
-            }
-            
+        return await get_certificate_eligibility(request.email)
     except Exception as e:
         logging.error(f"Error checking certificate eligibility: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/certificate/generate")
-async def generate_certificate(request: CertificateRequest):
+async def generate_certificate(request: CertificateRequest, if_none_match: str | None = Header(None)):
     """Generate PDF certificate for eligible users"""
     try:
         # First verify eligibility
-        email = request.email.lower()
-        
-        # Test bypass - skip eligibility check for this email
-        if email != "certificate@dynamicsgex.com.au":
-            submissions = await db.quiz_submissions.find(
-                {"email": {"$regex": f"^{email}$", "$options": "i"}},
-                {"_id": 0}
-            ).to_list(100)
-            
-            if not submissions:
-                submissions = await db.quiz_submissions.find(
-                    {"email": email},
-                    {"_id": 0}
-                ).to_list(100)
-            
-            module_scores = {}
-            for sub in submissions:
-                module_id = sub.get("module_id", 1)
-                score = sub.get("score", 0)
-                if module_id not in module_scores or score > module_scores[module_id]:
-                    module_scores[module_id] = score
-            
-            # Verify all 4 modules passed
-            for mod_id in [1, 2, 3, 4]:
-                score = module_scores.get(mod_id)
-                if score is None or score < 7:
-                    raise HTTPException(status_code=403, detail="Not eligible for certificate. Complete all modules with 70%+ score.")
-        
-        # Generate PDF certificate
-        from reportlab.lib.pagesizes import landscape, A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import inch
-        from reportlab.pdfgen import canvas
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from io import BytesIO
-        import math
-        import os
-        
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=landscape(A4))
-        width, height = landscape(A4)
-        
-        # Define brand colors
-        # Dynamics G-Ex: Orange (#F37021) and Blue (#0066B3)
-        # Copilot: Purple (#7B83EB), Blue (#0078D4), Teal (#00B7C3)
-        dgx_orange = colors.Color(0.95, 0.44, 0.13)  # #F37021
-        dgx_blue = colors.Color(0, 0.4, 0.7)  # #0066B3
-        copilot_purple = colors.Color(0.48, 0.51, 0.92)  # #7B83EB
-        copilot_teal = colors.Color(0, 0.72, 0.76)  # #00B7C3
-        gold = colors.Color(0.85, 0.65, 0.13)
-        
-        # Create gradient background
-        # Draw multiple rectangles to simulate gradient
-        steps = 50
-        for i in range(steps):
-            ratio = i / steps
-            # Blend from light orange-cream at top to light purple-blue at bottom
-            r = 0.99 - (ratio * 0.04)  # 0.99 to 0.95
-            g = 0.96 - (ratio * 0.06)  # 0.96 to 0.90
-            b = 0.93 + (ratio * 0.05)  # 0.93 to 0.98
-            c.setFillColor(colors.Color(r, g, b))
-            strip_height = height / steps
-            c.rect(0, height - (i + 1) * strip_height, width, strip_height + 1, fill=True, stroke=False)
-        
-        # Draw subtle logo pattern in background using actual logo images
-        c.saveState()
-        
-        # Load logo images for pattern
-        molecule_logo_path = os.path.join(os.path.dirname(__file__), 'molecule-icon.png')
-        copilot_logo_path = os.path.join(os.path.dirname(__file__), 'copilot-icon.png')
-        
-        # Pattern settings
-        pattern_spacing = 100  # Space between logos
-        logo_size = 30  # Size of each logo in the pattern
-        
-        # Create alternating pattern of both logos
-        for row in range(int(height / pattern_spacing) + 2):
-            for col in range(int(width / pattern_spacing) + 2):
-                # Offset alternate rows for a more organic pattern
-                x_offset = (pattern_spacing / 2) if row % 2 else 0
-                x = col * pattern_spacing + x_offset - 20
-                y = row * pattern_spacing - 20
-                
-                # Skip if outside bounds
-                if x < -logo_size or x > width + logo_size or y < -logo_size or y > height + logo_size:
-                    continue
-                
-                # Alternate between molecule and copilot logos
-                try:
-                    if (row + col) % 2 == 0:
-                        # Draw molecule logo with very low opacity
-                        if os.path.exists(molecule_logo_path):
-                            c.saveState()
-                            c.setFillAlpha(0.07)  # 7% opacity
-                            c.drawImage(molecule_logo_path, x, y, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
-                            c.restoreState()
-                    else:
-                        # Draw copilot logo with very low opacity
-                        if os.path.exists(copilot_logo_path):
-                            c.saveState()
-                            c.setFillAlpha(0.07)  # 7% opacity
-                            c.drawImage(copilot_logo_path, x, y, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
-                            c.restoreState()
-                except:
-                    pass  # Skip if image can't be drawn
-        
-        c.restoreState()
-        
-        # Decorative corner flourishes
-        c.setStrokeColor(gold)
-        c.setLineWidth(2)
-        
-        # Top-left corner
-        c.line(40, height - 40, 40, height - 80)
-        c.line(40, height - 40, 80, height - 40)
-        
-        # Top-right corner
-        c.line(width - 40, height - 40, width - 40, height - 80)
-        c.line(width - 40, height - 40, width - 80, height - 40)
-        
-        # Bottom-left corner
-        c.line(40, 40, 40, 80)
-        c.line(40, 40, 80, 40)
-        
-        # Bottom-right corner
-        c.line(width - 40, 40, width - 40, 80)
-        c.line(width - 40, 40, width - 80, 40)
-        
-        # Elegant double border
-        c.setStrokeColor(gold)
-        c.setLineWidth(3)
-        c.roundRect(25, 25, width - 50, height - 50, 10, fill=False)
-        
-        c.setStrokeColor(colors.Color(0.75, 0.55, 0.08))
-        c.setLineWidth(1)
-        c.roundRect(35, 35, width - 70, height - 70, 8, fill=False)
-        
-        # Header - Company Logo Image
-        import os
-        logo_path = os.path.join(os.path.dirname(__file__), 'dynamics-gex-logo-header.png')
-        if os.path.exists(logo_path):
-            # Draw the logo centered at top
-            logo_width = 180  # Adjust size as needed
-            logo_height = 50  # Adjust based on aspect ratio
-            logo_x = (width - logo_width) / 2
-            logo_y = height - 95
-            c.drawImage(logo_path, logo_x, logo_y, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
-        
-        # Decorative line under header
-        c.setStrokeColor(gold)
-        c.setLineWidth(0.5)
-        c.line(width/2 - 100, height - 105, width/2 + 100, height - 105)
-        
-        # Certificate Title (elegant serif font)
-        c.setFillColor(colors.Color(0.15, 0.15, 0.15))
-        c.setFont("Times-Bold", 42)
-        c.drawCentredString(width / 2, height - 155, "Certificate of Achievement")
-        
-        # Decorative elements around title
-        c.setStrokeColor(gold)
-        c.setLineWidth(1)
-        c.line(width/2 - 220, height - 170, width/2 - 80, height - 170)
-        c.line(width/2 + 80, height - 170, width/2 + 220, height - 170)
-        
-        # Small diamond decorations
-        c.setFillColor(gold)
-        for x_offset in [-230, 230]:
-            cx = width/2 + x_offset
-            cy = height - 170
-            c.saveState()
-            c.translate(cx, cy)
-            c.rotate(45)
-            c.rect(-3, -3, 6, 6, fill=True, stroke=False)
-            c.restoreState()
-        
-        # "This is to certify that"
-        c.setFont("Times-Italic", 16)
-        c.setFillColor(colors.Color(0.4, 0.4, 0.4))
-        c.drawCentredString(width / 2, height - 205, "This is to certify that")
-        
-        # Recipient Name (prominent, elegant)
-        c.setFont("Times-Bold", 38)
-        c.setFillColor(colors.Color(0.1, 0.1, 0.1))
-        c.drawCentredString(width / 2, height - 250, request.name)
-        
-        # Elegant underline for name
-        name_width = c.stringWidth(request.name, "Times-Bold", 38)
-        c.setStrokeColor(gold)
-        c.setLineWidth(2)
-        c.line(width/2 - name_width/2 - 20, height - 265, width/2 + name_width/2 + 20, height - 265)
-        c.setLineWidth(0.5)
-        c.line(width/2 - name_width/2 - 40, height - 270, width/2 + name_width/2 + 40, height - 270)
-        
-        # Achievement description
-        c.setFont("Times-Roman", 14)
-        c.setFillColor(colors.Color(0.35, 0.35, 0.35))
-        c.drawCentredString(width / 2, height - 300, "has successfully completed the")
-        
-        c.setFont("Times-Bold", 22)
-        c.setFillColor(colors.Color(0.2, 0.2, 0.2))
-        c.drawCentredString(width / 2, height - 330, "DGX AI Champions Training Program")
-        
-        c.setFont("Times-Roman", 14)
-        c.setFillColor(colors.Color(0.35, 0.35, 0.35))
-        c.drawCentredString(width / 2, height - 355, "and is hereby recognized as a")
-        
-        # Champion Title (grand, prominent)
-        c.setFont("Times-Bold", 32)
-        c.setFillColor(gold)
-        c.drawCentredString(width / 2, height - 395, "DGX AI CHAMPION")
-        
-        # Copilot proficiency note
-        c.setFont("Times-Italic", 12)
-        c.setFillColor(copilot_purple)
-        c.drawCentredString(width / 2, height - 420, "Demonstrating proficiency in Microsoft Copilot and AI Best Practices")
-        
-        # Date section with elegant formatting
-        from datetime import datetime
-        today = datetime.now().strftime("%B %d, %Y")
-        
-        c.setFont("Times-Roman", 11)
-        c.setFillColor(colors.Color(0.4, 0.4, 0.4))
-        c.drawCentredString(width / 2, height - 455, "Awarded on")
-        
-        c.setFont("Times-Bold", 14)
-        c.setFillColor(colors.Color(0.3, 0.3, 0.3))
-        c.drawCentredString(width / 2, height - 473, today)
-        
-        # Footer section
-        c.setStrokeColor(colors.Color(0.8, 0.8, 0.8))
-        c.setLineWidth(0.5)
-        c.line(60, 85, width - 60, 85)
-        
-        # Footer logos/text
-        c.setFont("Times-Bold", 10)
-        c.setFillColor(dgx_orange)
-        c.drawString(70, 68, "Dynamics G-Ex AI Hub")
-        
-        c.setFillColor(copilot_purple)
-        c.drawRightString(width - 70, 68, "Powered by Microsoft Copilot")
-        
-        # Certificate ID
-        cert_id = str(uuid.uuid4())[:8].upper()
-        c.setFont("Times-Roman", 8)
-        c.setFillColor(colors.Color(0.6, 0.6, 0.6))
-        c.drawCentredString(width / 2, 50, f"Certificate ID: DGX-CHAMPION-{cert_id}")
-        
-        # Seal/Badge - smaller and positioned to the right, not overlapping date
-        seal_x, seal_y = width - 120, height - 460
-        c.setFillColor(colors.Color(gold.red, gold.green, gold.blue, 0.08))
-        c.circle(seal_x, seal_y, 35, fill=True, stroke=False)
-        c.setStrokeColor(colors.Color(gold.red, gold.green, gold.blue, 0.5))
-        c.setLineWidth(1.5)
-        c.circle(seal_x, seal_y, 35, fill=False, stroke=True)
-        c.setLineWidth(0.8)
-        c.circle(seal_x, seal_y, 30, fill=False, stroke=True)
-        
-        # Star in seal - more subtle
-        c.setFillColor(colors.Color(gold.red, gold.green, gold.blue, 0.4))
-        points = []
-        for i in range(5):
-            angle = math.pi / 2 + i * 4 * math.pi / 5
-            points.append((seal_x + 18 * math.cos(angle), seal_y + 18 * math.sin(angle)))
-            angle = math.pi / 2 + i * 4 * math.pi / 5 + 2 * math.pi / 5
-            points.append((seal_x + 8 * math.cos(angle), seal_y + 8 * math.sin(angle)))
-        
-        path = c.beginPath()
-        path.moveTo(points[0][0], points[0][1])
-        for px, py in points[1:]:
-            path.lineTo(px, py)
-        path.close()
-        c.drawPath(path, fill=True, stroke=False)
+        email = normalize_email(request.email)
+        eligibility = await get_certificate_eligibility(email)
+        if not eligibility["eligible"]:
+            raise HTTPException(status_code=403, detail="Not eligible for certificate. Complete all modules with 70%+ score.")
+        
+        certificate = await issue_certificate(email, request.name)
+        headers = {
+            "Content-Disposition": f"attachment; filename=DGX_AI_Champion_Certificate_{request.name.replace(' ', '_')}.pdf",
+            "Cache-Control": "private, no-cache"
+        }
         
-        c.save()
+        # The client already holds this exact certificate
+        if certificate.get("pdf_sha256"):
+            headers["ETag"] = f'"{certificate["pdf_sha256"]}"'
+            if if_none_match and headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]:
+                return Response(status_code=304, headers=headers)
         
-        buffer.seek(0)
+        pdf = await asyncio.to_thread(read_cached_certificate, certificate)
+        if pdf is None:
+            # Stamp the recipient onto the pre-rendered certificate template
+            pdf = await render_certificate(request.name, certificate["awarded_on"], certificate["cert_id"])
+            pdf_sha256 = hashlib.sha256(pdf).hexdigest()
+            await asyncio.to_thread(atomic_write, CERTIFICATE_CACHE_DIR / f"{certificate['cert_id']}.pdf", pdf)
+            if pdf_sha256 != certificate.get("pdf_sha256"):
+                await db.certificates.update_one({"_id": certificate["_id"]}, {"$set": {"pdf_sha256": pdf_sha256}})
+            headers["ETag"] = f'"{pdf_sha256}"'
         
-        from fastapi.responses import StreamingResponse
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=DGX_AI_Champion_Certificate_{request.name.replace(' ', '_')}.pdf"
-            }
-        )
+        return Response(content=pdf, media_type="application/pdf", headers=headers)
         
     except HTTPException:
         raise
@@ -1455,6 +3500,8 @@ async def generate_certificate(request: CertificateRequest):
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(RequestMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1470,6 +3517,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_derived_collections():
+    await ensure_indexes()
+    # Each migration is idempotent and retried on the next start, so a failure is logged rather than fatal
+    for migration in (backfill_email_lc, split_conversation_messages, migrate_story_likes, offload_story_images):
+        try:
+            await migration()
+        except Exception as e:
+            logging.error(f"Error running migration {migration.__name__}: {str(e)}")
+    
+    # Start the certificate workers so the first request doesn't pay for the template render
+    start_certificate_executor()
+    
+    global event_loop_lag_task
+    if event_loop_lag_task is None:
+        event_loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+    if os.environ.get('LOOP_BLOCK_DETECTOR', '').lower() in ('1', 'true', 'yes'):
+        loop_block_detector.start(asyncio.get_running_loop(), app)
+    
+    # Seed the derived collections from history the first time a database without them is served
+    try:
+        has_submissions = await db.quiz_submissions.estimated_document_count() > 0
+        has_stories = await db.success_stories.estimated_document_count() > 0
+        if await db.module_stats_rollup.estimated_document_count() == 0 and has_submissions:
+            await rebuild_module_stats_rollup()
+        if await db.champion_profiles.estimated_document_count() == 0 and (has_submissions or has_stories):
+            await rebuild_champion_profiles()
+    except Exception as e:
+        # The dashboards can be rebuilt later from the admin endpoints; don't refuse to serve
+        logging.error(f"Error seeding derived collections: {str(e)}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    loop_block_detector.stop()
+    if event_loop_lag_task is not None:
+        event_loop_lag_task.cancel()
+    stop_certificate_executor()
+    await write_behind.close()
+    await model_gateway.client.close()
     client.close()
\ No newline at end of file
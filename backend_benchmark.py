@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Backend Benchmarks for Dynamics G-Ex AI Hub
+Seeds a throwaway MongoDB database and times the real endpoint handlers from backend/server.py.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python backend_benchmark.py module-stats
+    MONGO_URL=mongodb://localhost:27017 python backend_benchmark.py email-lookup --sizes 500000
+    MONGO_URL=mongodb://localhost:27017 python backend_benchmark.py certificate
+    MONGO_URL=mongodb://localhost:27017 python backend_benchmark.py certificate-load --sizes 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from dotenv import load_dotenv
+
+load_dotenv(BACKEND_DIR / ".env")
+
+# Never benchmark against the real database
+os.environ["DB_NAME"] = f"{os.environ.get('DB_NAME', 'dgx')}_benchmark"
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ["CERTIFICATE_CACHE_DIR"] = tempfile.mkdtemp(prefix="dgx_certificates_")
+
+import server  # noqa: E402
+
+DEPARTMENTS = ["sales", "marketing", "operations", "leadership", "it", "customer-service"]
+SEED_BATCH = 10000
+
+
+def make_submission(i, email=None, base_time=None):
+    """Build a realistic quiz_submissions document"""
+    module_id = random.randint(1, 4)
+    base_time = base_time or datetime.now(timezone.utc)
+    email = email or f"Bench{i % 50000}@Example.com"
+    return {
+        "name": f"Bench User {i}",
+        "email": email,
+        "email_lc": server.normalize_email(email),
+        "department": random.choice(DEPARTMENTS),
+        "answers": {str(q): {"selected": random.choice("ABCD"), "correct": random.random() > 0.3} for q in range(1, 11)},
+        "score": random.randint(0, 10),
+        "time_taken": random.randint(60, 900),
+        "feedback": "Benchmark submission",
+        "module_id": module_id,
+        "module_name": f"Module {module_id}",
+        "timestamp": (base_time - timedelta(seconds=i)).isoformat()
+    }
+
+
+async def seed_submissions(target):
+    """Top up quiz_submissions to exactly `target` documents"""
+    current = await server.db.quiz_submissions.count_documents({})
+    base_time = datetime.now(timezone.utc)
+    while current < target:
+        batch = [make_submission(i, base_time=base_time) for i in range(current, min(current + SEED_BATCH, target))]
+        await server.db.quiz_submissions.insert_many(batch, ordered=False)
+        current += len(batch)
+    await server.rebuild_module_stats_rollup()
+
+
+async def time_call(coro_factory, repeats=5):
+    """Return (best, median) wall time in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await coro_factory()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
+
+
+async def bench_module_stats(sizes):
+    """GET /api/module-stats latency as quiz_submissions grows"""
+    print("📊 /api/module-stats")
+    print(f"   {'submissions':>12} {'best ms':>10} {'median ms':>10}")
+    for size in sizes:
+        await seed_submissions(size)
+        best, median = await time_call(server.get_module_stats)
+        print(f"   {size:>12,} {best:>10.1f} {median:>10.1f}")
+
+
+async def bench_email_lookup(sizes):
+    """Case-insensitive regex email lookups versus exact matches on the indexed email_lc field"""
+    await server.ensure_indexes()
+    email = "Bench42@Example.com"
+    print("📧 quiz_submissions email lookup")
+    print(f"   {'submissions':>12} {'regex ms':>10} {'email_lc ms':>12} {'/certificate/check ms':>22}")
+    for size in sizes:
+        await seed_submissions(size)
+        _, regex_ms = await time_call(lambda: server.db.quiz_submissions.find(
+            {"email": {"$regex": f"^{re.escape(email)}$", "$options": "i"}}, {"_id": 0}
+        ).to_list(None))
+        _, exact_ms = await time_call(lambda: server.db.quiz_submissions.find(
+            {"email_lc": server.normalize_email(email)}, {"_id": 0}
+        ).to_list(None))
+
+        async def uncached_check():
+            await server.invalidate_certificate_eligibility(email)
+            await server.check_certificate_eligibility(server.CertificateRequest(name="Bench", email=email))
+
+        _, check_ms = await time_call(uncached_check)
+        print(f"   {size:>12,} {regex_ms:>10.1f} {exact_ms:>12.1f} {check_ms:>22.1f}")
+
+
+def cpu_per_call(fn, repeats):
+    """Return (mean CPU ms, last result) over `repeats` synchronous calls"""
+    start = time.process_time()
+    for _ in range(repeats):
+        result = fn()
+    return (time.process_time() - start) * 1000 / repeats, result
+
+
+def render_certificate_redraw(name, awarded_on, cert_id):
+    """The full-page reportlab renderer from before the template, kept as the benchmark baseline"""
+    from reportlab.lib.pagesizes import landscape, A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.pdfgen import canvas
+    from io import BytesIO
+    import math
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=landscape(A4))
+    width, height = landscape(A4)
+
+    # Define brand colors
+    # Dynamics G-Ex: Orange (#F37021) and Blue (#0066B3)
+    # Copilot: Purple (#7B83EB), Blue (#0078D4), Teal (#00B7C3)
+    dgx_orange = colors.Color(0.95, 0.44, 0.13)  # #F37021
+    dgx_blue = colors.Color(0, 0.4, 0.7)  # #0066B3
+    copilot_purple = colors.Color(0.48, 0.51, 0.92)  # #7B83EB
+    copilot_teal = colors.Color(0, 0.72, 0.76)  # #00B7C3
+    gold = colors.Color(0.85, 0.65, 0.13)
+
+    # Create gradient background
+    # Draw multiple rectangles to simulate gradient
+    steps = 50
+    for i in range(steps):
+        ratio = i / steps
+        # Blend from light orange-cream at top to light purple-blue at bottom
+        r = 0.99 - (ratio * 0.04)  # 0.99 to 0.95
+        g = 0.96 - (ratio * 0.06)  # 0.96 to 0.90
+        b = 0.93 + (ratio * 0.05)  # 0.93 to 0.98
+        c.setFillColor(colors.Color(r, g, b))
+        strip_height = height / steps
+        c.rect(0, height - (i + 1) * strip_height, width, strip_height + 1, fill=True, stroke=False)
+
+    # Draw subtle logo pattern in background using actual logo images
+    c.saveState()
+
+    # Load logo images for pattern
+    molecule_logo_path = os.path.join(str(BACKEND_DIR), 'molecule-icon.png')
+    copilot_logo_path = os.path.join(str(BACKEND_DIR), 'copilot-icon.png')
+
+    # Pattern settings
+    pattern_spacing = 100  # Space between logos
+    logo_size = 30  # Size of each logo in the pattern
+
+    # Create alternating pattern of both logos
+    for row in range(int(height / pattern_spacing) + 2):
+        for col in range(int(width / pattern_spacing) + 2):
+            # Offset alternate rows for a more organic pattern
+            x_offset = (pattern_spacing / 2) if row % 2 else 0
+            x = col * pattern_spacing + x_offset - 20
+            y = row * pattern_spacing - 20
+
+            # Skip if outside bounds
+            if x < -logo_size or x > width + logo_size or y < -logo_size or y > height + logo_size:
+                continue
+
+            # Alternate between molecule and copilot logos
+            try:
+                if (row + col) % 2 == 0:
+                    # Draw molecule logo with very low opacity
+                    if os.path.exists(molecule_logo_path):
+                        c.saveState()
+                        c.setFillAlpha(0.07)  # 7% opacity
+                        c.drawImage(molecule_logo_path, x, y, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
+                        c.restoreState()
+                else:
+                    # Draw copilot logo with very low opacity
+                    if os.path.exists(copilot_logo_path):
+                        c.saveState()
+                        c.setFillAlpha(0.07)  # 7% opacity
+                        c.drawImage(copilot_logo_path, x, y, width=logo_size, height=logo_size, preserveAspectRatio=True, mask='auto')
+                        c.restoreState()
+            except:
+                pass  # Skip if image can't be drawn
+
+    c.restoreState()
+
+    # Decorative corner flourishes
+    c.setStrokeColor(gold)
+    c.setLineWidth(2)
+
+    # Top-left corner
+    c.line(40, height - 40, 40, height - 80)
+    c.line(40, height - 40, 80, height - 40)
+
+    # Top-right corner
+    c.line(width - 40, height - 40, width - 40, height - 80)
+    c.line(width - 40, height - 40, width - 80, height - 40)
+
+    # Bottom-left corner
+    c.line(40, 40, 40, 80)
+    c.line(40, 40, 80, 40)
+
+    # Bottom-right corner
+    c.line(width - 40, 40, width - 40, 80)
+    c.line(width - 40, 40, width - 80, 40)
+
+    # Elegant double border
+    c.setStrokeColor(gold)
+    c.setLineWidth(3)
+    c.roundRect(25, 25, width - 50, height - 50, 10, fill=False)
+
+    c.setStrokeColor(colors.Color(0.75, 0.55, 0.08))
+    c.setLineWidth(1)
+    c.roundRect(35, 35, width - 70, height - 70, 8, fill=False)
+
+    # Header - Company Logo Image
+    logo_path = os.path.join(str(BACKEND_DIR), 'dynamics-gex-logo-header.png')
+    if os.path.exists(logo_path):
+        # Draw the logo centered at top
+        logo_width = 180  # Adjust size as needed
+        logo_height = 50  # Adjust based on aspect ratio
+        logo_x = (width - logo_width) / 2
+        logo_y = height - 95
+        c.drawImage(logo_path, logo_x, logo_y, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
+
+    # Decorative line under header
+    c.setStrokeColor(gold)
+    c.setLineWidth(0.5)
+    c.line(width/2 - 100, height - 105, width/2 + 100, height - 105)
+
+    # Certificate Title (elegant serif font)
+    c.setFillColor(colors.Color(0.15, 0.15, 0.15))
+    c.setFont("Times-Bold", 42)
+    c.drawCentredString(width / 2, height - 155, "Certificate of Achievement")
+
+    # Decorative elements around title
+    c.setStrokeColor(gold)
+    c.setLineWidth(1)
+    c.line(width/2 - 220, height - 170, width/2 - 80, height - 170)
+    c.line(width/2 + 80, height - 170, width/2 + 220, height - 170)
+
+    # Small diamond decorations
+    c.setFillColor(gold)
+    for x_offset in [-230, 230]:
+        cx = width/2 + x_offset
+        cy = height - 170
+        c.saveState()
+        c.translate(cx, cy)
+        c.rotate(45)
+        c.rect(-3, -3, 6, 6, fill=True, stroke=False)
+        c.restoreState()
+
+    # "This is to certify that"
+    c.setFont("Times-Italic", 16)
+    c.setFillColor(colors.Color(0.4, 0.4, 0.4))
+    c.drawCentredString(width / 2, height - 205, "This is to certify that")
+
+    # Recipient Name (prominent, elegant)
+    c.setFont("Times-Bold", 38)
+    c.setFillColor(colors.Color(0.1, 0.1, 0.1))
+    c.drawCentredString(width / 2, height - 250, name)
+
+    # Elegant underline for name
+    name_width = c.stringWidth(name, "Times-Bold", 38)
+    c.setStrokeColor(gold)
+    c.setLineWidth(2)
+    c.line(width/2 - name_width/2 - 20, height - 265, width/2 + name_width/2 + 20, height - 265)
+    c.setLineWidth(0.5)
+    c.line(width/2 - name_width/2 - 40, height - 270, width/2 + name_width/2 + 40, height - 270)
+
+    # Achievement description
+    c.setFont("Times-Roman", 14)
+    c.setFillColor(colors.Color(0.35, 0.35, 0.35))
+    c.drawCentredString(width / 2, height - 300, "has successfully completed the")
+
+    c.setFont("Times-Bold", 22)
+    c.setFillColor(colors.Color(0.2, 0.2, 0.2))
+    c.drawCentredString(width / 2, height - 330, "DGX AI Champions Training Program")
+
+    c.setFont("Times-Roman", 14)
+    c.setFillColor(colors.Color(0.35, 0.35, 0.35))
+    c.drawCentredString(width / 2, height - 355, "and is hereby recognized as a")
+
+    # Champion Title (grand, prominent)
+    c.setFont("Times-Bold", 32)
+    c.setFillColor(gold)
+    c.drawCentredString(width / 2, height - 395, "DGX AI CHAMPION")
+
+    # Copilot proficiency note
+    c.setFont("Times-Italic", 12)
+    c.setFillColor(copilot_purple)
+    c.drawCentredString(width / 2, height - 420, "Demonstrating proficiency in Microsoft Copilot and AI Best Practices")
+
+    # Date section with elegant formatting
+
+    c.setFont("Times-Roman", 11)
+    c.setFillColor(colors.Color(0.4, 0.4, 0.4))
+    c.drawCentredString(width / 2, height - 455, "Awarded on")
+
+    c.setFont("Times-Bold", 14)
+    c.setFillColor(colors.Color(0.3, 0.3, 0.3))
+    c.drawCentredString(width / 2, height - 473, awarded_on)
+
+    # Footer section
+    c.setStrokeColor(colors.Color(0.8, 0.8, 0.8))
+    c.setLineWidth(0.5)
+    c.line(60, 85, width - 60, 85)
+
+    # Footer logos/text
+    c.setFont("Times-Bold", 10)
+    c.setFillColor(dgx_orange)
+    c.drawString(70, 68, "Dynamics G-Ex AI Hub")
+
+    c.setFillColor(copilot_purple)
+    c.drawRightString(width - 70, 68, "Powered by Microsoft Copilot")
+
+    # Certificate ID
+    c.setFont("Times-Roman", 8)
+    c.setFillColor(colors.Color(0.6, 0.6, 0.6))
+    c.drawCentredString(width / 2, 50, f"Certificate ID: DGX-CHAMPION-{cert_id}")
+
+    # Seal/Badge - smaller and positioned to the right, not overlapping date
+    seal_x, seal_y = width - 120, height - 460
+    c.setFillColor(colors.Color(gold.red, gold.green, gold.blue, 0.08))
+    c.circle(seal_x, seal_y, 35, fill=True, stroke=False)
+    c.setStrokeColor(colors.Color(gold.red, gold.green, gold.blue, 0.5))
+    c.setLineWidth(1.5)
+    c.circle(seal_x, seal_y, 35, fill=False, stroke=True)
+    c.setLineWidth(0.8)
+    c.circle(seal_x, seal_y, 30, fill=False, stroke=True)
+
+    # Star in seal - more subtle
+    c.setFillColor(colors.Color(gold.red, gold.green, gold.blue, 0.4))
+    points = []
+    for i in range(5):
+        angle = math.pi / 2 + i * 4 * math.pi / 5
+        points.append((seal_x + 18 * math.cos(angle), seal_y + 18 * math.sin(angle)))
+        angle = math.pi / 2 + i * 4 * math.pi / 5 + 2 * math.pi / 5
+        points.append((seal_x + 8 * math.cos(angle), seal_y + 8 * math.sin(angle)))
+
+    path = c.beginPath()
+    path.moveTo(points[0][0], points[0][1])
+    for px, py in points[1:]:
+        path.lineTo(px, py)
+    path.close()
+    c.drawPath(path, fill=True, stroke=False)
+
+    c.save()
+    return buffer.getvalue()
+
+
+async def bench_certificate(sizes, repeats=20):
+    """Certificate PDF CPU time and size: redrawing the whole page versus stamping the cached template"""
+    args = ("Bench Certificate User", datetime.now().strftime("%B %d, %Y"), "BENCH123")
+
+    # Warm imports and fonts
+    render_certificate_redraw(*args)
+    server.render_certificate_pdf(*args)
+    print("📜 certificate rendering")
+    print(f"   {'mode':>12} {'CPU ms':>10} {'PDF bytes':>10}")
+    for mode, fn in [("redraw", lambda: render_certificate_redraw(*args)),
+                     ("template", lambda: server.render_certificate_pdf(*args))]:
+        cpu_ms, pdf = cpu_per_call(fn, repeats)
+        print(f"   {mode:>12} {cpu_ms:>10.1f} {len(pdf):>10,}")
+
+
+def percentile(timings, pct):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * pct / 100))]
+
+
+async def bench_certificate_load(sizes, probe_interval=0.01):
+    """Latency of a cheap endpoint while bursts of certificates render, inline versus in the process pool"""
+    import httpx
+    import logging
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    email = "certificate@dynamicsgex.com.au"
+    transport = httpx.ASGITransport(app=server.app)
+    print("📜 /api/ latency during certificate bursts")
+    print(f"   {'certificates':>12} {'workers':>8} {'ok':>5} {'503':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'burst s':>8}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+        for size in sizes:
+            for workers in [0, max(server.CERTIFICATE_WORKERS, 1)]:
+                server.CERTIFICATE_WORKERS = workers
+                server.start_certificate_executor()
+                await server.db.certificates.delete_many({})
+                await http.post("/api/certificate/generate", json={"name": "Warm Up", "email": email})
+
+                # Distinct names so every request renders instead of hitting the certificate cache
+                start = time.perf_counter()
+                burst = asyncio.gather(*[
+                    http.post("/api/certificate/generate", json={"name": f"Bench User {i}", "email": email})
+                    for i in range(size)
+                ])
+                timings = []
+                while not burst.done():
+                    # Measure from when the probe was due, so time spent waiting for a blocked loop counts
+                    due = time.perf_counter() + probe_interval
+                    await asyncio.sleep(probe_interval)
+                    await http.get("/api/")
+                    timings.append((time.perf_counter() - due) * 1000)
+                responses = await burst
+                elapsed = time.perf_counter() - start
+
+                ok = sum(r.status_code == 200 for r in responses)
+                busy = sum(r.status_code == 503 for r in responses)
+                print(f"   {size:>12,} {workers or 'inline':>8} {ok:>5} {busy:>5} {percentile(timings, 50):>8.1f} "
+                      f"{percentile(timings, 95):>8.1f} {percentile(timings, 99):>8.1f} {elapsed:>8.1f}")
+    server.stop_certificate_executor()
+
+
+BENCHMARKS = {
+    "module-stats": bench_module_stats,
+    "email-lookup": bench_email_lookup,
+    "certificate": bench_certificate,
+    "certificate-load": bench_certificate_load,
+}
+
+# Benchmarks that never touch MongoDB
+OFFLINE_BENCHMARKS = {"certificate"}
+
+
+async def run(names, sizes, keep):
+    uses_db = not OFFLINE_BENCHMARKS.issuperset(names)
+    if uses_db:
+        await server.db.quiz_submissions.drop()
+        await server.db.module_stats_rollup.drop()
+        await server.db.certificates.drop()
+    try:
+        for name in names:
+            await BENCHMARKS[name](sizes)
+            print()
+    finally:
+        shutil.rmtree(os.environ["CERTIFICATE_CACHE_DIR"], ignore_errors=True)
+        if uses_db and not keep:
+            await server.client.drop_database(os.environ["DB_NAME"])
+        server.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend endpoints against a local MongoDB")
+    parser.add_argument("benchmarks", nargs="*", choices=sorted(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="Comma separated collection sizes")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database afterwards")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print("🚀 AI Learning Hub - Backend Benchmarks")
+    print(f"Database: {os.environ['DB_NAME']}")
+    print(f"Run Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+    asyncio.run(run(args.benchmarks or list(BENCHMARKS), sizes, args.keep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Load Tests for Dynamics G-Ex AI Hub AI endpoints
+Drives /api/ai-helper, /api/ai-chat and /api/module-assistant (plus their streaming variants) with
+concurrent virtual users and reports RPS and p50/p95/p99 latency per endpoint.
+
+With --start-stack everything runs offline: mock_llm_server.py stands in for OpenAI and the backend
+is started against it with a throwaway database on the local MongoDB.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python backend_loadtest.py --start-stack
+    MONGO_URL=mongodb://localhost:27017 python backend_loadtest.py --start-stack --mock-args="--error-rate 0.1 --error-status 429,503"
+    python backend_loadtest.py ai-helper module-assistant --backend-url http://127.0.0.1:8001 --concurrency 50
+    MONGO_URL=mongodb://localhost:27017 python backend_loadtest.py --start-stack --detect-blocking
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+DEPARTMENTS = ["sales", "marketing", "operations", "leadership", "it", "customer-service"]
+ENDPOINTS = ["ai-helper", "ai-chat", "module-assistant", "ai-chat-stream", "module-assistant-stream"]
+
+
+def percentile(timings, pct):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * pct / 100))] if timings else 0
+
+
+def helper_payload():
+    # Unique challenges so every request reaches the model instead of the AI helper cache
+    return {
+        "name": "Load Test User",
+        "department": DEPARTMENTS[uuid.uuid4().int % len(DEPARTMENTS)],
+        "challenge": f"Summarise weekly pipeline reports for the leadership meeting {uuid.uuid4().hex[:8]}"
+    }
+
+
+def module_payload(conversation_id=None):
+    return {
+        "message": "How should I write a good Copilot prompt for meeting notes?",
+        "module_id": 1,
+        "module_name": "Module 1: AI Fundamentals",
+        "module_context": "Introduction to AI, Microsoft Copilot and writing effective prompts.",
+        "conversation_id": conversation_id
+    }
+
+
+async def read_stream(response):
+    """Consume an SSE response; return (time to first token, done event)"""
+    start = time.perf_counter()
+    first_token = None
+    async for line in response.aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        event = json.loads(line[6:])
+        if event.get("error"):
+            raise RuntimeError(event["error"])
+        if event.get("token") and first_token is None:
+            first_token = time.perf_counter() - start
+        if event.get("done"):
+            return first_token, event
+    raise RuntimeError("Stream ended before the done event")
+
+
+class VirtualUser:
+    """One simulated user holding whatever conversation state its endpoint needs"""
+
+    def __init__(self, http, endpoint):
+        self.http = http
+        self.endpoint = endpoint
+        self.conversation_id = None
+
+    async def setup(self):
+        if self.endpoint.startswith("ai-chat"):
+            response = await self.http.post("/api/ai-helper", json=helper_payload())
+            response.raise_for_status()
+            self.conversation_id = response.json()["conversation_id"]
+
+    async def request(self):
+        """Send one request; return time to first token for streams, else None"""
+        if self.endpoint == "ai-helper":
+            response = await self.http.post("/api/ai-helper", json=helper_payload())
+            response.raise_for_status()
+            return None
+        if self.endpoint == "ai-chat":
+            response = await self.http.post("/api/ai-chat", json={
+                "message": "Can you give me an example prompt?", "conversation_id": self.conversation_id
+            })
+            response.raise_for_status()
+            return None
+        if self.endpoint == "module-assistant":
+            response = await self.http.post("/api/module-assistant", json=module_payload(self.conversation_id))
+            response.raise_for_status()
+            self.conversation_id = response.json()["conversation_id"]
+            return None
+
+        if self.endpoint == "ai-chat-stream":
+            url, body = "/api/ai-chat/stream", {
+                "message": "Can you give me an example prompt?", "conversation_id": self.conversation_id
+            }
+        else:
+            url, body = "/api/module-assistant/stream", module_payload(self.conversation_id)
+        async with self.http.stream("POST", url, json=body) as response:
+            response.raise_for_status()
+            first_token, done = await read_stream(response)
+        self.conversation_id = done.get("conversation_id", self.conversation_id)
+        return first_token
+
+
+async def run_endpoint(http, endpoint, concurrency, duration):
+    """Closed-loop load: `concurrency` users each send back-to-back requests for `duration` seconds"""
+    users = [VirtualUser(http, endpoint) for _ in range(concurrency)]
+    await asyncio.gather(*(user.setup() for user in users))
+
+    timings, first_tokens, errors = [], [], {}
+    stop_at = time.perf_counter() + duration
+
+    async def loop(user):
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                first_token = await user.request()
+                timings.append((time.perf_counter() - start) * 1000)
+                if first_token is not None:
+                    first_tokens.append(first_token * 1000)
+            except Exception as e:
+                key = getattr(getattr(e, "response", None), "status_code", None) or type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop(user) for user in users))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "endpoint": endpoint,
+        "requests": len(timings),
+        "errors": errors,
+        "rps": len(timings) / elapsed,
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "p99": percentile(timings, 99),
+        "ttft_p50": percentile(first_tokens, 50) if first_tokens else None,
+        "ttft_p95": percentile(first_tokens, 95) if first_tokens else None,
+    }
+
+
+def print_result(result):
+    errors = ", ".join(f"{k}: {v}" for k, v in result["errors"].items()) or "-"
+    ttft = f"{result['ttft_p50']:.0f}/{result['ttft_p95']:.0f}" if result["ttft_p50"] is not None else "-"
+    print(f"   {result['endpoint']:<24} {result['requests']:>8} {result['rps']:>7.1f} {result['p50']:>8.0f} "
+          f"{result['p95']:>8.0f} {result['p99']:>8.0f} {ttft:>12}   {errors}")
+
+
+async def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            try:
+                if (await http.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_stack(args):
+    """Start the mock LLM server and a backend wired to it; returns the processes to stop afterwards"""
+    if not os.environ.get("MONGO_URL"):
+        sys.exit("MONGO_URL must point at a local MongoDB for --start-stack")
+
+    mock = subprocess.Popen(
+        [sys.executable, str(ROOT_DIR / "mock_llm_server.py"), "--port", str(args.mock_port), *shlex.split(args.mock_args)]
+    )
+    env = {
+        **os.environ,
+        "DB_NAME": f"{os.environ.get('DB_NAME', 'dgx')}_loadtest",
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+    }
+    if args.detect_blocking:
+        env["LOOP_BLOCK_DETECTOR"] = "1"
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.backend_port), "--log-level", "warning"],
+        cwd=ROOT_DIR / "backend",
+        env=env
+    )
+    return [mock, backend], env["DB_NAME"]
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.backend_url, timeout=args.timeout) as http:
+        print(f"   {'endpoint':<24} {'requests':>8} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft p50/95':>12}   errors")
+        for endpoint in args.endpoints or list(ENDPOINTS):
+            print_result(await run_endpoint(http, endpoint, args.concurrency, args.duration))
+
+        gateway = await http.get("/api/model-gateway/stats")
+        if gateway.status_code == 200:
+            stats = gateway.json()
+            print()
+            print(f"Model gateway: max in flight {stats['max_in_flight']}, circuit {stats['circuit_breaker']['state']}")
+            for label, m in stats["endpoints"].items():
+                print(f"   {label:<24} queue wait {m['avg_queue_wait_ms']:>7.1f} ms   model {m['avg_model_ms']:>7.1f} ms   "
+                      f"retries {m['retries']}   short-circuited {m['short_circuited']}")
+
+        report = await http.get("/api/loop-blocking/report", params={"password": "Dynamics@26"})
+        if report.status_code == 200 and report.json()["enabled"]:
+            report = report.json()
+            print()
+            print(f"Event loop blocking (callbacks over {report['threshold_ms']:.0f} ms):")
+            for route, entry in report["routes"].items():
+                print(f"   {route:<40} {entry['count']:>5}x   total {entry['total_ms']:>8.0f} ms   max {entry['max_ms']:>6.0f} ms")
+                if entry["top_stacks"]:
+                    print(f"      {' <- '.join(reversed(entry['top_stacks'][0]['stack'][-3:]))}")
+            if not report["routes"]:
+                print("   none")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI endpoints")
+    parser.add_argument("endpoints", nargs="*", choices=ENDPOINTS, help="Endpoints to load (default: all)")
+    parser.add_argument("--backend-url", default=None, help="Running backend to test (default: the one --start-stack starts)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users per endpoint")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per endpoint")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request client timeout in seconds")
+    parser.add_argument("--start-stack", action="store_true", help="Start the mock LLM server and a backend against it")
+    parser.add_argument("--mock-args", default="", help="Extra arguments for mock_llm_server.py")
+    parser.add_argument("--mock-port", type=int, default=8090)
+    parser.add_argument("--backend-port", type=int, default=8001)
+    parser.add_argument("--keep", action="store_true", help="Keep the load test database afterwards")
+    parser.add_argument("--detect-blocking", action="store_true",
+                        help="Run the started backend with the event loop blocking detector and print its report")
+    args = parser.parse_args()
+    args.backend_url = args.backend_url or f"http://127.0.0.1:{args.backend_port}"
+
+    processes, db_name = [], None
+    if args.start_stack:
+        processes, db_name = start_stack(args)
+
+    print("🚀 AI Learning Hub - AI Endpoint Load Test")
+    print(f"Backend: {args.backend_url}  Concurrency: {args.concurrency}  Duration: {args.duration:.0f}s per endpoint")
+    print(f"Run Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+    try:
+        if args.start_stack:
+            asyncio.run(wait_until_up(f"http://127.0.0.1:{args.mock_port}/v1/models"))
+        asyncio.run(wait_until_up(f"{args.backend_url}/api/health"))
+        asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        if db_name and not args.keep:
+            from pymongo import MongoClient
+            MongoClient(os.environ["MONGO_URL"]).drop_database(db_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/com
 import { Loader2, Sparkles, CheckCircle, ArrowRight } from "lucide-react";
 import { toast } from "sonner";
 import axios from "axios";
+import { streamChat } from "@/lib/streamChat";
 
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || import.meta.env.REACT_APP_BACKEND_URL || 'https://ai-champions.preview.emergentagent.com';
 const API = `${BACKEND_URL}/api`;
@@ -66,19 +67,28 @@ export const AIHelperSection = () => {
     // Add user message to chat
     setChatMessages(prev => [...prev, { role: "user", content: userMessage }]);
     
+    let started = false;
     try {
-      const result = await axios.post(`${API}/ai-chat`, {
+      await streamChat(`${API}/ai-chat/stream`, {
         message: userMessage,
         conversation_id: response.conversation_id
+      }, (token) => {
+        // Add AI response to chat and grow it as tokens arrive
+        if (!started) {
+          started = true;
+          setChatMessages(prev => [...prev, { role: "assistant", content: token }]);
+        } else {
+          setChatMessages(prev => [
+            ...prev.slice(0, -1),
+            { role: "assistant", content: prev[prev.length - 1].content + token }
+          ]);
+        }
       });
-      
-      // Add AI response to chat
-      setChatMessages(prev => [...prev, { role: "assistant", content: result.data.response }]);
     } catch (error) {
       console.error("Error:", error);
       toast.error("Error sending message. Please try again.");
-      // Remove the user message if failed
-      setChatMessages(prev => prev.slice(0, -1));
+      // Remove the user message (and any partial answer) if failed
+      setChatMessages(prev => prev.slice(0, started ? -2 : -1));
     } finally {
       setChatLoading(false);
     }
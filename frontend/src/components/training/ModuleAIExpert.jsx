@@ -5,7 +5,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { MessageSquare, X, Send, Sparkles, ChevronRight, Loader2 } from "lucide-react";
 import { toast } from "sonner";
-import axios from "axios";
+import { streamChat } from "@/lib/streamChat";
 
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || import.meta.env.REACT_APP_BACKEND_URL || 'https://ai-champions.preview.emergentagent.com';
 
@@ -14,6 +14,7 @@ export const ModuleAIExpert = ({ moduleId, moduleName, moduleContext }) => {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [conversationId, setConversationId] = useState(null);
   const messagesEndRef = useRef(null);
 
@@ -36,47 +37,43 @@ export const ModuleAIExpert = ({ moduleId, moduleName, moduleContext }) => {
     setMessages(prev => [...prev, { role: "user", content: userMessage }]);
     setLoading(true);
 
+    let started = false;
     try {
-      console.log('Module AI Expert - Submitting to:', `${BACKEND_URL}/api/module-assistant`);
-      console.log('Module AI Expert - BACKEND_URL:', BACKEND_URL);
-      console.log('Module AI Expert - Request data:', {
-        message: userMessage,
-        module_id: moduleId,
-        module_name: moduleName,
-        conversation_id: conversationId
-      });
+      console.log('Module AI Expert - Streaming from:', `${BACKEND_URL}/api/module-assistant/stream`);
       
-      const response = await axios.post(`${BACKEND_URL}/api/module-assistant`, {
+      const result = await streamChat(`${BACKEND_URL}/api/module-assistant/stream`, {
         message: userMessage,
         module_id: moduleId,
         module_name: moduleName,
         module_context: moduleContext,
         conversation_id: conversationId
+      }, (token) => {
+        // Grow the AI response in place as tokens arrive
+        if (!started) {
+          started = true;
+          setStreaming(true);
+          setMessages(prev => [...prev, { role: "assistant", content: token }]);
+        } else {
+          setMessages(prev => [
+            ...prev.slice(0, -1),
+            { role: "assistant", content: prev[prev.length - 1].content + token }
+          ]);
+        }
       });
 
-      console.log('Module AI Expert - Response:', response.data);
-
-      // Add AI response to chat
-      setMessages(prev => [...prev, { 
-        role: "assistant", 
-        content: response.data.response 
-      }]);
-
-      if (response.data.conversation_id && !conversationId) {
-        setConversationId(response.data.conversation_id);
+      if (result.conversation_id && !conversationId) {
+        setConversationId(result.conversation_id);
       }
     } catch (error) {
       console.error("Module AI Expert - Error getting AI response:", error);
-      console.error("Module AI Expert - Error response:", error.response?.data);
-      console.error("Module AI Expert - Error status:", error.response?.status);
-      console.error("Module AI Expert - Error message:", error.message);
       toast.error("Failed to get response. Please try again.");
-      setMessages(prev => [...prev, { 
+      setMessages(prev => [...(started ? prev.slice(0, -1) : prev), { 
         role: "assistant", 
         content: "I'm sorry, I'm having trouble connecting right now. Please try again in a moment." 
       }]);
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -169,7 +166,7 @@ export const ModuleAIExpert = ({ moduleId, moduleName, moduleContext }) => {
                 </div>
               </div>
             ))}
-            {loading && (
+            {loading && !streaming && (
               <div className="flex justify-start">
                 <div className="bg-muted text-foreground rounded-lg p-3 flex items-center space-x-2">
                   <Loader2 className="w-4 h-4 animate-spin" />
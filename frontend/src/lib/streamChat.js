@@ -0,0 +1,38 @@
+// POST a JSON body to a Server-Sent Events endpoint and forward each token as it arrives.
+// Resolves with the final {"done": true, ...} event; rejects on HTTP or stream errors.
+export async function streamChat(url, body, onToken) {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      if (!raw.startsWith("data: ")) continue;
+
+      const event = JSON.parse(raw.slice(6));
+      if (event.error) throw new Error(event.error);
+      if (event.done) return event;
+      if (event.token) onToken(event.token);
+    }
+  }
+
+  throw new Error("Stream ended before the response was complete");
+}
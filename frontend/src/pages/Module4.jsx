@@ -30,9 +30,12 @@ export default function Module4() {
   const navigate = useNavigate();
   const [successStories, setSuccessStories] = useState([]);
   const [loadingStories, setLoadingStories] = useState(true);
+  const [storiesCursor, setStoriesCursor] = useState(null);
+  const [loadingMoreStories, setLoadingMoreStories] = useState(false);
   const [showStoryForm, setShowStoryForm] = useState(false);
   const [storyForm, setStoryForm] = useState({ name: '', department: '', email: '', title: '', content: '', imageUrl: '', linkUrl: '' });
   const [submittingStory, setSubmittingStory] = useState(false);
+  const [uploadingImage, setUploadingImage] = useState(false);
   
   // Certificate state
   const [certForm, setCertForm] = useState({ name: '', email: '' });
@@ -65,6 +68,7 @@ Key Topics:
     try {
       const response = await axios.get(`${BACKEND_URL}/api/success-stories`);
       setSuccessStories(response.data.stories || []);
+      setStoriesCursor(response.data.next_cursor || null);
     } catch (error) {
       console.error("Error fetching stories:", error);
     } finally {
@@ -72,6 +76,29 @@ Key Topics:
     }
   };
 
+  const loadMoreStories = async () => {
+    if (!storiesCursor) return;
+    setLoadingMoreStories(true);
+    try {
+      const response = await axios.get(`${BACKEND_URL}/api/success-stories`, { params: { cursor: storiesCursor } });
+      setSuccessStories(prev => [...prev, ...(response.data.stories || [])]);
+      setStoriesCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error("Error fetching stories:", error);
+    } finally {
+      setLoadingMoreStories(false);
+    }
+  };
+
+  const readFullStory = async (storyId) => {
+    try {
+      const response = await axios.get(`${BACKEND_URL}/api/success-stories/${storyId}`);
+      setSuccessStories(prev => prev.map(s => s.id === storyId ? { ...s, ...response.data, truncated: false } : s));
+    } catch (error) {
+      toast.error("Failed to load the full story");
+    }
+  };
+
   const handleStorySubmit = async (e) => {
     e.preventDefault();
     if (!storyForm.name || !storyForm.email || !storyForm.title || !storyForm.content) {
@@ -93,6 +120,26 @@ Key Topics:
     }
   };
 
+  // Uploaded images come back as backend-relative URLs
+  const storyImageSrc = (url) => url && url.startsWith('/') ? `${BACKEND_URL}${url}` : url;
+
+  const handleImageUpload = async (e) => {
+    const file = e.target.files?.[0];
+    if (!file) return;
+    setUploadingImage(true);
+    try {
+      const response = await axios.post(`${BACKEND_URL}/api/story-images`, file, {
+        headers: { 'Content-Type': file.type || 'application/octet-stream' }
+      });
+      setStoryForm(prev => ({ ...prev, imageUrl: response.data.imageUrl }));
+    } catch (error) {
+      toast.error(error.response?.data?.detail || "Failed to upload image");
+    } finally {
+      setUploadingImage(false);
+      e.target.value = '';
+    }
+  };
+
   const handleLike = async (storyId, userEmail) => {
     if (!userEmail) {
       const email = prompt("Enter your email to like this story (must have completed a quiz):");
@@ -1192,7 +1239,7 @@ Key Topics:
                     </div>
                     <div className="grid md:grid-cols-2 gap-4">
                       <div className="space-y-2">
-                        <Label htmlFor="story-image">Image URL (optional)</Label>
+                        <Label htmlFor="story-image">Image (optional)</Label>
                         <div className="flex space-x-2">
                           <ImageIcon className="w-5 h-5 text-muted-foreground mt-2" />
                           <Input 
@@ -1202,6 +1249,16 @@ Key Topics:
                             placeholder="https://..."
                           />
                         </div>
+                        <div className="flex items-center space-x-2">
+                          <Input
+                            id="story-image-file"
+                            type="file"
+                            accept="image/jpeg,image/png,image/gif,image/webp"
+                            onChange={handleImageUpload}
+                            disabled={uploadingImage}
+                          />
+                          {uploadingImage && <Loader2 className="w-4 h-4 animate-spin text-amber-600" />}
+                        </div>
                       </div>
                       <div className="space-y-2">
                         <Label htmlFor="story-link">Related Link (optional)</Label>
@@ -1245,8 +1302,8 @@ Key Topics:
                   </CardContent>
                 </Card>
               ) : (
-                successStories.map((story, idx) => (
-                  <Card key={idx} className="shadow-card hover:shadow-lg transition-shadow">
+                successStories.map((story) => (
+                  <Card key={story.id} className="shadow-card hover:shadow-lg transition-shadow">
                     <CardHeader>
                       <div className="flex items-start justify-between">
                         <div>
@@ -1275,9 +1332,25 @@ Key Topics:
                       </div>
                     </CardHeader>
                     <CardContent className="space-y-3">
-                      <p className="text-sm text-muted-foreground whitespace-pre-wrap">{story.content}</p>
-                      {story.imageUrl && (
-                        <img src={story.imageUrl} alt="Story" className="rounded-lg max-h-64 object-cover" />
+                      <p className="text-sm text-muted-foreground whitespace-pre-wrap">
+                        {story.content}{story.truncated && '…'}
+                      </p>
+                      {story.truncated && (
+                        <button
+                          type="button"
+                          onClick={() => readFullStory(story.id)}
+                          className="text-sm text-primary hover:underline"
+                        >
+                          Read more
+                        </button>
+                      )}
+                      {(story.thumbnailUrl || story.imageUrl) && (
+                        <img
+                          src={storyImageSrc(story.thumbnailUrl || story.imageUrl)}
+                          alt="Story"
+                          loading="lazy"
+                          className="rounded-lg max-h-64 object-cover"
+                        />
                       )}
                       {story.linkUrl && (
                         <a 
@@ -1294,6 +1367,14 @@ Key Topics:
                   </Card>
                 ))
               )}
+              {storiesCursor && !loadingStories && (
+                <div className="text-center">
+                  <Button variant="outline" onClick={loadMoreStories} disabled={loadingMoreStories}>
+                    {loadingMoreStories ? <Loader2 className="w-4 h-4 mr-2 animate-spin" /> : null}
+                    Load more stories
+                  </Button>
+                </div>
+              )}
             </div>
           </div>
         </section>
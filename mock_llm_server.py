@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Mock LLM Server for Dynamics G-Ex AI Hub
+A local OpenAI-compatible /v1/chat/completions endpoint for load testing without the live API.
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8090/v1 (any OPENAI_API_KEY works).
+
+Usage:
+    python mock_llm_server.py
+    python mock_llm_server.py --latency-ms 1200 --latency-p95-ms 4000 --token-ms 15
+    python mock_llm_server.py --error-rate 0.05 --error-status 429,503
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+# Overwritten from the command line in main()
+CONFIG = {
+    "latency_ms": 800,
+    "latency_p95_ms": 2000,
+    "token_ms": 20,
+    "completion_tokens": 120,
+    "error_rate": 0.0,
+    "error_status": [503],
+}
+
+WORDS = ("Copilot can draft the first version for you , then refine it with your team . "
+         "Start with a clear prompt , review the output , and keep a human in the loop .").split()
+
+HELPER_RESPONSE = {
+    "approach": "1. Collect the inputs in one place\n2. Ask Copilot to draft a first version\n3. Review and refine with the team",
+    "tool": "Copilot in Excel",
+    "why": "It removes the manual first pass so the team can focus on judgement calls.",
+    "strategic_alignment": "Supports operational excellence by freeing time for higher value work."
+}
+
+
+def sample_latency_seconds():
+    """Log-normal time to first token with the configured median and p95"""
+    median = CONFIG["latency_ms"] / 1000
+    p95 = max(CONFIG["latency_p95_ms"] / 1000, median)
+    sigma = math.log(p95 / median) / 1.645 if median > 0 else 0
+    return median * math.exp(random.gauss(0, sigma)) if median > 0 else 0
+
+
+def completion_text(body):
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps(HELPER_RESPONSE)
+    count = min(body.get("max_tokens") or CONFIG["completion_tokens"], CONFIG["completion_tokens"])
+    return " ".join(WORDS[i % len(WORDS)] for i in range(count))
+
+
+def usage(body, text):
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+    completion_tokens = max(len(text) // 4, 1)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def injected_error():
+    if random.random() >= CONFIG["error_rate"]:
+        return None
+    status = random.choice(CONFIG["error_status"])
+    headers = {"retry-after": "1"} if status == 429 else {}
+    return JSONResponse(
+        status_code=status,
+        headers=headers,
+        content={"error": {"message": f"Injected {status} from mock LLM server", "type": "mock_error", "code": None}}
+    )
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(sample_latency_seconds())
+
+    error = injected_error()
+    if error is not None:
+        return error
+
+    completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o")
+    text = completion_text(body)
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage(body, text)
+        }
+
+    async def events():
+        def chunk(delta, finish_reason=None, **extra):
+            choices = [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else []
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        for i, word in enumerate(text.split(" ")):
+            await asyncio.sleep(CONFIG["token_ms"] / 1000)
+            yield chunk({"content": word if i == 0 else f" {word}"})
+        yield chunk({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield chunk(None, usage=usage(body, text))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "gpt-4o", "object": "model"}, {"id": "gpt-4o-mini", "object": "model"}]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"], help="Median time to first token")
+    parser.add_argument("--latency-p95-ms", type=float, default=CONFIG["latency_p95_ms"], help="95th percentile time to first token")
+    parser.add_argument("--token-ms", type=float, default=CONFIG["token_ms"], help="Delay between streamed tokens")
+    parser.add_argument("--completion-tokens", type=int, default=CONFIG["completion_tokens"], help="Words per free-text completion")
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"], help="Fraction of requests that fail")
+    parser.add_argument("--error-status", default="503", help="Comma separated HTTP statuses to inject, e.g. 429,503")
+    args = parser.parse_args()
+
+    CONFIG.update(
+        latency_ms=args.latency_ms,
+        latency_p95_ms=args.latency_p95_ms,
+        token_ms=args.token_ms,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_status=[int(s) for s in args.error_status.split(",")]
+    )
+    print(f"🤖 Mock LLM server on http://{args.host}:{args.port}/v1 {CONFIG}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,15 @@ import pytest
 import requests
 import os
 import time
+import csv
+import io
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://ai-champions.preview.emergentagent.com')
+# 1x1 PNG
+TEST_PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGP4f4IBAASRAcjyuzl2AAAAAElFTkSuQmCC")
 
 class TestHealthAndBasicEndpoints:
     """Basic endpoint availability tests"""
@@ -24,7 +31,15 @@ class TestHealthAndBasicEndpoints:
         data = response.json()
         # Should return a dict with module IDs as keys
         assert isinstance(data, dict)
-    
+
+    def test_module_stats_fields(self):
+        """Test each module entry carries aggregated counts and an average percentage"""
+        response = requests.get(f"{BASE_URL}/api/module-stats")
+        assert response.status_code == 200
+        for module_id, stats in response.json().items():
+            assert stats["completions"] == stats["count"]
+            assert 0 <= stats["avgScore"] <= 100
+
     def test_success_stories_endpoint(self):
         """Test success stories endpoint returns data"""
         response = requests.get(f"{BASE_URL}/api/success-stories")
@@ -46,6 +61,15 @@ class TestHealthAndBasicEndpoints:
         assert "storiesShared" in data["stats"]
         assert "totalLikes" in data["stats"]
 
+    def test_champions_leaderboard_sorted_top_ten(self):
+        """Test leaderboard is the top 10 profiles ordered by impact score"""
+        response = requests.get(f"{BASE_URL}/api/champions/dashboard")
+        assert response.status_code == 200
+        leaderboard = response.json()["leaderboard"]
+        assert len(leaderboard) <= 10
+        scores = [entry["impactScore"] for entry in leaderboard]
+        assert scores == sorted(scores, reverse=True)
+
 
 class TestQuizSubmission:
     """Quiz submission endpoint tests"""
@@ -73,6 +97,79 @@ class TestQuizSubmission:
         data = response.json()
         assert data["success"] == True
     
+    def test_quiz_submit_with_dollar_name(self):
+        """Test names and departments starting with "$" are stored as text, not read as field paths"""
+        payload = {
+            "name": "$$x", "email": f"test_dollar_{int(time.time())}@test.com", "department": "$email",
+            "answers": {}, "score": 5, "time_taken": 60, "feedback": "", "module_id": 1
+        }
+        response = requests.post(f"{BASE_URL}/api/quiz-submit", json=payload)
+        assert response.status_code == 200
+    
+    def test_quiz_submit_bulk_reports_each_row(self):
+        """Test bulk NDJSON import inserts valid rows and reports invalid ones"""
+        row = {
+            "name": "TEST_Bulk User",
+            "email": f"test_bulk_{int(time.time())}@test.com",
+            "department": "IT",
+            "answers": {"1": {"selected": "A", "correct": True}},
+            "score": 7,
+            "time_taken": 90,
+            "feedback": "",
+            "module_id": 2,
+            "module_name": "Module 2: Governance"
+        }
+        body = "\n".join([json.dumps(row), json.dumps({"name": "TEST_Missing Fields"}), "{not json", json.dumps(row)])
+        response = requests.post(
+            f"{BASE_URL}/api/quiz-submit/bulk?password=Dynamics@26",
+            data=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["inserted"] == 2
+        assert data["failed"] == 2
+        assert [r["status"] for r in data["results"]] == ["inserted", "invalid", "invalid", "inserted"]
+
+    def test_quiz_submit_bulk_stores_offset_timestamp_as_utc(self):
+        """Test bulk import converts timestamps with a UTC offset to UTC before storing them"""
+        department = f"TEST_Offset_{int(time.time())}"
+        row = {
+            "name": "TEST_Offset User",
+            "email": f"test_offset_{int(time.time())}@test.com",
+            "department": department,
+            "answers": {"1": {"selected": "A", "correct": True}},
+            "score": 7,
+            "time_taken": 90,
+            "feedback": "",
+            "module_id": 2,
+            "module_name": "Module 2: Governance",
+            "timestamp": "2026-03-01T09:00:00+10:00"
+        }
+        response = requests.post(f"{BASE_URL}/api/quiz-submit/bulk?password=Dynamics@26", json=[row])
+        assert response.status_code == 200
+        assert response.json()["inserted"] == 1
+
+        response = requests.get(
+            f"{BASE_URL}/api/quiz-results/page?password=Dynamics@26&department={department}"
+        )
+        assert response.status_code == 200
+        assert response.json()["submissions"][0]["timestamp"] == "2026-02-28T23:00:00+00:00"
+
+    def test_quiz_submit_bulk_rejects_non_utf8(self):
+        """Test a body that is not UTF-8 is rejected with 400"""
+        response = requests.post(
+            f"{BASE_URL}/api/quiz-submit/bulk?password=Dynamics@26",
+            data=b"\xff\xfe{}",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 400
+
+    def test_quiz_submit_bulk_wrong_password(self):
+        """Test bulk import requires the admin password"""
+        response = requests.post(f"{BASE_URL}/api/quiz-submit/bulk?password=wrong", json=[])
+        assert response.status_code == 403
+    
     def test_quiz_submit_missing_fields(self):
         """Test quiz submission with missing required fields"""
         payload = {
@@ -108,6 +205,55 @@ class TestQuizResultsAdmin:
         content_type = response.headers.get("content-type", "")
         assert "text/csv" in content_type or "application/octet-stream" in content_type
 
+    def test_quiz_results_download_with_filters(self):
+        """Test CSV download only streams rows matching the module and date filters"""
+        response = requests.get(
+            f"{BASE_URL}/api/quiz-results/download?password=Dynamics@26&module_id=1&date_from=2025-01-01&date_to=2099-12-31"
+        )
+        assert response.status_code == 200
+        if "text/csv" in response.headers.get("content-type", ""):
+            rows = list(csv.DictReader(io.StringIO(response.text)))
+            assert all(row["module_id"] == "1" for row in rows)
+
+    def test_quiz_results_download_with_invalid_date(self):
+        """Test CSV download rejects malformed date filters"""
+        response = requests.get(f"{BASE_URL}/api/quiz-results/download?password=Dynamics@26&date_from=yesterday")
+        assert response.status_code == 400
+
+    def test_quiz_results_page_keyset_pagination(self):
+        """Test results pages are newest first and the cursor continues without overlap"""
+        first = requests.get(f"{BASE_URL}/api/quiz-results/page?password=Dynamics@26&limit=2")
+        assert first.status_code == 200
+        data = first.json()
+        assert "submissions" in data
+        assert len(data["submissions"]) <= 2
+        timestamps = [sub["timestamp"] for sub in data["submissions"]]
+        assert timestamps == sorted(timestamps, reverse=True)
+        if data["next_cursor"]:
+            second = requests.get(
+                f"{BASE_URL}/api/quiz-results/page?password=Dynamics@26&limit=2&cursor={data['next_cursor']}"
+            ).json()
+            assert all(sub["timestamp"] <= timestamps[-1] for sub in second["submissions"])
+
+    def test_quiz_results_page_with_invalid_cursor(self):
+        """Test results page rejects a malformed cursor"""
+        response = requests.get(f"{BASE_URL}/api/quiz-results/page?password=Dynamics@26&cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    def test_module_stats_rebuild_with_wrong_password(self):
+        """Test rollup rebuild rejects an incorrect password"""
+        response = requests.post(f"{BASE_URL}/api/module-stats/rebuild?password=wrongpassword")
+        assert response.status_code == 403
+
+    def test_module_stats_rebuild_matches_live_rollup(self):
+        """Test rebuilding the rollup from history reproduces the incrementally maintained stats"""
+        before = requests.get(f"{BASE_URL}/api/module-stats").json()
+        response = requests.post(f"{BASE_URL}/api/module-stats/rebuild?password=Dynamics@26")
+        assert response.status_code == 200
+        assert response.json()["success"] == True
+        after = requests.get(f"{BASE_URL}/api/module-stats").json()
+        assert after == before
+
 
 class TestSuccessStories:
     """Success stories CRUD tests"""
@@ -138,6 +284,68 @@ class TestSuccessStories:
         assert "stories" in data
         # Should have at least one story (from previous test or seed data)
         assert len(data["stories"]) >= 0
+    
+    def test_success_stories_keyset_pagination(self):
+        """Test story pages are newest first and the cursor continues without overlap"""
+        first = requests.get(f"{BASE_URL}/api/success-stories?limit=2").json()
+        assert len(first["stories"]) <= 2
+        timestamps = [story["timestamp"] for story in first["stories"]]
+        assert timestamps == sorted(timestamps, reverse=True)
+        if first["next_cursor"]:
+            second = requests.get(f"{BASE_URL}/api/success-stories?limit=2&cursor={first['next_cursor']}").json()
+            assert all(story["timestamp"] <= timestamps[-1] for story in second["stories"])
+            assert not {s["id"] for s in first["stories"]} & {s["id"] for s in second["stories"]}
+    
+    def test_success_stories_list_shows_excerpt(self):
+        """Test the feed truncates long content and the story endpoint returns it in full"""
+        content = "Long story. " * 100
+        payload = {
+            "name": "TEST_Story Author", "department": "IT", "email": "",
+            "title": f"TEST long story {int(time.time())}", "content": content
+        }
+        story_id = requests.post(f"{BASE_URL}/api/success-stories", json=payload).json()["id"]
+        
+        listed = next(s for s in requests.get(f"{BASE_URL}/api/success-stories").json()["stories"] if s["id"] == story_id)
+        assert listed["truncated"] is True
+        assert len(listed["content"]) < len(content)
+        assert requests.get(f"{BASE_URL}/api/success-stories/{story_id}").json()["content"] == content
+    
+    def test_story_image_upload_is_deduplicated(self):
+        """Test uploading the same image twice stores it once and serves a cacheable thumbnail"""
+        first = requests.post(f"{BASE_URL}/api/story-images", data=TEST_PNG, headers={"Content-Type": "image/png"})
+        assert first.status_code == 200
+        second = requests.post(f"{BASE_URL}/api/story-images", data=TEST_PNG, headers={"Content-Type": "image/png"})
+        assert second.json()["id"] == first.json()["id"]
+        
+        thumbnail = requests.get(f"{BASE_URL}{first.json()['thumbnailUrl']}")
+        assert thumbnail.status_code == 200
+        assert thumbnail.headers["Content-Type"] == "image/jpeg"
+        assert "immutable" in thumbnail.headers["Cache-Control"]
+    
+    def test_story_image_upload_rejects_non_images(self):
+        """Test the image store only accepts images"""
+        response = requests.post(f"{BASE_URL}/api/story-images", data=b"not an image")
+        assert response.status_code == 400
+    
+    def test_inline_story_image_served_as_thumbnail(self):
+        """Test a data URI image is stored by hash and the feed only references its thumbnail"""
+        payload = {
+            "name": "TEST_Story Author", "department": "IT", "email": "",
+            "title": f"TEST inline image {int(time.time())}", "content": "Story with an inline image",
+            "imageUrl": "data:image/png;base64," + base64.b64encode(TEST_PNG).decode()
+        }
+        story_id = requests.post(f"{BASE_URL}/api/success-stories", json=payload).json()["id"]
+        
+        listed = next(s for s in requests.get(f"{BASE_URL}/api/success-stories").json()["stories"] if s["id"] == story_id)
+        assert listed["thumbnailUrl"].endswith("/thumb")
+        assert "imageUrl" not in listed
+        story = requests.get(f"{BASE_URL}/api/success-stories/{story_id}").json()
+        assert story["imageUrl"].startswith("/api/story-images/")
+    
+    def test_success_stories_invalid_cursor(self):
+        """Test the feed rejects a malformed cursor"""
+        response = requests.get(f"{BASE_URL}/api/success-stories?cursor=not-a-cursor")
+        assert response.status_code == 400
 
 
 class TestCertificateEndpoints:
@@ -160,6 +368,30 @@ class TestCertificateEndpoints:
         data = response.json()
         assert data["eligible"] == False
     
+    def test_certificate_check_reflects_new_submission(self):
+        """Test eligibility picks up a quiz submitted after an earlier check"""
+        email = f"test_eligibility_{int(time.time())}@test.com"
+        payload = {"email": email, "name": "TEST_Eligibility User"}
+        before = requests.post(f"{BASE_URL}/api/certificate/check", json=payload).json()
+        assert before["modules"][0]["score"] is None
+        
+        submission = {
+            "name": "TEST_Eligibility User",
+            "email": email.upper(),
+            "department": "IT",
+            "answers": {"1": {"selected": "A", "correct": True}},
+            "score": 8,
+            "time_taken": 60,
+            "feedback": "",
+            "module_id": 1,
+            "module_name": "Module 1: AI Fundamentals"
+        }
+        assert requests.post(f"{BASE_URL}/api/quiz-submit", json=submission).status_code == 200
+        
+        after = requests.post(f"{BASE_URL}/api/certificate/check", json=payload).json()
+        assert after["modules"][0] == {"name": "Module 1: AI Fundamentals", "score": 80, "passed": True}
+        assert after["eligible"] == False
+    
     def test_certificate_generate_test_bypass(self):
         """Test certificate generation with bypass email"""
         payload = {"email": "certificate@dynamicsgex.com.au", "name": "Test Champion"}
@@ -167,6 +399,71 @@ class TestCertificateEndpoints:
         assert response.status_code == 200
         # Should return PDF
         assert "application/pdf" in response.headers.get("content-type", "")
+    
+    def test_certificate_generate_repeat_is_cached(self):
+        """Test a repeat download returns the same certificate and honours If-None-Match"""
+        payload = {"email": "certificate@dynamicsgex.com.au", "name": "Test Champion"}
+        first = requests.post(f"{BASE_URL}/api/certificate/generate", json=payload)
+        assert first.status_code == 200
+        etag = first.headers.get("etag")
+        assert etag
+        
+        second = requests.post(f"{BASE_URL}/api/certificate/generate", json=payload)
+        assert second.status_code == 200
+        assert second.content == first.content
+        assert second.headers.get("etag") == etag
+        
+        not_modified = requests.post(f"{BASE_URL}/api/certificate/generate", json=payload,
+                                     headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+
+
+class TestAIHelper:
+    """AI helper endpoint and response cache tests"""
+    
+    def test_health_reports_model_circuit(self):
+        """Test the health endpoint exposes the model circuit breaker state"""
+        response = requests.get(f"{BASE_URL}/api/health")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["model_circuit"]["state"] in ["closed", "open", "half_open"]
+        assert data["status"] == ("ok" if data["model_circuit"]["state"] == "closed" else "degraded")
+    
+    def test_model_gateway_stats(self):
+        """Test the model gateway reports concurrency limits and per-endpoint timings"""
+        response = requests.get(f"{BASE_URL}/api/model-gateway/stats")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["in_flight"] <= data["max_in_flight"]
+        for endpoint in data["endpoints"].values():
+            assert "avg_queue_wait_ms" in endpoint
+            assert "avg_model_ms" in endpoint
+    
+    def test_write_behind_stats(self):
+        """Test the write-behind buffer reports its queue depth"""
+        response = requests.get(f"{BASE_URL}/api/write-behind/stats")
+        assert response.status_code == 200
+        data = response.json()
+        for field in ["depth", "pending", "written", "failed", "batches"]:
+            assert field in data
+        assert data["depth"] >= 0
+    
+    def test_ai_helper_repeated_challenge_uses_cache(self):
+        """Test identical department/challenge pairs are looked up in the response cache"""
+        before = requests.get(f"{BASE_URL}/api/ai-helper/cache-stats").json()
+        payload = {
+            "name": "TEST_Cache User",
+            "department": "sales",
+            "challenge": f"TEST forecasting pipeline {int(time.time())}"
+        }
+        first = requests.post(f"{BASE_URL}/api/ai-helper", json=payload)
+        second = requests.post(f"{BASE_URL}/api/ai-helper", json={**payload, "challenge": payload["challenge"].upper()})
+        assert first.status_code == 200
+        assert second.status_code == 200
+        # Each response still gets its own conversation
+        assert first.json()["conversation_id"] != second.json()["conversation_id"]
+        after = requests.get(f"{BASE_URL}/api/ai-helper/cache-stats").json()
+        assert after["hits"] + after["misses"] == before["hits"] + before["misses"] + 2
 
 
 class TestModuleAssistant:
@@ -212,6 +509,22 @@ class TestModuleAssistant:
         assert response2.status_code == 200
         assert response2.json()["conversation_id"] == conversation_id
 
+    def test_module_assistant_stream(self):
+        """Test streaming module assistant sends tokens then a done event with the conversation ID"""
+        payload = {
+            "message": "What is a prompt?",
+            "module_id": 1,
+            "module_name": "Module 1",
+            "module_context": "AI basics"
+        }
+        response = requests.post(f"{BASE_URL}/api/module-assistant/stream", json=payload, stream=True)
+        assert response.status_code == 200
+        assert "text/event-stream" in response.headers.get("content-type", "")
+        events = [json.loads(line[6:]) for line in response.iter_lines(decode_unicode=True) if line.startswith("data: ")]
+        assert any("token" in event for event in events)
+        assert events[-1]["done"] == True
+        assert events[-1]["conversation_id"]
+
 
 class TestStoryLikes:
     """Story like functionality tests"""
@@ -228,6 +541,34 @@ class TestStoryLikes:
             response = requests.post(f"{BASE_URL}/api/success-stories/{story_id}/like", json=payload)
             # Should fail because user hasn't completed a quiz
             assert response.status_code == 403
+    
+    def test_concurrent_likes_counted_once(self):
+        """Test a burst of likes from one email counts exactly one like"""
+        email = f"test_likes_{int(time.time())}@test.com"
+        quiz = {
+            "name": "TEST_Like User", "email": email, "department": "IT",
+            "answers": {}, "score": 5, "time_taken": 60, "feedback": "", "module_id": 1
+        }
+        assert requests.post(f"{BASE_URL}/api/quiz-submit", json=quiz).status_code == 200
+        story = {
+            "name": "TEST_Story Author", "department": "IT", "email": "",
+            "title": f"TEST like storm {int(time.time())}", "content": "Testing likes"
+        }
+        story_id = requests.post(f"{BASE_URL}/api/success-stories", json=story).json()["id"]
+        
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            statuses = list(pool.map(
+                lambda e: requests.post(f"{BASE_URL}/api/success-stories/{story_id}/like", json={"email": e}).status_code,
+                [email, email.upper(), email, email, email]
+            ))
+        assert sorted(statuses) == [200, 400, 400, 400, 400]
+        
+        liked = requests.get(f"{BASE_URL}/api/success-stories/{story_id}").json()
+        assert liked["likes"] == 1
+        assert "liked_by" not in liked
+        
+        first_page = requests.get(f"{BASE_URL}/api/success-stories").json()["stories"]
+        assert next(s for s in first_page if s["id"] == story_id)["likes"] == 1
 
 
 if __name__ == "__main__":
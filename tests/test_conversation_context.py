@@ -0,0 +1,101 @@
+"""
+Conversation Context Window Tests for Dynamics G-Ex AI Hub
+Checks that prompts built for /api/ai-chat and /api/module-assistant stay bounded as conversations grow.
+"""
+import pytest
+import os
+import sys
+from pathlib import Path
+
+pytest.importorskip("motor")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dgx_test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import server  # noqa: E402
+
+PREAMBLE = [{"role": "system", "content": "You are the DGX AI Expert."}]
+
+
+def make_turn(i, size=400):
+    return {"seq": i + 1, "user": f"Question {i} " + "q" * size, "assistant": f"Answer {i} " + "a" * size * 2}
+
+
+def make_conversation(turns, summary=None, summary_turns=0):
+    """Conversation as load_conversation returns it: parent fields plus the newest unsummarized turns"""
+    conversation = {"conversation_id": "c", "turn_count": len(turns), "summary_turns": summary_turns}
+    if summary:
+        conversation["summary"] = summary
+    conversation["recent_turns"] = [t for t in turns if t["seq"] > summary_turns][-server.CONTEXT_RECENT_TURNS:]
+    return conversation
+
+
+def prompt_tokens(messages):
+    return sum(server.estimate_tokens(m["content"]) for m in messages)
+
+
+def fold_summary(conversation):
+    """Stand-in for summarize_conversation: apply a worst-case (maximum length) summary"""
+    fold_end = server.summary_fold_end(conversation)
+    if fold_end:
+        return "s" * server.CONTEXT_SUMMARY_MAX_CHARS, fold_end
+    return conversation.get("summary"), conversation["summary_turns"]
+
+
+class TestContextWindow:
+    """Prompt size over long conversations"""
+
+    def test_prompt_bounded_over_200_turns_with_summaries(self):
+        """Test prompt tokens and message count stay flat across a 200-turn conversation"""
+        turns, summary, summary_turns = [], None, 0
+        sizes = []
+        for i in range(200):
+            conversation = make_conversation(turns, summary, summary_turns)
+            messages = server.build_context_window(PREAMBLE, conversation, f"Question {i}")
+            assert prompt_tokens(messages) <= server.CONTEXT_TOKEN_BUDGET
+            assert len(messages) <= len(PREAMBLE) + 1 + server.CONTEXT_RECENT_TURNS * 2 + 1
+            sizes.append(prompt_tokens(messages))
+            turns.append(make_turn(i))
+            summary, summary_turns = fold_summary(make_conversation(turns, summary, summary_turns))
+        # Once the window is full, growth stops
+        assert max(sizes[50:]) == max(sizes[100:])
+
+    def test_prompt_bounded_when_summaries_fail(self):
+        """Test the token budget alone bounds the prompt if no summary is ever written"""
+        conversation = make_conversation([make_turn(i) for i in range(200)])
+        messages = server.build_context_window(PREAMBLE, conversation, "Next question")
+        assert prompt_tokens(messages) <= server.CONTEXT_TOKEN_BUDGET
+        assert len(messages) <= len(PREAMBLE) + server.CONTEXT_RECENT_TURNS * 2 + 1
+
+    def test_recent_turns_kept_verbatim_and_in_order(self):
+        """Test the newest turns are replayed exactly, oldest first, before the new message"""
+        turns = [make_turn(i, size=10) for i in range(20)]
+        conversation = make_conversation(turns, "Earlier chat", 10)
+        messages = server.build_context_window(PREAMBLE, conversation, "Latest")
+        assert messages[1]["content"].endswith("Earlier chat")
+        replayed = messages[2:-1]
+        expected = turns[-server.CONTEXT_RECENT_TURNS:]
+        assert [m["content"] for m in replayed[::2]] == [t["user"] for t in expected]
+        assert [m["content"] for m in replayed[1::2]] == [t["assistant"] for t in expected]
+        assert messages[-1] == {"role": "user", "content": "Latest"}
+
+    def test_oversized_turns_trimmed_by_budget(self):
+        """Test a few very long turns are dropped oldest-first to respect the budget"""
+        turns = [make_turn(i, size=server.CONTEXT_TOKEN_BUDGET * 2) for i in range(3)]
+        conversation = make_conversation(turns)
+        messages = server.build_context_window(PREAMBLE, conversation, "Latest")
+        assert prompt_tokens(messages) <= server.CONTEXT_TOKEN_BUDGET
+        assert messages == PREAMBLE + [{"role": "user", "content": "Latest"}]
+
+    def test_turns_folded_in_batches(self):
+        """Test summaries are only requested once twice the verbatim window is unsummarized"""
+        limit = server.CONTEXT_RECENT_TURNS * 2
+        assert server.summary_fold_end({"turn_count": limit}) == 0
+        assert server.summary_fold_end({"turn_count": limit + 1}) == limit + 1 - server.CONTEXT_RECENT_TURNS
+        assert server.summary_fold_end({"turn_count": limit + 5, "summary_turns": 5}) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,108 @@
+"""
+Event Loop Blocking Detector Tests for Dynamics G-Ex AI Hub
+Checks that synchronous work on the event loop is reported against the route that did it.
+"""
+import pytest
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+pytest.importorskip("motor")
+httpx = pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dgx_test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import server  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+app = FastAPI()
+
+
+@app.get("/block")
+async def block():
+    time.sleep(0.25)
+    return {}
+
+
+@app.get("/nested")
+async def nested():
+    def build_report():
+        time.sleep(0.25)
+    build_report()
+    return {}
+
+
+@app.get("/fast")
+async def fast():
+    await asyncio.sleep(0.01)
+    return {}
+
+
+def run_with_detector(*paths, background_block=0.0):
+    """Serve the paths in-process with a fresh detector on the loop; return its report"""
+    detector = server.LoopBlockDetector(threshold_seconds=0.1, sample_interval_seconds=0.02)
+
+    async def run():
+        detector.start(asyncio.get_running_loop(), app)
+        # Debug timing applies from the next callback on, as for requests after startup
+        await asyncio.sleep(0)
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                for path in paths:
+                    assert (await http.get(path)).status_code == 200
+            if background_block:
+                asyncio.get_running_loop().call_soon(time.sleep, background_block)
+            # Let the blocked step end (and be logged) before the detector is removed
+            await asyncio.sleep(0.05)
+        finally:
+            detector.stop()
+        return detector.report()
+
+    return asyncio.run(run())
+
+
+class TestLoopBlockDetector:
+    """Slow callback attribution"""
+
+    def test_blocking_endpoint_attributed_to_route(self):
+        """Test a handler that sleeps synchronously is reported under its route with its stack"""
+        report = run_with_detector("/block")
+        assert report["threshold_ms"] == 100
+        entry = report["routes"]["GET /block"]
+        assert entry["count"] == 1
+        assert entry["max_ms"] >= 200
+        assert entry["top_stacks"][0]["stack"][-1].endswith(" block")
+
+    def test_nested_function_attributed_to_enclosing_route(self):
+        """Test blocking inside a function defined in the endpoint counts against the endpoint"""
+        report = run_with_detector("/nested")
+        assert "GET /nested" in report["routes"]
+        assert report["routes"]["GET /nested"]["top_stacks"][0]["stack"][-1].endswith(" build_report")
+
+    def test_fast_endpoint_not_reported(self):
+        """Test handlers that only await are never reported"""
+        report = run_with_detector("/fast", "/fast")
+        assert report["routes"] == {}
+
+    def test_blocking_outside_requests_reported_as_background(self):
+        """Test a slow callback with no endpoint on the stack is reported as background work"""
+        report = run_with_detector(background_block=0.25)
+        assert report["routes"]["background"]["count"] == 1
+
+    def test_report_requires_password(self):
+        """Test the report endpoint is admin only"""
+        async def get():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await http.get("/api/loop-blocking/report?password=wrong")
+        assert asyncio.run(get()).status_code == 403
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
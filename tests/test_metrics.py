@@ -0,0 +1,84 @@
+"""
+Metrics Tests for Dynamics G-Ex AI Hub
+Checks the Prometheus text exposition served on /metrics and the per-route request timings behind it.
+"""
+import pytest
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+pytest.importorskip("motor")
+httpx = pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dgx_test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import server  # noqa: E402
+
+
+def get(*paths):
+    """GET each path in-process (no lifespan, so no database is touched) and return the last response"""
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            for path in paths:
+                response = await http.get(path)
+            return response
+    return asyncio.run(run())
+
+
+class TestExposition:
+    """Text format of the metric types"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test each bucket counts every observation at or below its bound"""
+        histogram = server.Histogram("test_seconds", "Test", ["route"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value, route="/a")
+        lines = histogram.render()
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 2' in lines
+        assert 'test_seconds_bucket{route="/a",le="1.0"} 3' in lines
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+        assert 'test_seconds_sum{route="/a"} 5.65' in lines
+        assert 'test_seconds_count{route="/a"} 4' in lines
+
+    def test_label_values_are_escaped(self):
+        """Test quotes, backslashes and newlines in label values cannot break the format"""
+        counter = server.Counter("test_total", "Test", ["name"])
+        counter.inc(name='a"b\\c\nd')
+        assert counter.render()[-1] == 'test_total{name="a\\"b\\\\c\\nd"} 1.0'
+
+    def test_collected_counters_read_live_state(self):
+        """Test counters backed by a collect callable report its current values"""
+        state = {"x": 1}
+        counter = server.Counter("test_collected_total", "Test", ["key"],
+                                 collect=lambda: [({"key": k}, v) for k, v in state.items()])
+        state["x"] = 3
+        assert counter.render()[-1] == 'test_collected_total{key="x"} 3.0'
+
+
+class TestMetricsEndpoint:
+    """/metrics as scraped"""
+
+    def test_requests_timed_by_route_template(self):
+        """Test requests are labelled with the route template, not the raw path"""
+        response = get("/api/", "/api/story-images/" + "a" * 64, "/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/",status="200"}' in response.text
+        assert 'route="/api/story-images/{image_id}",status="404"' in response.text
+        assert "a" * 64 not in response.text
+
+    def test_dependency_metrics_exposed(self):
+        """Test MongoDB, model, certificate and event loop metrics are declared"""
+        text = get("/metrics").text
+        for name in ("mongodb_command_duration_seconds", "openai_request_duration_seconds", "openai_tokens_total",
+                     "certificate_render_duration_seconds", "event_loop_lag_seconds"):
+            assert f"# TYPE {name} " in text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,82 @@
+"""
+MongoDB Index Tests for Dynamics G-Ex AI Hub
+Runs explain() on every hot endpoint query against a scratch database and asserts it is served by an index.
+Requires MONGO_URL (and optionally DB_NAME) pointing at a reachable MongoDB.
+"""
+import pytest
+import os
+import sys
+from pathlib import Path
+
+pytest.importorskip("motor")
+if not os.environ.get("MONGO_URL"):
+    pytest.skip("MONGO_URL is not set", allow_module_level=True)
+
+from pymongo import MongoClient  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+
+# Other test modules default MONGO_URL so they can import the server; only run against a live database
+try:
+    with MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=2000) as ping_client:
+        ping_client.admin.command("ping")
+except PyMongoError as e:
+    pytest.skip(f"MongoDB at MONGO_URL is not reachable: {e}", allow_module_level=True)
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+os.environ["DB_NAME"] = f"{os.environ.get('DB_NAME', 'dgx')}_index_test"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import server  # noqa: E402
+
+# (endpoint, collection, filter, sort)
+HOT_QUERIES = [
+    ("ai_chat", "conversations", {"conversation_id": "abc"}, None),
+    ("module_assistant", "module_conversations", {"conversation_id": "abc"}, None),
+    ("module_assistant", "conversation_turns", {"conversation_id": "abc", "seq": {"$gt": 0}}, [("seq", -1)]),
+    ("like_story", "success_stories", {"id": "abc"}, None),
+    ("like_story", "story_likes", {"story_id": "abc", "email_lc": "someone@test.com"}, None),
+    ("like_story", "quiz_submissions", {"email_lc": server.normalize_email("Someone@Test.com")}, None),
+    ("check_certificate_eligibility", "quiz_submissions", {"email_lc": "someone@test.com"}, None),
+    ("get_success_stories", "success_stories", {}, [("timestamp", -1), ("id", -1)]),
+    ("get_quiz_results_page", "quiz_submissions", {}, [("timestamp", -1), ("_id", -1)]),
+    ("get_quiz_results_page", "quiz_submissions", {"module_id": 1}, [("timestamp", -1), ("_id", -1)]),
+    ("get_quiz_results_page", "quiz_submissions", {"department": "sales"}, [("timestamp", -1), ("_id", -1)]),
+    ("get_champions_dashboard", "champion_profiles", {}, [("impact_score", -1)]),
+    ("get_champions_dashboard", "champion_profiles", {"certified": True}, None),
+    ("generate_certificate", "certificates", {"email": "someone@test.com", "name": "Someone", "issued_date": "2026-01-01"}, None),
+]
+
+
+def plan_stages(plan):
+    """Yield every stage name in a (possibly nested) winning plan"""
+    yield plan.get("stage")
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            yield from plan_stages(child)
+
+
+@pytest.fixture(scope="module")
+def database():
+    client = MongoClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    for collection, indexes in server.MONGO_INDEXES.items():
+        db[collection].create_indexes(indexes)
+    yield db
+    client.drop_database(os.environ["DB_NAME"])
+    client.close()
+
+
+@pytest.mark.parametrize("endpoint,collection,query,sort", HOT_QUERIES)
+def test_hot_query_uses_index(database, endpoint, collection, query, sort):
+    """Test the query behind each endpoint is an index scan, never a collection scan"""
+    cursor = database[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    stages = list(plan_stages(winning_plan.get("queryPlan", winning_plan)))
+    assert "COLLSCAN" not in stages, f"{endpoint} scans {collection}: {stages}"
+    assert "IXSCAN" in stages or "IDHACK" in stages or "EXPRESS_IXSCAN" in stages
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])